@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark `EditTool` str_replace and insert on a large file, comparing the single-pass
+edit engine against the previous multi-scan implementation.
+
+Usage: python benchmarks/bench_edit_replace.py [--size-mb 100]
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from computer_use_qa_mcp.tools import EditTool
+
+LINE = "def handler(request):\n    return render(request, 'items.html', {'count': 12})\n"
+
+
+def legacy_str_replace(path: Path, old_str: str, new_str: str):
+    """The previous str_replace: count, replace, split for the snippet, plain write_text."""
+    file_content = path.read_text().expandtabs()
+    assert file_content.count(old_str) == 1
+    new_file_content = file_content.replace(old_str, new_str)
+    path.write_text(new_file_content)
+    replacement_line = file_content.split(old_str)[0].count("\n")
+    start_line = max(0, replacement_line - 4)
+    end_line = replacement_line + 4 + new_str.count("\n")
+    return "\n".join(new_file_content.split("\n")[start_line : end_line + 1])
+
+
+def legacy_insert(path: Path, insert_line: int, new_str: str):
+    """The previous insert: split the whole file into lines and join them back."""
+    file_text_lines = path.read_text().expandtabs().split("\n")
+    new_lines = file_text_lines[:insert_line] + new_str.split("\n") + file_text_lines[insert_line:]
+    path.write_text("\n".join(new_lines))
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    result = fn(*args)
+    if asyncio.iscoroutine(result):
+        asyncio.run(result)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "big.py"
+        repeats = args.size_mb * (1 << 20) // len(LINE)
+        half = LINE * (repeats // 2)
+        path.write_text(half + "MARKER = 'before'\n" + half)
+        n_lines = path.read_text().count("\n")
+        print(f"{args.size_mb}MB file, {n_lines} lines")
+
+        tool = EditTool()
+        new = timed(
+            lambda: tool(
+                command="str_replace",
+                path=str(path),
+                old_str="MARKER = 'before'",
+                new_str="MARKER = 'after'",
+            )
+        )
+        legacy = timed(legacy_str_replace, path, "MARKER = 'after'", "MARKER = 'before'")
+        print(f"str_replace  engine: {new * 1000:8.1f}ms   legacy: {legacy * 1000:8.1f}ms")
+
+        tool = EditTool()
+        new = timed(
+            lambda: tool(
+                command="insert", path=str(path), insert_line=n_lines // 2, new_str="# inserted"
+            )
+        )
+        legacy = timed(legacy_insert, path, n_lines // 2, "# inserted")
+        print(f"insert       engine: {new * 1000:8.1f}ms   legacy: {legacy * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
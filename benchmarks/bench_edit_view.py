@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark `EditTool.view` with a `view_range` on a large file, comparing the line index
+against the previous read-everything-and-split approach.
+
+Usage: python benchmarks/bench_edit_view.py [--size-mb 1024]
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from computer_use_qa_mcp.tools import EditTool
+
+LINE = b"2025-01-01T00:00:00.000Z INFO request handled path=/api/items status=200 duration_ms=12\n"
+
+
+def make_file(path: Path, size_mb: int):
+    block = LINE * ((1 << 20) // len(LINE))
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "app.log"
+        print(f"Writing {args.size_mb}MB to {path}...")
+        make_file(path, args.size_mb)
+        n_lines = (1 << 20) // len(LINE) * args.size_mb
+        middle = n_lines // 2
+        view_range = [middle, middle + 40]
+
+        tool = EditTool()
+        rss_before = max_rss_mb()
+
+        start = time.perf_counter()
+        await tool(command="view", path=str(path), view_range=view_range)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(20):
+            await tool(command="view", path=str(path), view_range=view_range)
+        warm = (time.perf_counter() - start) / 20
+        rss_index = max_rss_mb()
+
+        start = time.perf_counter()
+        lines = path.read_text().split("\n")
+        "\n".join(lines[view_range[0] - 1 : view_range[1]])
+        legacy = time.perf_counter() - start
+        del lines
+        rss_legacy = max_rss_mb()
+
+        print(f"file size:             {os.path.getsize(path) / (1 << 20):.0f}MB, {n_lines} lines")
+        print(f"index view (cold):     {cold * 1000:.1f}ms")
+        print(f"index view (warm):     {warm * 1000:.3f}ms")
+        print(f"read_text + split:     {legacy * 1000:.1f}ms")
+        print(f"max RSS growth index:  {rss_index - rss_before:.1f}MB")
+        print(f"max RSS growth legacy: {rss_legacy - rss_index:.1f}MB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark viewing a directory with `EditTool`, comparing the in-process cached listing
+against spawning `find -maxdepth 2` on a synthetic tree of ~100k entries.
+
+Usage: python benchmarks/bench_edit_view_dir.py [--dirs 100] [--files 1000]
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from computer_use_qa_mcp.tools import EditTool
+from computer_use_qa_mcp.tools.listing import list_directory
+from computer_use_qa_mcp.tools.run import run
+
+
+def make_tree(root: Path, dirs: int, files: int):
+    for d in range(dirs):
+        directory = root / f"pkg_{d}"
+        directory.mkdir()
+        for f in range(files):
+            (directory / f"module_{f}.js").touch()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dirs", type=int, default=100)
+    parser.add_argument("--files", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_tree(root, args.dirs, args.files)
+        print(f"tree with {args.dirs * (args.files + 1)} entries at {root}")
+
+        start = time.perf_counter()
+        _, stdout, _ = await run(rf"find '{root}' -maxdepth 2 -not -path '*/\.*'")
+        find_time = time.perf_counter() - start
+
+        tool = EditTool()
+        start = time.perf_counter()
+        await tool(command="view", path=str(root))
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(100):
+            await tool(command="view", path=str(root))
+        cached = (time.perf_counter() - start) / 100
+
+        start = time.perf_counter()
+        listing = list_directory(root, max_entries=10**9)
+        unbounded = time.perf_counter() - start
+
+        print(f"find subprocess:        {find_time * 1000:8.1f}ms ({len(stdout)} chars, clipped)")
+        print(f"listing (cold):         {cold * 1000:8.1f}ms")
+        print(f"listing (cached):       {cached * 1000:8.3f}ms")
+        print(f"listing (no limit):     {unbounded * 1000:8.1f}ms ({len(listing.entries)} entries)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
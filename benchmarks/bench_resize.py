@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark scaling screenshots to the API resolution, comparing Pillow's default `resize`
+on the full frame (what screenshots used before) against `resize_frame`, for common screens.
+
+The difference columns are the mean absolute pixel difference (0-255) from a full LANCZOS
+resample, the sharpest filter. Reducing averages pixel blocks, which is a little softer.
+PNG frames have no draft mode, which only speeds up decoding JPEGs.
+
+Usage: python benchmarks/bench_resize.py [--repeat 20]
+"""
+
+import argparse
+import random
+import time
+
+from PIL import Image, ImageChops, ImageDraw, ImageStat
+
+from computer_use_qa_mcp.tools.resolution import choose_target_size, image_tokens, resize_frame
+
+# (name, frame size, screen size in coordinates)
+SCREENS = [
+    ("MacBook Air 13 Retina", (2880, 1800), (1440, 900)),
+    ("MacBook Pro 14 Retina", (3024, 1964), (1512, 982)),
+    ("1080p", (1920, 1080), (1920, 1080)),
+    ("1440p", (2560, 1440), (2560, 1440)),
+    ("5K Retina", (5120, 2880), (2560, 1440)),
+    ("Xvfb 2560x1600", (2560, 1600), (2560, 1600)),
+]
+
+
+def make_frame(size: tuple[int, int]) -> Image.Image:
+    """A frame that looks like a web page: blocks of colour and lines of small text."""
+    rng = random.Random(0)
+    frame = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(frame)
+    width, height = size
+    for _ in range(40):
+        x, y = rng.randrange(width), rng.randrange(height)
+        colour = tuple(rng.randrange(256) for _ in range(3))
+        draw.rectangle((x, y, x + rng.randrange(50, 600), y + rng.randrange(20, 300)), fill=colour)
+    for y in range(0, height, 24):
+        draw.text((20, y), "The quick brown fox jumps over the lazy dog 0123456789 " * 8, fill="black")
+    return frame
+
+
+def timed(function, repeat: int) -> tuple[Image.Image, float]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def difference(a: Image.Image, b: Image.Image) -> float:
+    return sum(ImageStat.Stat(ImageChops.difference(a, b)).mean) / 3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(
+        f"{'screen':24}{'frame':>11}{'target':>11}{'tokens':>8}"
+        f"{'resize':>11}{'resize_frame':>14}{'speedup':>9}{'diff before':>13}{'diff after':>12}"
+    )
+    for name, frame_size, screen_size in SCREENS:
+        frame = make_frame(frame_size)
+        target = choose_target_size(*screen_size)
+        reference = frame.resize(target, Image.Resampling.LANCZOS)
+
+        before, before_time = timed(lambda: frame.resize(target), args.repeat)
+        after, after_time = timed(lambda: resize_frame(frame, target), args.repeat)
+        print(
+            f"{name:24}{'x'.join(map(str, frame_size)):>11}{'x'.join(map(str, target)):>11}"
+            f"{image_tokens(*target):>8}"
+            f"{before_time * 1000:>9.1f}ms{after_time * 1000:>12.1f}ms{before_time / after_time:>8.1f}x"
+            f"{difference(before, reference):>13.2f}{difference(after, reference):>12.2f}"
+        )
+
+    print("\ntarget sizes with a token budget:")
+    for budget in (None, 1200, 800, 400):
+        sizes = ", ".join(
+            "x".join(map(str, choose_target_size(*screen_size, budget)))
+            for _, _, screen_size in SCREENS
+        )
+        print(f"  {str(budget):>5}: {sizes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark model calls against a Messages API stub that injects rate limits, overloaded and
+failing responses, dropped connections and slow responses, comparing the SDK's default
+retries against `call_with_retry`, with and without hedging.
+
+The latency columns are per successful call, including the retries it took. The requests
+column counts what was sent to the stub, more requests than calls means retries or hedges.
+The benchmark fails if a call fails despite `call_with_retry`, or if hedging does not cut
+the p99 latency.
+
+Usage: python benchmarks/bench_retry.py [--calls 300] [--concurrency 8] [--hedge-after 1.0]
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from anthropic import APIError, AsyncAnthropic
+
+from computer_use_qa_mcp.loadtest import percentiles
+from computer_use_qa_mcp.retry import RetryPolicy, call_with_retry
+from computer_use_qa_mcp.simulator import MessagesAPIStub, scripted_turns
+
+FAULTS = {"rate_limit": 0.05, "overloaded": 0.03, "server_error": 0.02, "reset": 0.02, "slow": 0.05}
+MESSAGES = [{"role": "user", "content": "Run the QA steps."}]
+
+
+async def run(
+    stub: MessagesAPIStub, calls: int, concurrency: int, policy: RetryPolicy | None
+) -> dict:
+    # without a policy, the SDK retries on its own, 2 times by default
+    client = AsyncAnthropic(
+        api_key="simulated", base_url=stub.base_url, max_retries=2 if policy is None else 0
+    )
+    latencies: list[float] = []
+    failures = 0
+    queue = list(range(calls))
+
+    async def request():
+        return await client.messages.create(
+            model="simulated-model", max_tokens=1024, messages=MESSAGES  # type: ignore[arg-type]
+        )
+
+    async def worker():
+        nonlocal failures
+        while queue:
+            queue.pop()
+            start = time.perf_counter()
+            try:
+                if policy is None:
+                    await request()
+                else:
+                    await call_with_retry(request, policy)
+                latencies.append(time.perf_counter() - start)
+            except APIError:
+                failures += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    await client.close()
+    # slow responses are answered, and counted in `requests` already
+    failed_requests = sum(n for fault, n in stub.faults_injected.items() if fault != "slow")
+    return {"failed": failures, "requests": stub.requests + failed_requests, **percentiles(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per normal response")
+    parser.add_argument("--slow-latency", type=float, default=5.0, help="seconds per slow response")
+    parser.add_argument("--hedge-after", type=float, default=1.0)
+    args = parser.parse_args()
+    logging.getLogger("computer_use_qa_mcp.retry").setLevel(logging.ERROR)  # one warning per retry
+
+    policies: list[tuple[str, RetryPolicy | None]] = [
+        ("SDK default retries", None),
+        ("call_with_retry", RetryPolicy(base_delay=0.5)),
+        (
+            f"call_with_retry, hedge after {args.hedge_after:g}s",
+            RetryPolicy(base_delay=0.5, hedge_after=args.hedge_after),
+        ),
+    ]
+    print(f"{args.calls} calls, {args.concurrency} at once, faults per request: {FAULTS}")
+    print(f"{'policy':<36} {'failed':>6} {'requests':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    results = {}
+    for name, policy in policies:
+        # the same seed injects the same faults for every policy
+        with MessagesAPIStub(
+            scripted_turns(1),
+            latency=args.latency,
+            faults=FAULTS,  # type: ignore[arg-type]
+            slow_latency=args.slow_latency,
+            retry_after=1.0,
+        ) as stub:
+            result = results[name] = asyncio.run(run(stub, args.calls, args.concurrency, policy))
+        print(
+            f"{name:<36} {result['failed']:>6} {result['requests']:>8} "
+            f"{result['p50']:>8} {result['p99']:>8} {result['max']:>8}"
+        )
+
+    _, retried, hedged = results.values()
+    assert retried["failed"] == hedged["failed"] == 0, "calls failed despite call_with_retry"
+    assert hedged["p99"] < retried["p99"], "hedging did not cut the p99 latency"
+
+
+if __name__ == "__main__":
+    main()
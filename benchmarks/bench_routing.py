@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark routing turns between a fast and a strong model, against a scripted Messages API
+stub and a virtual display, compared to sending every turn to the strong model.
+
+The script is a QA run of --steps steps. The fast model gets stuck on every --hard-every'th
+step, moving the mouse to the same spot again and again, where the strong model gets on
+with it, and both write the report once the steps are done. The strong model answers in --strong-latency
+seconds, the fast one in --fast-latency. The benchmark fails if the routed run does not
+escalate where the fast model gets stuck, does not get the report from the strong model, or
+is not faster than sending every turn to the strong model.
+
+Usage: python benchmarks/bench_routing.py [--steps 30] [--hard-every 8]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from computer_use_qa_mcp.loop import APIProvider, sampling_loop
+from computer_use_qa_mcp.routing import ModelRouter, RoutingPolicy
+from computer_use_qa_mcp.simulator import MessagesAPIStub, VirtualDisplay
+from computer_use_qa_mcp.simulator.messages_api import DEFAULT_ACTIONS, ContentBlocks
+from computer_use_qa_mcp.tools import ComputerTool, ToolCollection
+from computer_use_qa_mcp.usage import RunUsage
+
+FAST_MODEL = "simulated-fast-model"
+STRONG_MODEL = "simulated-strong-model"
+STUCK_ACTION = {"action": "mouse_move", "coordinate": [100, 100]}
+
+
+def routing_script(steps: int, hard_every: int):
+    actions = list(itertools.islice(itertools.cycle(DEFAULT_ACTIONS), steps))
+
+    def respond(request: dict[str, Any]) -> ContentBlocks:
+        done = sum(
+            1
+            for message in request["messages"]
+            if message["role"] == "assistant"
+            and any(
+                block.get("type") == "text" and block["text"].startswith("Step")
+                for block in message["content"]
+            )
+        )
+        if done == steps:
+            return [{"type": "text", "text": f"Report: all {steps} steps worked."}]
+        if request["model"] == FAST_MODEL and (done + 1) % hard_every == 0:
+            return [
+                {"type": "text", "text": "Trying that again."},
+                {"type": "tool_use", "name": "computer", "input": STUCK_ACTION},
+            ]
+        return [
+            {"type": "text", "text": f"Step {done + 1}."},
+            {"type": "tool_use", "name": "computer", "input": actions[done]},
+        ]
+
+    return respond
+
+
+async def run(router: ModelRouter | None) -> tuple[float, RunUsage, str]:
+    usage = RunUsage()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(None):  # the computer tool prints every action
+        messages = await sampling_loop(
+            model=STRONG_MODEL,
+            provider=APIProvider.ANTHROPIC,
+            system_prompt_suffix="",
+            messages=[{"role": "user", "content": "Run the QA steps."}],
+            output_callback=lambda block: None,
+            tool_output_callback=lambda result, tool_use_id: None,
+            api_response_callback=lambda response: None,
+            api_key="simulated",
+            only_n_most_recent_images=10,
+            tool_collection=ToolCollection(ComputerTool(gui=VirtualDisplay())),
+            usage=usage,
+            router=router,
+        )
+    report = messages[-1]["content"][-1]
+    return time.perf_counter() - start, usage, getattr(report, "text", "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--steps", type=int, default=30)
+    parser.add_argument("--hard-every", type=int, default=8)
+    parser.add_argument("--fast-latency", type=float, default=0.1)
+    parser.add_argument("--strong-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    with MessagesAPIStub(
+        routing_script(args.steps, args.hard_every),
+        model_latency={FAST_MODEL: args.fast_latency, STRONG_MODEL: args.strong_latency},
+    ) as stub:
+        os.environ["ANTHROPIC_BASE_URL"] = stub.base_url
+        print(f"{args.steps} steps, the fast model gets stuck on every {args.hard_every}th")
+
+        strong_seconds, usage, report = asyncio.run(run(None))
+        print(f"strong model only: {strong_seconds:.1f}s, {usage.turns} turns")
+        print(f"  {report}")
+        assert report.startswith("Report"), report
+
+        router = ModelRouter(RoutingPolicy(fast_model=FAST_MODEL, strong_model=STRONG_MODEL))
+        routed_seconds, usage, report = asyncio.run(run(router))
+        print(f"routed: {routed_seconds:.1f}s, {usage.turns} turns")
+        print(f"  {router.summary()}")
+        print(f"  {report}")
+
+    assert report.startswith("Report"), report
+    if args.hard_every <= args.steps:
+        assert router.escalations[:1] == ["repeated actions"], router.escalations
+    assert router.stats["strong"].turns >= 1, "the strong model did not write the report"
+    assert routed_seconds < strong_seconds, "routing was not faster than the strong model alone"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Count the model turns a QA file in `examples/` takes with each computer use tool version,
+with and without automatic screenshots, by running `sampling_loop` against the Messages API
+stub and a virtual display.
+
+The stub plays a model that works through the numbered steps of the file, recognising what
+each step asks for (open a url, click something, scroll, wait, check something). It does each
+with the fewest actions the computer tool of the request offers, and looks at the screen with
+a screenshot turn after a step whenever the last tool result did not come with one. The turns
+are counted from the conversation the loop ran, and every action runs on the real tools, so
+an action a version does not have fails the benchmark.
+
+Usage: python benchmarks/bench_turns_per_version.py [examples/*.md]
+"""
+
+import asyncio
+import contextlib
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from computer_use_qa_mcp.loop import APIProvider, sampling_loop
+from computer_use_qa_mcp.simulator import MessagesAPIStub, VirtualDisplay
+from computer_use_qa_mcp.simulator.messages_api import ContentBlocks
+from computer_use_qa_mcp.tools import (
+    TOOL_GROUPS_BY_VERSION,
+    BashTool,
+    ComputerTool,
+    ToolCollection,
+    ToolVersion,
+)
+
+VERSIONS: list[ToolVersion] = ["computer_use_20241022", "computer_use_20250124"]
+SCROLL_PAGES = 3  # pages a scroll step moves down, the footer is rarely on the next one
+CLICK_AT = [640, 400]
+
+INTENT_PATTERNS: list[tuple[str, str]] = [
+    ("open_url", r"https?://|\bgo to \S+\.\w{2,}"),
+    ("open_app", r"\bopen (the )?(browser|chrome|safari|firefox)\b"),
+    ("scroll", r"\bscroll"),
+    ("wait", r"\bwait\b"),
+    ("click", r"\b(click|hit|press|chose|choose|select|go to the)\b"),
+    ("check", r"\b(make sure|verify|check|expect|should)\b"),
+]
+
+# one planned action: the tool, its input, and whether the model looks at the screen after it
+Action = tuple[str, dict[str, Any], bool]
+
+
+def step_intents(step: str) -> list[str]:
+    step = step.lower()
+    intents = [intent for intent, pattern in INTENT_PATTERNS if re.search(pattern, step)]
+    return intents or ["check"]
+
+
+def plan_actions(intent: str, step: str, computer_type: str) -> list[Action]:
+    """The fewest actions that do `intent` with the computer tool of type `computer_type`."""
+    rich = computer_type != "computer_20241022"  # clicks and scrolls at a coordinate, waits
+    if intent == "open_app":
+        return [("bash", {"command": "echo open -a Safari"}, True)]
+    if intent == "open_url":
+        url = re.search(r"https?://\S+", step)
+        return [
+            ("computer", {"action": "key", "text": "ctrl+l"}, False),
+            ("computer", {"action": "type", "text": url[0] if url else "example.com"}, False),
+            ("computer", {"action": "key", "text": "Return"}, True),
+        ]
+    if intent == "click":
+        if rich:
+            return [("computer", {"action": "left_click", "coordinate": CLICK_AT}, True)]
+        return [
+            ("computer", {"action": "mouse_move", "coordinate": CLICK_AT}, False),
+            ("computer", {"action": "left_click"}, True),
+        ]
+    if intent == "scroll":
+        if rich:
+            scroll = {"action": "scroll", "coordinate": CLICK_AT, "scroll_direction": "down"}
+            return [("computer", {**scroll, "scroll_amount": 10 * SCROLL_PAGES}, True)]
+        # a page at a time, looking where it got to after each
+        return [("computer", {"action": "key", "text": "pagedown"}, True)] * SCROLL_PAGES
+    if intent == "wait":
+        if rich:
+            return [("computer", {"action": "wait", "duration": 1}, True)]
+        return [("bash", {"command": "sleep 1"}, True)]
+    return [("computer", {"action": "screenshot"}, False)]
+
+
+def last_result_has_image(request: dict[str, Any]) -> bool:
+    content = request["messages"][-1]["content"]
+    return isinstance(content, list) and any(
+        item.get("type") == "image"
+        for block in content
+        if block.get("type") == "tool_result"
+        for item in block.get("content") or []
+    )
+
+
+def qa_model(steps: list[str]):
+    """A stub response function working through `steps`, see the module docstring."""
+
+    def respond(request: dict[str, Any]) -> ContentBlocks:
+        computer_type = next(tool["type"] for tool in request["tools"] if tool["name"] == "computer")
+        plan = [
+            action
+            for step in steps
+            for intent in step_intents(step)
+            for action in plan_actions(intent, step, computer_type)
+        ]
+        turns = [
+            message["content"][0]["text"]
+            for message in request["messages"]
+            if message["role"] == "assistant"
+        ]
+        done = sum(1 for text in turns if text.startswith("Action"))
+        looking = {"type": "tool_use", "name": "computer", "input": {"action": "screenshot"}}
+        if not turns:
+            return [{"type": "text", "text": "Looking at the screen first."}, looking]
+        if (
+            done
+            and plan[done - 1][2]
+            and turns[-1].startswith("Action")
+            and not last_result_has_image(request)
+        ):
+            return [{"type": "text", "text": "Looking at the screen."}, looking]
+        if done == len(plan):
+            return [{"type": "text", "text": f"Report: all {len(steps)} steps worked."}]
+        tool, tool_input, _ = plan[done]
+        return [
+            {"type": "text", "text": f"Action {done + 1}."},
+            {"type": "tool_use", "name": tool, "input": tool_input},
+        ]
+
+    return respond
+
+
+async def count_turns(version: ToolVersion, auto_screenshot: bool) -> tuple[int, int]:
+    """Turns of a run of the loaded instructions, and how many of its tool calls failed."""
+    tools = [
+        ToolCls(gui=VirtualDisplay(), auto_screenshot=auto_screenshot)
+        if issubclass(ToolCls, ComputerTool)
+        else ToolCls()
+        for ToolCls in TOOL_GROUPS_BY_VERSION[version].tools
+    ]
+    errors = 0
+
+    def count_error(result, tool_use_id):
+        nonlocal errors
+        errors += bool(result.error)
+
+    try:
+        with contextlib.redirect_stdout(None):  # the computer tool prints every action
+            messages = await sampling_loop(
+                model="simulated-model",
+                provider=APIProvider.ANTHROPIC,
+                system_prompt_suffix="",
+                messages=[{"role": "user", "content": "Run the QA steps."}],
+                output_callback=lambda block: None,
+                tool_output_callback=count_error,
+                api_response_callback=lambda response: None,
+                api_key="simulated",
+                only_n_most_recent_images=10,
+                tool_version=version,
+                tool_collection=ToolCollection(*tools),
+            )
+    finally:
+        for tool in tools:
+            if isinstance(tool, BashTool):
+                tool.stop()
+        await asyncio.sleep(0.1)  # for the shells to exit before the event loop closes
+    return sum(1 for message in messages if message["role"] == "assistant"), errors
+
+
+def main():
+    root = Path(__file__).resolve().parent.parent
+    files = [Path(arg) for arg in sys.argv[1:]] or sorted((root / "examples").glob("*.md"))
+    variants = [(version, auto) for version in VERSIONS for auto in (False, True)]
+    names = [f"{version}{' +auto' if auto else ''}" for version, auto in variants]
+
+    totals = dict.fromkeys(names, 0)
+    with MessagesAPIStub() as stub:
+        os.environ["ANTHROPIC_BASE_URL"] = stub.base_url
+        for file in files:
+            steps = re.findall(r"^\s*\d+\.\s*(.+)$", file.read_text(), flags=re.MULTILINE)
+            stub.load(qa_model(steps))
+            start = time.perf_counter()
+            counts = []
+            for name, (version, auto) in zip(names, variants):
+                turns, errors = asyncio.run(count_turns(version, auto))
+                if errors:
+                    sys.exit(f"{file.name}: {errors} tool calls failed with {name}")
+                totals[name] += turns
+                counts.append(turns)
+            seconds = time.perf_counter() - start
+            print(f"{file.name:24}" + "".join(f"{n}: {c:3}   " for n, c in zip(names, counts)) + f"({seconds:.0f}s)")
+
+    print("average turns per file:")
+    for name, total in totals.items():
+        print(f"  {name}: {total / len(files):.1f}")
+
+
+if __name__ == "__main__":
+    main()
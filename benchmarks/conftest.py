@@ -0,0 +1,10 @@
+"""Fixtures of the benchmarks, on top of the simulator fixtures of the root conftest.py."""
+
+import pytest
+
+from computer_use_qa_mcp.tools import BashTool, EditTool, ToolCollection
+
+
+@pytest.fixture
+def tool_collection(computer):
+    return ToolCollection(computer, BashTool(), EditTool())
@@ -0,0 +1,98 @@
+"""
+Benchmarks of the overhead of `sampling_loop`, `ToolCollection` and `ComputerTool`, with the
+model replaced by a scripted Messages API stub and the screen by a virtual display.
+
+Usage: pytest benchmarks/ --benchmark-only
+
+They are left out of a plain `pytest` run, which only collects `tests/`.
+"""
+
+import asyncio
+import gc
+import tracemalloc
+
+import pytest
+
+from computer_use_qa_mcp.loop import APIProvider, sampling_loop
+from computer_use_qa_mcp.simulator import qa_script
+
+TURNS = 20
+MEMORY_TURNS = 200
+
+
+async def run_loop(tool_collection, api_response_callback=lambda response: None):
+    return await sampling_loop(
+        model="simulated-model",
+        provider=APIProvider.ANTHROPIC,
+        system_prompt_suffix="",
+        messages=[{"role": "user", "content": "Run the QA steps."}],
+        output_callback=lambda block: None,
+        tool_output_callback=lambda result, tool_use_id: None,
+        api_response_callback=api_response_callback,
+        api_key="simulated",
+        only_n_most_recent_images=10,
+        tool_collection=tool_collection,
+    )
+
+
+@pytest.mark.parametrize("action", ["cursor_position", "screenshot"])
+def test_turn_overhead(benchmark, api_stub, tool_collection, action):
+    """Time for a whole run of TURNS single action turns, `cursor_position` turns are loop overhead only."""
+
+    def run():
+        api_stub.load(qa_script(TURNS, actions=[{"action": action}]))
+        return asyncio.run(run_loop(tool_collection))
+
+    messages = benchmark.pedantic(run, rounds=5, iterations=1)
+    assert len(messages) == 2 * TURNS + 2
+    benchmark.extra_info["turns"] = TURNS
+    if benchmark.stats:  # None when benchmarks are disabled
+        benchmark.extra_info["ms_per_turn"] = benchmark.stats.stats.mean / (TURNS + 1) * 1000
+
+
+def test_memory_growth(benchmark, api_stub, tool_collection):
+    """Python memory held after MEMORY_TURNS turns, which should plateau as old screenshots are dropped."""
+    samples: list[int] = []
+
+    def sample(response):
+        # only count what is still referenced, the SDK leaves request bodies in reference cycles
+        gc.collect()
+        samples.append(tracemalloc.get_traced_memory()[0])
+
+    def run():
+        api_stub.load(qa_script(MEMORY_TURNS))
+        samples.clear()
+        tracemalloc.start()
+        try:
+            asyncio.run(run_loop(tool_collection, sample))
+        finally:
+            tracemalloc.stop()
+
+    benchmark.pedantic(run, rounds=1, iterations=1)
+    quarter = MEMORY_TURNS // 4
+    growth_per_turn = (samples[-1] - samples[quarter]) / (len(samples) - 1 - quarter)
+    benchmark.extra_info["kb_after_first_quarter"] = samples[quarter] // 1024
+    benchmark.extra_info["kb_at_end"] = samples[-1] // 1024
+    benchmark.extra_info["kb_growth_per_turn"] = growth_per_turn / 1024
+    # history grows by the text of each turn, screenshots must not accumulate
+    assert growth_per_turn < 64 * 1024
+
+
+@pytest.mark.parametrize(
+    "tool_input",
+    [
+        {"action": "screenshot"},
+        {"action": "cursor_position"},
+        {"action": "mouse_move", "coordinate": [640, 400]},
+        {"action": "left_click"},
+        {"action": "type", "text": "hello world"},
+        {"action": "key", "text": "ctrl+a"},
+    ],
+    ids=lambda tool_input: tool_input["action"],
+)
+def test_tool_latency(benchmark, tool_collection, tool_input):
+    """Latency of a single computer tool call, including the tool's own fixed waits."""
+    result = benchmark(
+        lambda: asyncio.run(tool_collection.run(name="computer", tool_input=tool_input))
+    )
+    assert not result.error
@@ -0,0 +1,149 @@
+"""
+A disk cache of QA reports, so running the same instructions against the same build again
+returns the report of the last run instead of running the agent for minutes.
+
+A report is only reused for the same instructions, the same build fingerprint given by the
+caller (a git commit, a hash of the app's assets) and the same model and settings. Entries
+expire after a time to live, and the least recently used ones are evicted once the cache
+outgrows its size.
+
+Identical runs that miss the cache at the same time take turns in this process, so the
+agent only runs for the first of them and the others return its report.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import time
+from collections.abc import AsyncIterator
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .tools.edit_engine import atomic_write
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_TTL_SECONDS = 24 * 60 * 60.0
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+
+def cache_key(instructions: str, build_fingerprint: str, settings: dict[str, Any]) -> str:
+    """The key of a report of `instructions` run on a build, with the model and settings that shape it."""
+    key = {
+        "version": CACHE_FORMAT_VERSION,
+        "instructions": hashlib.sha256(instructions.encode()).hexdigest(),
+        "build": build_fingerprint,
+        "settings": settings,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+
+@dataclass
+class CachedReport:
+    report: str
+    build_fingerprint: str
+    settings: dict[str, Any]
+    run_details: list[str] = field(default_factory=list)  # of the run that wrote the report
+    created_at: float = field(default_factory=time.time)
+
+    def cache_details(self, key: str) -> list[str]:
+        """Where the report came from, to show instead of the details of a run."""
+        age = time.time() - self.created_at
+        age_text = f"{age / 3600:.1f}h" if age >= 3600 else f"{age / 60:.0f}min"
+        return [
+            f"Cached: the report of a run {age_text} ago on build {self.build_fingerprint}, "
+            f"the agent was not run again. Pass force_refresh to run it (cache key {key[:16]})",
+            *(f"Cached run: {line}" for line in self.run_details),
+        ]
+
+
+class ResultCache:
+    """Reports on disk in `directory`, one JSON file per key."""
+
+    def __init__(
+        self,
+        directory: str | Path,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key[:32]}.json"
+
+    def get(self, key: str) -> CachedReport | None:
+        """The report cached under `key`, None when there is none or it expired."""
+        path = self.path(key)
+        try:
+            data = json.loads(path.read_text())
+            if data.pop("version", None) != CACHE_FORMAT_VERSION:
+                return None
+            entry = CachedReport(**data)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable cached report {path}: {e}")
+            return None
+        if time.time() - entry.created_at > self.ttl_seconds:
+            path.unlink(missing_ok=True)
+            return None
+        os.utime(path)  # the modification time orders the entries for eviction
+        return entry
+
+    def put(self, key: str, entry: CachedReport):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.path(key), json.dumps({"version": CACHE_FORMAT_VERSION, **asdict(entry)}))
+        self.evict()
+
+    def evict(self):
+        """Remove expired entries, then the least recently used ones until the cache fits its size."""
+        now = time.time()
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # removed by another process meanwhile
+            if now - stat.st_mtime > self.ttl_seconds:
+                # not used for longer than it may live, so it also expired
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+class KeyLocks:
+    """A lock per key, held by one run of the key at a time, dropped once no run holds or waits for it."""
+
+    def __init__(self):
+        self._locks: dict[str, tuple[asyncio.Lock, int]] = {}
+
+    @property
+    def held(self) -> int:
+        return len(self._locks)
+
+    @contextlib.asynccontextmanager
+    async def hold(self, key: str) -> AsyncIterator[None]:
+        lock, users = self._locks.get(key, (asyncio.Lock(), 0))
+        self._locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
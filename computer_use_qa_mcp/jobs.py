@@ -0,0 +1,143 @@
+"""
+QA runs in the background, so a client can start one, go on with its work, and come back
+for the progress and the report later instead of holding a tool call open for minutes.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any, Literal
+
+from mcp.server.fastmcp.exceptions import ToolError
+
+from .tools.base import ToolResult
+
+logger = logging.getLogger(__name__)
+
+JobStatus = Literal["queued", "running", "completed", "failed", "cancelled"]
+
+LOG_LINES = 200  # lines of the partial log kept per job
+LOG_LINE_CHARS = 500  # longer tool outputs are cut in the log
+MAX_FINISHED_JOBS = 100  # finished jobs kept for their reports, oldest are forgotten first
+
+
+def _shorten(text: str) -> str:
+    text = text.strip()
+    return text if len(text) <= LOG_LINE_CHARS else text[: LOG_LINE_CHARS - 1] + "…"
+
+
+@dataclass
+class Job:
+    id: str
+    instructions_path: str
+    status: JobStatus = "queued"
+    turns: int = 0
+    last_action: str | None = None
+    report: str | None = None
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    log: deque[str] = field(default_factory=lambda: deque(maxlen=LOG_LINES))
+    task: asyncio.Task | None = field(default=None, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def start(self):
+        self.status = "running"
+        self.started_at = time.time()
+
+    def record_turn(self):
+        self.turns += 1
+
+    def record_text(self, text: str):
+        self.log.append(f"Assistant: {_shorten(text)}")
+
+    def record_actions(self, actions: list[str]):
+        self.last_action = actions[-1]
+        self.log.extend(f"Action: {action}" for action in actions)
+
+    def record_result(self, result: ToolResult):
+        if result.error:
+            self.log.append(f"Tool error: {_shorten(result.error)}")
+        elif result.output:
+            self.log.append(f"Tool output: {_shorten(result.output)}")
+        if result.base64_image:
+            self.log.append("Tool output: screenshot")
+
+    def status_dict(self, log_lines: int) -> dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "instructions": self.instructions_path,
+            "turns": self.turns,
+            "last_action": self.last_action,
+            "elapsed_seconds": round(end - (self.started_at or end), 1),
+            "error": self.error,
+            "log": list(self.log)[-log_lines:] if log_lines > 0 else [],
+        }
+
+
+class JobRegistry:
+    """The background QA runs of this server process, by id."""
+
+    def __init__(self, max_finished: int = MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self.jobs: dict[str, Job] = {}
+
+    def start(self, instructions_path: str, run: Callable[[Job], Awaitable[str]]) -> Job:
+        """Start `run` in the background, it reports its progress to the job it is given."""
+        job = Job(id=uuid.uuid4().hex[:12], instructions_path=instructions_path)
+        job.task = asyncio.create_task(self._run(job, run), name=f"qa-job-{job.id}")
+        self.jobs[job.id] = job
+        self._forget_old_jobs()
+        return job
+
+    async def _run(self, job: Job, run: Callable[[Job], Awaitable[str]]):
+        try:
+            job.report = await run(job)
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            logger.exception(f"QA job {job.id} failed")
+            job.status = "failed"
+            job.error = str(e) or type(e).__name__
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id: str) -> Job:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise ToolError(f"There is no QA job {job_id}, it may have finished too long ago")
+        return job
+
+    def cancel(self, job_id: str) -> Job:
+        """Cancel a job, its run stops at its next await, a finished job is left as it is."""
+        job = self.get(job_id)
+        if not job.done and job.task is not None:
+            job.task.cancel()
+        return job
+
+    def _forget_old_jobs(self):
+        finished = [job for job in self.jobs.values() if job.done]
+        for job in finished[: max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job.id]
+
+
+_job_registry: JobRegistry | None = None
+
+
+def get_job_registry() -> JobRegistry:
+    """Get or create the global job registry."""
+    global _job_registry
+    if _job_registry is None:
+        _job_registry = JobRegistry()
+    return _job_registry
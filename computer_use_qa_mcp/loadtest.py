@@ -0,0 +1,285 @@
+"""
+Load test the MCP server: start it against a scripted model and virtual displays, fire
+concurrent `run_quality_assurance` calls and report how it holds up.
+
+Usage: computer-use-qa-mcp-loadtest [--transport stdio|http] [--url URL] [--concurrency 4]
+    [--runs N] [--turns 20] [--model-latency 0.5] [--output loadtest.json]
+
+With `--url`, an already running server is load tested instead of starting one. It should
+run with QA_AGENT_SIMULATED_DISPLAY=1, QA_AGENT_WORKERS at least the concurrency and
+ANTHROPIC_BASE_URL pointing at a stub, see `computer_use_qa_mcp.simulator`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Any
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+from .simulator import MessagesAPIStub, scripted_turns
+
+PING_INTERVAL = 0.25  # seconds between event loop lag probes
+RSS_INTERVAL = 1.0  # seconds between memory samples
+SERVER_START_TIMEOUT = 30.0  # seconds
+
+
+def percentiles(values: list[float]) -> dict[str, float | None]:
+    """p50, p99 and max of `values` in milliseconds, by nearest rank."""
+    if not values:
+        return {"p50": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+
+    return {"p50": rank(0.5), "p99": rank(0.99), "max": round(ordered[-1] * 1000, 2)}
+
+
+def rss_mb(pid: int) -> float | None:
+    """Resident memory of a process, through `ps` so it works on macOS and Linux."""
+    try:
+        output = subprocess.run(
+            ["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True, check=True
+        ).stdout
+        return round(int(output.strip()) / 1024, 1)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+def server_pid(parent_pid: int) -> int | None:
+    """The server process started by stdio_client, which does not expose it."""
+    try:
+        output = subprocess.run(
+            ["ps", "-A", "-o", "pid=,ppid=,command="], capture_output=True, text=True, check=True
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    for line in output.splitlines():
+        pid, ppid, command = line.split(None, 2)
+        if int(ppid) == parent_pid and "computer_use_qa_mcp" in command:
+            return int(pid)
+    return None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_port(port: int):
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"The server did not listen on port {port} in time")
+            await asyncio.sleep(0.1)
+
+
+class TurnTimer:
+    """Wraps a script to time the intervals between the model calls of each run."""
+
+    def __init__(self, script):
+        self.script = script
+        self.turn_latencies: list[float] = []
+        self._last_request: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, request: dict[str, Any]):
+        # every run has its own instructions, which are the first message
+        run = json.dumps(request["messages"][0]["content"])
+        now = time.perf_counter()
+        with self._lock:
+            if run in self._last_request:
+                self.turn_latencies.append(now - self._last_request[run])
+            self._last_request[run] = now
+        return self.script(request)
+
+
+async def load_test(args: argparse.Namespace) -> dict[str, Any]:
+    timer = TurnTimer(scripted_turns(args.turns))
+    runs = args.runs or args.concurrency
+    workdir = Path(tempfile.mkdtemp(prefix="qa-loadtest-"))
+    instructions = []
+    for run in range(runs):
+        path = workdir / f"run_{run}.md"
+        path.write_text(f"Load test run {run}.\n1. Follow the scripted steps.\n")
+        instructions.append(path)
+
+    with MessagesAPIStub(timer, latency=args.model_latency) as stub:
+        env = {
+            **os.environ,
+            "ANTHROPIC_BASE_URL": stub.base_url,
+            "ANTHROPIC_API_KEY": "simulated",
+            "QA_AGENT_SIMULATED_DISPLAY": "1",
+            "QA_AGENT_WORKERS": str(args.concurrency),
+            # the server runs in a scratch directory, from the same code as the load tester
+            "PYTHONPATH": os.pathsep.join(
+                filter(None, [str(Path(__file__).resolve().parent.parent), os.getenv("PYTHONPATH")])
+            ),
+        }
+        async with AsyncExitStack() as stack:
+            errlog = stack.enter_context(open(workdir / "server.log", "w"))
+            pid = None
+
+            if args.url or args.transport == "http":
+                url = args.url
+                if url is None:
+                    port = free_port()
+                    process = subprocess.Popen(
+                        [
+                            sys.executable,
+                            "-m",
+                            "computer_use_qa_mcp.server",
+                            "--transport",
+                            "streamable-http",
+                            "--port",
+                            str(port),
+                        ],
+                        env=env,
+                        cwd=workdir,
+                        stdout=errlog,
+                        stderr=errlog,
+                    )
+                    stack.callback(process.wait)
+                    stack.callback(process.terminate)
+                    pid = process.pid
+                    await wait_for_port(port)
+                    url = f"http://127.0.0.1:{port}/mcp"
+
+                async def open_session() -> ClientSession:
+                    read, write, _ = await stack.enter_async_context(streamablehttp_client(url))
+                    session = await stack.enter_async_context(ClientSession(read, write))
+                    await session.initialize()
+                    return session
+
+                # like separate clients, each concurrent run has its own session
+                sessions = [await open_session() for _ in range(args.concurrency + 1)]
+            else:
+                server = StdioServerParameters(
+                    command=sys.executable,
+                    args=["-m", "computer_use_qa_mcp.server"],
+                    env=env,
+                    cwd=workdir,
+                )
+                read, write = await stack.enter_async_context(stdio_client(server, errlog=errlog))
+                session = await stack.enter_async_context(ClientSession(read, write))
+                await session.initialize()
+                sessions = [session] * (args.concurrency + 1)
+                pid = server_pid(os.getpid())
+
+            ping_session, run_sessions = sessions[0], sessions[1:]
+            lags: list[float] = []
+            rss: list[float] = []
+            run_latencies: list[float] = []
+            failures: list[str] = []
+            done = asyncio.Event()
+
+            async def probe_lag():
+                while not done.is_set():
+                    start = time.perf_counter()
+                    await ping_session.send_ping()
+                    lags.append(time.perf_counter() - start)
+                    await asyncio.sleep(PING_INTERVAL)
+
+            async def sample_rss():
+                while pid is not None and not done.is_set():
+                    value = await asyncio.to_thread(rss_mb, pid)
+                    if value is not None:
+                        rss.append(value)
+                    await asyncio.sleep(RSS_INTERVAL)
+
+            queue: asyncio.Queue[Path] = asyncio.Queue()
+            for path in instructions:
+                queue.put_nowait(path)
+
+            async def worker(session: ClientSession):
+                while not queue.empty():
+                    path = queue.get_nowait()
+                    start = time.perf_counter()
+                    try:
+                        result = await session.call_tool(
+                            "run_quality_assurance",
+                            {"instructions_absolute_file_path": str(path)},
+                        )
+                        if result.isError:
+                            failures.append(str(result.content))
+                        else:
+                            run_latencies.append(time.perf_counter() - start)
+                    except Exception as e:
+                        failures.append(repr(e))
+
+            monitors = [asyncio.create_task(probe_lag()), asyncio.create_task(sample_rss())]
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(session) for session in run_sessions))
+            wall_seconds = time.perf_counter() - start
+            done.set()
+            await asyncio.gather(*monitors)
+
+    try:
+        package_version = version("computer-use-qa-mcp")
+    except PackageNotFoundError:
+        package_version = None
+    return {
+        "version": package_version,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "transport": "http" if args.url or args.transport == "http" else "stdio",
+        "concurrency": args.concurrency,
+        "runs": runs,
+        "turns_per_run": args.turns,
+        "model_latency_seconds": args.model_latency,
+        "wall_seconds": round(wall_seconds, 3),
+        "completed_runs": len(run_latencies),
+        "failed_runs": len(failures),
+        "failures": failures[:10],
+        "turns": stub.requests,
+        "turns_per_second": round(stub.requests / wall_seconds, 3),
+        "turn_latency_ms": percentiles(timer.turn_latencies),
+        "run_latency_ms": percentiles(run_latencies),
+        "event_loop_lag_ms": percentiles(lags),
+        "rss_mb": {
+            "start": rss[0] if rss else None,
+            "peak": max(rss) if rss else None,
+            "end": rss[-1] if rss else None,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--transport", choices=["stdio", "http"], default="stdio")
+    parser.add_argument("--url", help="load test a running server over HTTP instead")
+    parser.add_argument("--concurrency", type=int, default=4, help="runs in flight at once")
+    parser.add_argument("--runs", type=int, help="runs in total, defaults to --concurrency")
+    parser.add_argument("--turns", type=int, default=20, help="tool calling turns per run")
+    parser.add_argument(
+        "--model-latency", type=float, default=0.5, help="seconds the stub takes to answer"
+    )
+    parser.add_argument("--output", type=Path, default=Path("loadtest.json"))
+    args = parser.parse_args()
+
+    results = asyncio.run(load_test(args))
+    args.output.write_text(json.dumps(results, indent=2) + "\n")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
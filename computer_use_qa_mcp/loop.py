@@ -2,13 +2,23 @@
 Agentic sampling loop that calls the Anthropic API and local implenmentation of anthropic-defined computer use tools.
 """
 
+import asyncio
+import contextlib
+import functools
 import platform
-from collections.abc import Callable
+import time
+from collections.abc import Awaitable, Callable
 from datetime import datetime
-from enum import StrEnum
 from typing import Any, cast
 
-from anthropic import Anthropic, AnthropicBedrock, AnthropicVertex, APIResponse
+from anthropic import (
+    NOT_GIVEN,
+    APIError,
+    AsyncAnthropic,
+    AsyncAnthropicBedrock,
+    AsyncAnthropicVertex,
+    APIResponse,
+)
 from anthropic.types import (
     ToolResultBlockParam,
 )
@@ -22,22 +32,30 @@ from anthropic.types.beta import (
     BetaToolResultBlockParam,
 )
 
-from .tools import BashTool, ComputerTool, EditTool, ToolCollection, ToolResult
+from .metrics import ERRORS, IMAGES_SENT, IMAGES_SKIPPED, MODEL_LATENCY, TURNS
+from .providers import APIProvider, ProviderPool
+from .recording import RecordedTurn, Recorder, summarize_result
+from .retry import DEFAULT_RETRY_POLICY, RetryPolicy, call_with_retry
+from .routing import ModelRouter
+from .scheduler import RateLimitScheduler, estimate_input_tokens
+from .tools import (
+    TOOL_GROUPS_BY_VERSION,
+    ComputerTool,
+    ToolCollection,
+    ToolResult,
+    ToolVersion,
+)
+from .tools.frames import fingerprint_difference
+from .tracing import span
+from .usage import BUDGET_REACHED_PROMPT, RunBudget, RunUsage
 
 BETA_FLAG = "computer-use-2024-10-22"
 
-
-class APIProvider(StrEnum):
-    ANTHROPIC = "anthropic"
-    BEDROCK = "bedrock"
-    VERTEX = "vertex"
-
-
-PROVIDER_TO_DEFAULT_MODEL_NAME: dict[APIProvider, str] = {
-    APIProvider.ANTHROPIC: "claude-3-5-sonnet-20241022",
-    APIProvider.BEDROCK: "anthropic.claude-3-5-sonnet-20241022-v2:0",
-    APIProvider.VERTEX: "claude-3-5-sonnet-v2@20241022",
-}
+# difference (0-255) of the most changed tile of two screen fingerprints up to which a recorded
+# turn is replayed. A changed line of text, a validation error or a toggled control is over it,
+# so the model takes over wherever the screen is not the one the turn was recorded on
+REPLAY_TOLERANCE: float = 2.0
+REPLAY_SETTLE_TIMEOUT: float = 5.0  # seconds to wait for the screen to match a recorded one
 
 
 # This system prompt is optimized for the Docker environment in this repository and
@@ -82,83 +100,272 @@ async def sampling_loop(
     only_n_most_recent_images: int | None = None,
     max_tokens: int = 4096,
     tool_action_callback: Callable[[list[tuple[str, dict[str, Any]]]], None] | None = None,
+    progress_callback: Callable[[int, list[tuple[str, dict[str, Any]]]], Awaitable[None]] | None = None,
+    tool_version: ToolVersion = "computer_use_20241022",
+    tool_collection: ToolCollection | None = None,
+    recorder: Recorder | None = None,
+    usage: RunUsage | None = None,
+    budget: RunBudget | None = None,
+    retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+    scheduler: RateLimitScheduler | None = None,
+    provider_pool: ProviderPool | None = None,
+    router: ModelRouter | None = None,
 ):
     """
     Agentic sampling loop for the assistant/tool interaction of computer use.
+
+    The tools of `tool_version` are created with their defaults, unless an already
+    configured `tool_collection` of the same version is given. Turns are recorded to
+    `recorder` if given. `progress_callback` is awaited with the turn number and the tool
+    calls of each response before they run, no tool calls meaning the final report.
+
+    What the run consumes is added to `usage`. Once it reaches a limit of `budget`, the
+    model is asked for its report in one last turn without tools, and the limit is kept
+    in `usage.stopped_by`.
+
+    Model calls that fail on rate limits, overloading or the connection are retried as
+    `retry_policy` says, see `call_with_retry`. With a `scheduler`, each turn first waits
+    for its estimated input tokens to fit the rate limits shared with other runs, the wait
+    is added to `usage.rate_limit_wait`, and hedged duplicates are charged to them too.
+
+    With a `provider_pool`, a turn that the preferred provider throttles, fails or is slow
+    to answer moves on to the next healthy provider of the pool, with the model id mapped
+    to it, instead of `provider`. The provider of each turn is kept in `usage.providers`.
+
+    With a `router`, each turn goes to the model it picks instead of `model`, a fast one for
+    routine turns and a strong one when the run looks stuck. A report written by the fast
+    model is thrown away and written again by the strong model.
     """
-    tool_collection = ToolCollection(
-        ComputerTool(),
-        BashTool(),
-        EditTool(),
-    )
+    tool_group = TOOL_GROUPS_BY_VERSION[tool_version]
+    if tool_collection is None:
+        tool_collection = ToolCollection(*(ToolCls() for ToolCls in tool_group.tools))
     system = (
         f"{SYSTEM_PROMPT}{' ' + system_prompt_suffix if system_prompt_suffix else ''}"
     )
+    if recorder:
+        await recorder.start()
+    if usage is None:
+        usage = RunUsage()
+    if provider_pool is None:
+        provider_pool = ProviderPool([provider])
+    turn_model = model
+
+    # one client per provider for the whole run, so its connections are reused from turn to turn
+    async with contextlib.AsyncExitStack() as exit_stack:
+        clients: dict[APIProvider, AsyncAnthropic | AsyncAnthropicVertex | AsyncAnthropicBedrock] = {}
+
+        async def send(provider: APIProvider):
+            if provider not in clients:
+                clients[provider] = await exit_stack.enter_async_context(
+                    _make_client(provider, api_key)
+                )
+            return await clients[provider].beta.messages.with_raw_response.create(
+                max_tokens=max_tokens,
+                messages=messages,
+                model=provider_pool.model_for(turn_model, provider),
+                system=system,
+                tools=tool_collection.to_params(),
+                tool_choice=tool_choice,
+                betas=[tool_group.beta_flag],
+            )
 
-    while True:
-        if only_n_most_recent_images:
-            _maybe_filter_to_n_most_recent_images(messages, only_n_most_recent_images)
-
-        if provider == APIProvider.ANTHROPIC:
-            client = Anthropic(api_key=api_key)
-        elif provider == APIProvider.VERTEX:
-            client = AnthropicVertex()
-        elif provider == APIProvider.BEDROCK:
-            client = AnthropicBedrock()
-
-        # Call the API
-        # we use raw_response to provide debug information to streamlit. Your
-        # implementation may be able call the SDK directly with:
-        # `response = client.messages.create(...)` instead.
-        raw_response = client.beta.messages.with_raw_response.create(
-            max_tokens=max_tokens,
-            messages=messages,
-            model=model,
-            system=system,
-            tools=tool_collection.to_params(),
-            betas=["computer-use-2024-10-22"],
-        )
+        while True:
+            if budget and usage.stopped_by is None:
+                usage.stopped_by = budget.exceeded(usage)
+                if usage.stopped_by:
+                    _ask_for_report(messages, BUDGET_REACHED_PROMPT.format(reason=usage.stopped_by))
+            tool_choice: Any = {"type": "none"} if usage.stopped_by else NOT_GIVEN
+            if router is not None:
+                tier, turn_model = router.model(final=usage.stopped_by is not None)
+
+            if only_n_most_recent_images:
+                with span("image_filter", "loop"):
+                    _maybe_filter_to_n_most_recent_images(messages, only_n_most_recent_images)
+
+            # let the tools get ready for the next turn while the model is thinking
+            tool_collection.prefetch()
+
+            on_hedge = None
+            if scheduler is not None and scheduler.limited:
+                estimated_tokens = estimate_input_tokens(
+                    messages, system, tool_collection.to_params()  # type: ignore[arg-type]
+                )
+                with span("rate_limit", "model", tokens=estimated_tokens):
+                    # the usage object stands for the run, its calls are queued together
+                    usage.rate_limit_wait += await scheduler.admit(id(usage), estimated_tokens)
+                # a hedge sends the turn again without waiting, its tokens count all the same
+                on_hedge = functools.partial(scheduler.charge, estimated_tokens)
+
+            # Call the API
+            # we use raw_response to provide debug information to streamlit. Your
+            # implementation may be able call the SDK directly with:
+            # `response = client.messages.create(...)` instead.
+            start = time.perf_counter()
+            with span("model", "model", model=turn_model), MODEL_LATENCY.time(model=turn_model):
+                try:
+                    raw_response, served_by = await call_with_retry(
+                        lambda: provider_pool.call(send), retry_policy, on_hedge
+                    )
+                except APIError:
+                    ERRORS.inc(kind="model")
+                    raise
+            TURNS.inc(provider=served_by)
+
+            response = raw_response.parse()
+            usage.add_response(response.usage, served_by)
+            input_tokens = (
+                response.usage.input_tokens
+                + (response.usage.cache_creation_input_tokens or 0)
+                + (response.usage.cache_read_input_tokens or 0)
+            )
+            if scheduler is not None and scheduler.limited:
+                scheduler.settle(estimated_tokens, input_tokens)
+            if router is not None:
+                router.record_response(
+                    tier, time.perf_counter() - start, input_tokens, response.usage.output_tokens
+                )
+                if tier == "fast" and not any(block.type == "tool_use" for block in response.content):
+                    # the fast model is done, but the report is the strong model's to write
+                    router.escalate("final report")
+                    continue
 
-        api_response_callback(cast(APIResponse[BetaMessage], raw_response))
+            api_response_callback(cast(APIResponse[BetaMessage], raw_response))
 
-        response = raw_response.parse()
+            messages.append(
+                {
+                    "role": "assistant",
+                    "content": cast(list[BetaContentBlockParam], response.content),
+                }
+            )
 
-        messages.append(
-            {
-                "role": "assistant",
-                "content": cast(list[BetaContentBlockParam], response.content),
-            }
-        )
+            tool_result_content: list[BetaToolResultBlockParam] = []
+            results: list[ToolResult] = []
+
+            # Collect all tool uses from this response to show together in overlay
+            tool_uses = []
+            for content_block in cast(list[BetaContentBlock], response.content):
+                output_callback(content_block)
+                if content_block.type == "tool_use":
+                    tool_uses.append((content_block.name, cast(dict[str, Any], content_block.input)))
+
+            # Show all tool actions together in overlay if callback provided
+            if tool_action_callback and tool_uses:
+                tool_action_callback(tool_uses)
+            if progress_callback:
+                await progress_callback(usage.turns, tool_uses)
+
+            # Execute the tools
+            for content_block in cast(list[BetaContentBlock], response.content):
+                if content_block.type == "tool_use":
+                    result = await tool_collection.run(
+                        name=content_block.name,
+                        tool_input=cast(dict[str, Any], content_block.input),
+                    )
+                    tool_result_content.append(
+                        _make_api_tool_result(result, content_block.id)
+                    )
+                    tool_output_callback(result, content_block.id)
+                    results.append(result)
+
+            if recorder:
+                await recorder.record_turn(
+                    [block.model_dump(mode="json", exclude_none=True) for block in response.content],
+                    results,
+                )
 
-        tool_result_content: list[BetaToolResultBlockParam] = []
+            if router is not None and tool_uses:
+                router.record_turn(tool_uses, results)
 
-        # Collect all tool uses from this response to show together in overlay
-        tool_uses = []
-        for content_block in cast(list[BetaContentBlock], response.content):
-            output_callback(content_block)
-            if content_block.type == "tool_use":
-                tool_uses.append((content_block.name, cast(dict[str, Any], content_block.input)))
+            if not tool_result_content or usage.stopped_by:
+                return messages
 
-        # Show all tool actions together in overlay if callback provided
-        if tool_action_callback and tool_uses:
-            tool_action_callback(tool_uses)
+            IMAGES_SENT.inc(usage.add_tool_results(tool_result_content))
+            messages.append({"content": tool_result_content, "role": "user"})
 
-        # Execute the tools
-        for content_block in cast(list[BetaContentBlock], response.content):
-            if content_block.type == "tool_use":
-                result = await tool_collection.run(
-                    name=content_block.name,
-                    tool_input=cast(dict[str, Any], content_block.input),
-                )
-                tool_result_content.append(
-                    _make_api_tool_result(result, content_block.id)
-                )
-                tool_output_callback(result, content_block.id)
 
-        if not tool_result_content:
-            return messages
+async def replay_loop(
+    *,
+    turns: list[RecordedTurn],
+    messages: list[BetaMessageParam],
+    tool_collection: ToolCollection,
+    output_callback: Callable[[BetaContentBlock], None],
+    tool_output_callback: Callable[[ToolResult, str], None],
+    tool_action_callback: Callable[[list[tuple[str, dict[str, Any]]]], None] | None = None,
+    tolerance: float = REPLAY_TOLERANCE,
+    usage: RunUsage | None = None,
+) -> list[RecordedTurn]:
+    """
+    Re-execute the tool calls of recorded turns without calling the model, for as long as
+    the screen matches the one each turn was recorded on and the tools do not fail where
+    they did not before. The final report is never replayed, the model writes it from the
+    live screen.
+
+    `messages` is extended with the replayed turns, so `sampling_loop` can carry on from
+    where the replay stopped. Images of the replayed results are counted in `usage`, as
+    they are sent to the model with the next turn. Returns the replayed turns, with their
+    live results.
+    """
+    computer = tool_collection.tool_map.get("computer")
+    if not isinstance(computer, ComputerTool):
+        return []
+
+    replayed: list[RecordedTurn] = []
+    loop = asyncio.get_running_loop()
+    for turn in turns:
+        if not turn.tool_uses or len(turn.results) != len(turn.tool_uses):
+            break
+
+        # the screen may still be loading, give it some time to catch up with the recording
+        deadline = loop.time() + REPLAY_SETTLE_TIMEOUT
+        recorded = bytes.fromhex(turn.fingerprint)
+        fingerprint = await computer.fingerprint()
+        while fingerprint_difference(recorded, fingerprint) > tolerance:
+            if loop.time() > deadline:
+                return replayed
+            fingerprint = await computer.fingerprint()
 
+        messages.append(
+            {"role": "assistant", "content": cast(list[BetaContentBlockParam], turn.content)}
+        )
+        for content_block in turn.content:
+            output_callback(cast(BetaContentBlock, content_block))
+        tool_uses = [(block["name"], block["input"]) for block in turn.tool_uses]
+        if tool_action_callback:
+            tool_action_callback(tool_uses)
+
+        tool_result_content: list[BetaToolResultBlockParam] = []
+        results: list[ToolResult] = []
+        diverged = False
+        for block, recorded_result in zip(turn.tool_uses, turn.results):
+            result = await tool_collection.run(name=block["name"], tool_input=block["input"])
+            tool_result_content.append(_make_api_tool_result(result, block["id"]))
+            tool_output_callback(result, block["id"])
+            results.append(result)
+            diverged = diverged or (bool(result.error) and not recorded_result["error"])
+        if usage:
+            usage.add_tool_results(tool_result_content)
         messages.append({"content": tool_result_content, "role": "user"})
+        replayed.append(
+            RecordedTurn(
+                fingerprint=fingerprint.hex(),
+                content=turn.content,
+                results=[summarize_result(result) for result in results],
+            )
+        )
+        if diverged:
+            break
+    return replayed
+
+
+def _make_client(
+    provider: APIProvider, api_key: str
+) -> AsyncAnthropic | AsyncAnthropicVertex | AsyncAnthropicBedrock:
+    # retries are left to `call_with_retry`
+    if provider == APIProvider.VERTEX:
+        return AsyncAnthropicVertex(max_retries=0)
+    if provider == APIProvider.BEDROCK:
+        return AsyncAnthropicBedrock(max_retries=0)
+    return AsyncAnthropic(api_key=api_key, max_retries=0)
 
 
 def _maybe_filter_to_n_most_recent_images(
@@ -197,6 +404,8 @@ def _maybe_filter_to_n_most_recent_images(
     images_to_remove = total_images - images_to_keep
     # for better cache behavior, we want to remove in chunks
     images_to_remove -= images_to_remove % min_removal_threshold
+    if images_to_remove > 0:
+        IMAGES_SKIPPED.inc(images_to_remove, reason="too_old")
 
     for tool_result in tool_result_blocks:
         if isinstance(tool_result.get("content"), list):
@@ -210,6 +419,20 @@ def _maybe_filter_to_n_most_recent_images(
             tool_result["content"] = new_content
 
 
+def _ask_for_report(messages: list[BetaMessageParam], prompt: str):
+    """Add `prompt` to the last user message, after the tool results it answers with."""
+    last_message = messages[-1]
+    if last_message["role"] != "user":
+        messages.append({"role": "user", "content": prompt})
+    elif isinstance(last_message["content"], str):
+        last_message["content"] = [
+            {"type": "text", "text": last_message["content"]},
+            {"type": "text", "text": prompt},
+        ]
+    else:
+        last_message["content"] = [*last_message["content"], {"type": "text", "text": prompt}]
+
+
 def _make_api_tool_result(
     result: ToolResult, tool_use_id: str
 ) -> BetaToolResultBlockParam:
@@ -0,0 +1,345 @@
+"""
+Process-wide counters, histograms and gauges of the server, in the Prometheus text format.
+
+Updating a metric takes a lock and a dictionary lookup, so the hooks stay on all the time.
+The metrics are served as the `metrics://server` MCP resource, and on a local HTTP endpoint
+when `QA_AGENT_METRICS_PORT` is set.
+"""
+
+import bisect
+import functools
+import inspect
+import math
+import os
+import subprocess
+import threading
+import time
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# upper bounds in seconds, from a quick tool call to a slow model turn
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf,
+)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if not self.labels:
+            return ()
+        return tuple([labels.get(name, "") for name in self.labels])
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, or is read from `callback` when the metrics are rendered."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        callback: Callable[[], float | None] | None = None,
+    ):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+        self.callback = callback
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> list[str]:
+        if self.callback is not None:
+            value = self.callback()
+            return [] if value is None else [f"{self.name} {_format_value(value)}"]
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class _HistogramValues:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * buckets
+        self.sum = 0.0
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: "Histogram", labels: dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = buckets if buckets[-1] == math.inf else (*buckets, math.inf)
+        self._values: dict[tuple[str, ...], _HistogramValues] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = _HistogramValues(len(self.buckets))
+            values.counts[bucket] += 1
+            values.sum += value
+
+    def time(self, **labels: str) -> _Timer:
+        """Observe the duration of the enclosed block."""
+        return _Timer(self, labels)
+
+    def samples(self) -> list[str]:
+        lines = []
+        with self._lock:
+            values = sorted(
+                (key, list(item.counts), item.sum) for key, item in self._values.items()
+            )
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+def timed(histogram: Histogram):
+    """Decorate a function or coroutine function to observe the duration of its calls."""
+
+    def decorate(function):
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with histogram.time():
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with histogram.time():
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric):
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def resident_memory_bytes() -> float | None:
+    """Resident memory of this process, from /proc on Linux and `ps` elsewhere."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        pass
+    try:
+        output = subprocess.run(
+            ["ps", "-o", "rss=", "-p", str(os.getpid())],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        return int(output.strip()) * 1024
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+RUNS = Counter("qa_runs_total", "QA runs by how they ended.", ("outcome",))
+ACTIVE_RUNS = Gauge("qa_active_runs", "QA runs in progress.")
+QUEUED_RUNS = Gauge("qa_queued_runs", "QA runs waiting for a free worker.")
+QUEUE_WAIT_SECONDS = Histogram(
+    "qa_queue_wait_seconds",
+    "Time QA runs waited for a free worker.",
+    buckets=(0.1, 1.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0),
+)
+CACHE_LOOKUPS = Counter(
+    "qa_cache_lookups_total",
+    "Report cache lookups: hit, miss, or refresh when a run was forced.",
+    ("result",),
+)
+TURNS = Counter("qa_turns_total", "Model turns, by the provider that served them.", ("provider",))
+MODEL_LATENCY = Histogram(
+    "qa_model_latency_seconds", "Time of model calls, including retries.", ("model",)
+)
+RETRIES = Counter(
+    "qa_model_retries_total",
+    "Retried model calls, by the status code or connection error that failed them.",
+    ("reason",),
+)
+HEDGED_REQUESTS = Counter(
+    "qa_hedged_requests_total",
+    "Hedged model calls sent, and whether the hedge or the original answered first.",
+    ("outcome",),
+)
+MODEL_ESCALATIONS = Counter(
+    "qa_model_escalations_total",
+    "Runs moved from the fast to the strong model, by what made them look stuck.",
+    ("reason",),
+)
+PROVIDER_FAILOVERS = Counter(
+    "qa_provider_failovers_total",
+    "Model calls moved to the next provider, by the provider that failed and why.",
+    ("provider", "reason"),
+)
+RATE_LIMITED_CALLS = Gauge(
+    "qa_rate_limited_calls", "Model calls waiting for the shared tokens and requests per minute."
+)
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "qa_rate_limit_wait_seconds",
+    "Time model calls waited for the shared tokens and requests per minute.",
+)
+TOOL_CALLS = Counter("qa_tool_calls_total", "Tool calls by tool and action.", ("tool", "action"))
+TOOL_LATENCY = Histogram("qa_tool_latency_seconds", "Time of tool calls.", ("tool",))
+ERRORS = Counter(
+    "qa_errors_total", "Failed tool calls, model calls and runs.", ("kind",)
+)
+IMAGES_SENT = Counter("qa_images_sent_total", "Screenshots sent to the model.")
+IMAGES_SKIPPED = Counter(
+    "qa_images_skipped_total",
+    "Screenshots not sent, because the screen did not change or they were dropped from "
+    "the conversation as too old.",
+    ("reason",),
+)
+CAPTURE_SECONDS = Histogram("qa_capture_seconds", "Time of screen captures.")
+ENCODE_SECONDS = Histogram(
+    "qa_encode_seconds", "Time of cropping, resizing and PNG encoding screenshots."
+)
+BASH_SECONDS = Histogram("qa_bash_command_seconds", "Time of bash tool commands.")
+RESIDENT_MEMORY = Gauge(
+    "qa_process_resident_memory_bytes",
+    "Resident memory of the server process.",
+    callback=resident_memory_bytes,
+)
+
+
+def serve_metrics(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve `GET /metrics` in a background thread, until the returned server is shut down."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            data = REGISTRY.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # stdout belongs to the MCP stdio transport
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,157 @@
+"""
+The providers the model is called on, and failing over between them. When the preferred
+provider throttles, is overloaded, fails or is slow, the turn is sent again, with the same
+messages, to the next healthy provider, and the failing provider is left alone for a while.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import TypeVar
+
+from anthropic import APIStatusError
+
+from .metrics import PROVIDER_FAILOVERS
+from .retry import failure_reason, retry_after
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+FAILOVER_COOLDOWN = 30.0  # seconds a failing provider is skipped, doubled on each failure in a row
+MAX_FAILOVER_COOLDOWN = 300.0
+LATENCY_SMOOTHING = 0.2  # weight of the latest call in a provider's average latency
+
+# errors of the request itself, that every provider would answer the same
+REQUEST_ERROR_STATUS_CODES = frozenset({400, 413, 422})
+
+
+class APIProvider(StrEnum):
+    ANTHROPIC = "anthropic"
+    BEDROCK = "bedrock"
+    VERTEX = "vertex"
+
+
+PROVIDER_TO_DEFAULT_MODEL_NAME: dict[APIProvider, str] = {
+    APIProvider.ANTHROPIC: "claude-3-5-sonnet-20241022",
+    APIProvider.BEDROCK: "anthropic.claude-3-5-sonnet-20241022-v2:0",
+    APIProvider.VERTEX: "claude-3-5-sonnet-v2@20241022",
+}
+
+
+def model_for_provider(model: str, provider: APIProvider) -> str:
+    """
+    The id of the Anthropic API `model` on `provider`, as in `claude-3-7-sonnet@20250219` on
+    Vertex and `anthropic.claude-3-7-sonnet-20250219-v1:0` on Bedrock.
+    """
+    if model == PROVIDER_TO_DEFAULT_MODEL_NAME[APIProvider.ANTHROPIC]:
+        return PROVIDER_TO_DEFAULT_MODEL_NAME[provider]
+    if provider == APIProvider.BEDROCK:
+        return f"anthropic.{model}-v1:0"
+    if provider == APIProvider.VERTEX:
+        dated = re.fullmatch(r"(.+)-(\d{8})", model)
+        return f"{dated[1]}@{dated[2]}" if dated else model
+    return model
+
+
+def _is_request_error(error: Exception) -> bool:
+    return isinstance(error, APIStatusError) and error.status_code in REQUEST_ERROR_STATUS_CODES
+
+
+@dataclass
+class ProviderHealth:
+    provider: APIProvider
+    failures: int = 0  # in a row
+    skip_until: float = 0.0  # monotonic time until which the provider is left alone
+    latency: float | None = None  # average seconds of its successful calls
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.skip_until
+
+    def record_success(self, latency: float):
+        self.failures = 0
+        self.skip_until = 0.0
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+
+    def record_failure(self, wait: float | None = None):
+        """Skip the provider for a cooldown, or as long as it asked to wait if that is longer."""
+        self.failures += 1
+        cooldown = min(MAX_FAILOVER_COOLDOWN, FAILOVER_COOLDOWN * 2 ** (self.failures - 1))
+        self.skip_until = time.monotonic() + max(cooldown, wait or 0.0)
+
+
+class ProviderPool:
+    """
+    Providers in order of preference, with the health of each shared by all runs of the
+    process.
+
+    A call that takes longer than `slow_after` seconds is given up on and sent to the next
+    healthy provider, if there is one. `models` overrides the model id on a provider, when
+    it is not the one `model_for_provider` derives.
+    """
+
+    def __init__(
+        self,
+        providers: Iterable[APIProvider],
+        slow_after: float | None = None,
+        models: dict[APIProvider, str] | None = None,
+    ):
+        self.providers = [ProviderHealth(provider) for provider in providers]
+        if not self.providers:
+            raise ValueError("A provider pool needs at least one provider")
+        self.slow_after = slow_after
+        self.models = models or {}
+
+    @property
+    def primary(self) -> APIProvider:
+        return self.providers[0].provider
+
+    def model_for(self, model: str, provider: APIProvider) -> str:
+        return self.models.get(provider) or model_for_provider(model, provider)
+
+    def candidates(self) -> list[ProviderHealth]:
+        """The healthy providers in order of preference, or else the one that recovers first."""
+        healthy = [health for health in self.providers if health.healthy]
+        return healthy or [min(self.providers, key=lambda health: health.skip_until)]
+
+    async def call(self, send: Callable[[APIProvider], Awaitable[T]]) -> tuple[T, APIProvider]:
+        """
+        `send` the request to the preferred healthy provider, and on to the next one when it
+        fails or is slow. Returns the response and the provider that served it. Errors of
+        the request itself, and the error of the last provider tried, are raised, so
+        `call_with_retry` can back off and try again.
+        """
+        candidates = self.candidates()
+        for index, health in enumerate(candidates):
+            last = index == len(candidates) - 1
+            start = time.monotonic()
+            try:
+                if last or self.slow_after is None:
+                    response = await send(health.provider)
+                else:
+                    response = await asyncio.wait_for(send(health.provider), self.slow_after)
+            except TimeoutError:
+                reason = "slow"
+                health.record_failure()
+            except Exception as error:
+                if _is_request_error(error):
+                    raise
+                reason = failure_reason(error)
+                health.record_failure(retry_after(error))
+                if last:
+                    raise
+            else:
+                health.record_success(time.monotonic() - start)
+                return response, health.provider
+            following = candidates[index + 1].provider
+            PROVIDER_FAILOVERS.inc(provider=health.provider, reason=reason)
+            logger.warning(f"Model call on {health.provider} failed ({reason}), moving to {following}")
+        raise AssertionError("unreachable")
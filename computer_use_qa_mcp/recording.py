@@ -0,0 +1,92 @@
+"""
+Recordings of QA runs: the screen before each model turn, the tool calls the model made and
+what they returned, so a later run of the same instructions can replay them without the model.
+"""
+
+import hashlib
+import json
+import logging
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from .tools import ComputerTool, ToolResult
+from .tools.edit_engine import atomic_write
+
+logger = logging.getLogger(__name__)
+
+RECORDING_FORMAT_VERSION = 2
+
+
+@dataclass
+class RecordedTurn:
+    fingerprint: str  # hex screen fingerprint from before the model's turn
+    content: list[dict[str, Any]]  # the model's message
+    results: list[dict[str, Any]]  # output, error and whether there was an image, per tool call
+
+    @property
+    def tool_uses(self) -> list[dict[str, Any]]:
+        return [block for block in self.content if block.get("type") == "tool_use"]
+
+
+def summarize_result(result: ToolResult) -> dict[str, Any]:
+    """What is kept of a tool result in a recording, screenshots are left out."""
+    return {
+        "output": result.output,
+        "error": result.error,
+        "has_image": result.base64_image is not None,
+    }
+
+
+def recording_path(directory: str | Path, instructions: str, tool_version: str, model: str) -> Path:
+    """Recordings are only replayed for the exact same instructions, tool version and model."""
+    key = hashlib.sha256(f"{tool_version}\n{model}\n{instructions}".encode()).hexdigest()
+    return Path(directory) / f"{key[:16]}.json"
+
+
+def load_recording(path: Path) -> list[RecordedTurn]:
+    """The turns recorded at `path`, none when there is no usable recording."""
+    try:
+        data = json.loads(path.read_text())
+        if data.get("version") != RECORDING_FORMAT_VERSION:
+            return []
+        return [RecordedTurn(**turn) for turn in data["turns"]]
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Ignoring unreadable recording {path}: {e}")
+        return []
+
+
+def save_recording(path: Path, turns: list[RecordedTurn]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {"version": RECORDING_FORMAT_VERSION, "turns": [asdict(turn) for turn in turns]}
+    atomic_write(path, json.dumps(data))
+
+
+class Recorder:
+    """Records the turns of a `sampling_loop` run, after the `turns` replayed before it."""
+
+    def __init__(self, computer: ComputerTool, turns: list[RecordedTurn] | None = None):
+        self.computer = computer
+        self.turns: list[RecordedTurn] = list(turns or [])
+        self._fingerprint: bytes | None = None
+
+    async def start(self):
+        """Fingerprint the screen the model's first turn will be made on."""
+        self._fingerprint = await self.computer.fingerprint()
+
+    async def record_turn(self, content: list[dict[str, Any]], results: list[ToolResult]):
+        """Record a model turn and its tool results, and fingerprint the screen for the next one."""
+        if self._fingerprint is None:
+            await self.start()
+        self.turns.append(
+            RecordedTurn(
+                fingerprint=self._fingerprint.hex(),  # type: ignore[union-attr]
+                content=content,
+                results=[summarize_result(result) for result in results],
+            )
+        )
+        if results:
+            self._fingerprint = await self.computer.fingerprint()
+
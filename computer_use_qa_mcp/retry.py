@@ -0,0 +1,164 @@
+"""
+Retries for model calls, so a rate limit, an overloaded API or a dropped connection costs a
+QA run a few seconds instead of the whole run.
+
+The SDK's own retries are turned off (`max_retries=0` on the client) so that the attempts,
+delays and hedges are all decided here, and show up in the metrics.
+"""
+
+import asyncio
+import email.utils
+import logging
+import random
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import TypeVar
+
+from anthropic import APIConnectionError, APIStatusError
+
+from .metrics import HEDGED_REQUESTS, RETRIES
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 408 request timeout, 409 conflict, 429 rate limited, 5xx server errors and 529 overloaded
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    How model calls are retried.
+
+    Attempts wait a random time up to `base_delay * 2 ** attempt` seconds, capped at
+    `max_delay` ("full jitter"), or as long as the API asks for with a retry-after header.
+
+    With `hedge_after`, a second identical request is sent when the first one has not
+    answered after that many seconds, and whichever answers first is used. It trades some
+    duplicate tokens for a shorter tail latency.
+    """
+
+    max_attempts: int = 6
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+    hedge_after: float | None = None
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, APIConnectionError):  # includes timeouts and connection resets
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or (
+            # the API may report overloading in the body of another status
+            isinstance(error.body, dict)
+            and error.body.get("error", {}).get("type") == "overloaded_error"
+        )
+    return False
+
+
+def retry_after(error: BaseException) -> float | None:
+    """The seconds the API asked to wait before retrying, from the retry-after headers."""
+    if not isinstance(error, APIStatusError):
+        return None
+    headers = error.response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            value = headers["retry-after"]
+            try:
+                return float(value)
+            except ValueError:
+                date = email.utils.parsedate_to_datetime(value)
+                return max(0.0, date.timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def failure_reason(error: BaseException) -> str:
+    """The status code that failed a call, or `connection`, as a metric label."""
+    if isinstance(error, APIStatusError):
+        return str(error.status_code)
+    if isinstance(error, APIConnectionError):
+        return "connection"
+    return type(error).__name__
+
+
+def backoff_delay(policy: RetryPolicy, attempt: int, error: BaseException) -> float:
+    """Seconds to wait before retrying after the `attempt`th failure, counting from 0."""
+    requested = retry_after(error)
+    if requested is not None:
+        return min(requested, policy.max_delay)
+    return random.uniform(0, min(policy.max_delay, policy.base_delay * 2**attempt))
+
+
+async def hedged(
+    request: Callable[[], Awaitable[T]],
+    hedge_after: float,
+    on_hedge: Callable[[], None] | None = None,
+) -> T:
+    """
+    Send `request`, and a second one if the first has not answered after `hedge_after`
+    seconds, calling `on_hedge` as it is sent. Returns the first successful answer, or
+    raises the first error if both fail.
+    """
+    first = asyncio.ensure_future(request())
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done:
+            HEDGED_REQUESTS.inc(outcome="sent")
+            if on_hedge is not None:
+                on_hedge()
+            tasks.add(asyncio.ensure_future(request()))
+        errors: list[BaseException] = []
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                error = task.exception()
+                if error is None:
+                    if len(tasks) > 1:
+                        outcome = "original_won" if task is first else "hedge_won"
+                        HEDGED_REQUESTS.inc(outcome=outcome)
+                    return task.result()
+                errors.append(error)
+        raise errors[0]
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def call_with_retry(
+    request: Callable[[], Awaitable[T]],
+    policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+    on_hedge: Callable[[], None] | None = None,
+) -> T:
+    """
+    Call `request` until it succeeds, a non retryable error is raised, or the attempts run
+    out. `request` must send the same request on every call, so a retried turn is the same
+    turn and the conversation is only extended once it succeeded. `on_hedge` is called for
+    every hedged duplicate sent, see `hedged`.
+    """
+    for attempt in range(policy.max_attempts):
+        try:
+            if policy.hedge_after is not None:
+                return await hedged(request, policy.hedge_after, on_hedge)
+            return await request()
+        except Exception as error:
+            if not is_retryable(error) or attempt == policy.max_attempts - 1:
+                raise
+            delay = backoff_delay(policy, attempt, error)
+            RETRIES.inc(reason=failure_reason(error))
+            logger.warning(
+                f"Model call failed ({error.__class__.__name__}: {error}), "
+                f"retry {attempt + 1} of {policy.max_attempts - 1} in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
@@ -0,0 +1,150 @@
+"""
+Routing the turns of a run between a fast model and a strong one. Most turns of a QA run
+are routine, a click and a look at the screen, and go to the fast model. When it looks
+confused, repeating itself, running into tool errors or getting nowhere, the run escalates
+to the strong model and stays there. The final report is always the strong model's.
+"""
+
+import hashlib
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Literal
+
+from .metrics import MODEL_ESCALATIONS
+from .tools import ToolResult
+from .usage import model_cost
+
+logger = logging.getLogger(__name__)
+
+Tier = Literal["fast", "strong"]
+
+
+@dataclass(frozen=True)
+class RoutingPolicy:
+    """
+    `fast_model` takes the turns until one of these escalates the run to `strong_model`, for
+    the rest of the run, or for `strong_turns` turns if given:
+
+    - the same tool calls `repeat_limit` turns in a row
+    - `error_limit` tool errors within the last `error_window` turns
+    - `stall_turns` turns in a row without progress, a screen not seen before in the run
+      or the output of a tool other than the computer
+    """
+
+    fast_model: str
+    strong_model: str
+    repeat_limit: int = 3
+    error_limit: int = 2
+    error_window: int = 4
+    stall_turns: int = 5
+    strong_turns: int | None = None
+
+
+@dataclass
+class TierStats:
+    model: str
+    turns: int = 0
+    seconds: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def cost(self) -> float | None:
+        """Cost in USD of the tokens of the tier, None if the price of its model is not known."""
+        return model_cost(self.model, self.input_tokens, self.output_tokens)
+
+    def __str__(self) -> str:
+        average = self.seconds / self.turns if self.turns else 0.0
+        cost = self.cost
+        return (
+            f"{self.model} {self.turns} turns, {average:.1f}s per turn, "
+            f"{self.input_tokens:,} input and {self.output_tokens:,} output tokens"
+            + (f", ${cost:.2f}" if cost is not None else "")
+        )
+
+
+def _action_key(tool_use: tuple[str, dict[str, Any]]) -> str:
+    name, tool_input = tool_use
+    return f"{name}:{sorted(tool_input.items())!r}"
+
+
+class ModelRouter:
+    """The routing of one run, it decides the model of each turn from the turns before it."""
+
+    def __init__(self, policy: RoutingPolicy):
+        self.policy = policy
+        self.stats: dict[Tier, TierStats] = {
+            "fast": TierStats(policy.fast_model),
+            "strong": TierStats(policy.strong_model),
+        }
+        self.escalations: list[str] = []  # the reason of each escalation
+        self._strong_turns_left: int | None = 0  # None for the rest of the run
+        self._actions: deque[tuple[str, ...]] = deque(maxlen=policy.repeat_limit)
+        self._errors: deque[int] = deque(maxlen=policy.error_window)
+        self._stalled = 0
+        self._screens: set[bytes] = set()
+
+    @property
+    def tier(self) -> Tier:
+        if self._strong_turns_left is None or self._strong_turns_left > 0:
+            return "strong"
+        return "fast"
+
+    def model(self, final: bool = False) -> tuple[Tier, str]:
+        """The tier and model of the next turn, the strong one for the `final` report."""
+        tier: Tier = "strong" if final else self.tier
+        return tier, self.stats[tier].model
+
+    def escalate(self, reason: str):
+        """Send the rest of the turns, or the next `strong_turns` turns, to the strong model."""
+        if self.tier == "fast":
+            self.escalations.append(reason)
+            MODEL_ESCALATIONS.inc(reason=reason)
+            logger.info(f"Escalating to {self.policy.strong_model}: {reason}")
+        self._strong_turns_left = self.policy.strong_turns
+        # the strong model starts from a clean slate, so it is not escalated again at once
+        self._actions.clear()
+        self._errors.clear()
+        self._stalled = 0
+
+    def record_response(self, tier: Tier, seconds: float, input_tokens: int, output_tokens: int):
+        stats = self.stats[tier]
+        stats.turns += 1
+        stats.seconds += seconds
+        stats.input_tokens += input_tokens
+        stats.output_tokens += output_tokens
+
+    def record_turn(self, tool_uses: list[tuple[str, dict[str, Any]]], results: list[ToolResult]):
+        """Look at the tool calls of a turn and their results, and escalate if the run looks stuck."""
+        if self._strong_turns_left:
+            self._strong_turns_left -= 1
+
+        self._actions.append(tuple(_action_key(tool_use) for tool_use in tool_uses))
+        self._errors.append(sum(1 for result in results if result.error))
+        progress = False
+        for (name, _), result in zip(tool_uses, results):
+            if result.error:
+                continue
+            if result.base64_image:
+                screen = hashlib.blake2b(result.base64_image.encode(), digest_size=16).digest()
+                progress |= screen not in self._screens
+                self._screens.add(screen)
+            elif name != "computer" and result.output:
+                progress = True
+        self._stalled = 0 if progress else self._stalled + 1
+
+        if self.tier == "strong":
+            return
+        if len(self._actions) == self.policy.repeat_limit and len(set(self._actions)) == 1:
+            self.escalate("repeated actions")
+        elif sum(self._errors) >= self.policy.error_limit:
+            self.escalate("tool errors")
+        elif self._stalled >= self.policy.stall_turns:
+            self.escalate("no progress")
+
+    def summary(self) -> str:
+        tiers = "; ".join(f"{tier} {stats}" for tier, stats in self.stats.items() if stats.turns)
+        if not self.escalations:
+            return f"{tiers}, not escalated"
+        return f"{tiers}, escalated {len(self.escalations)} times ({', '.join(self.escalations)})"
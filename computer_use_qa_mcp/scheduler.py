@@ -0,0 +1,216 @@
+"""
+A process-wide scheduler for model calls, so runs sharing one API key take turns within its
+tokens and requests per minute instead of all running into the rate limit and backing off
+together.
+
+Each call is admitted once its estimated input tokens and one request fit the buckets. Calls
+that have to wait are served round robin across runs, so one run with large requests cannot
+hold back the others, and a run cannot overtake its own earlier calls.
+"""
+
+import asyncio
+import base64
+import binascii
+import json
+import struct
+import time
+from collections import deque
+from collections.abc import Hashable, Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+from .metrics import RATE_LIMIT_WAIT_SECONDS, RATE_LIMITED_CALLS
+
+CHARS_PER_TOKEN = 4  # rough, errs on the high side for English and code
+IMAGE_PIXELS_PER_TOKEN = 750
+DEFAULT_IMAGE_TOKENS = 1600  # the most an image is billed for, when its size is unknown
+
+
+def image_tokens(data: str) -> int:
+    """Tokens of a base64 PNG, from its width and height, read from the IHDR chunk."""
+    try:
+        header = base64.b64decode(data[:32])
+    except (binascii.Error, ValueError):
+        return DEFAULT_IMAGE_TOKENS
+    if len(header) < 24 or header[:8] != b"\x89PNG\r\n\x1a\n":
+        return DEFAULT_IMAGE_TOKENS
+    width, height = struct.unpack(">II", header[16:24])
+    return max(1, width * height // IMAGE_PIXELS_PER_TOKEN)
+
+
+def _content_tokens(content: Any) -> int:
+    if isinstance(content, str):
+        return len(content) // CHARS_PER_TOKEN
+    if not isinstance(content, list):
+        return 0
+    tokens = 0
+    for block in content:
+        if not isinstance(block, dict):
+            # content blocks of a parsed response, as appended by the sampling loop
+            block = block.model_dump(exclude_none=True)
+        if block.get("type") == "image":
+            source = block.get("source", {})
+            if source.get("type") == "base64":
+                tokens += image_tokens(source["data"])
+            else:
+                tokens += DEFAULT_IMAGE_TOKENS
+        elif block.get("type") == "text":
+            tokens += len(block["text"]) // CHARS_PER_TOKEN
+        elif block.get("type") == "tool_result":
+            tokens += _content_tokens(block.get("content"))
+        else:  # tool_use and others, small enough to count as JSON
+            tokens += len(json.dumps(block, default=str)) // CHARS_PER_TOKEN
+    return tokens
+
+
+def estimate_input_tokens(
+    messages: Iterable[dict[str, Any]], system: str = "", tools: Iterable[dict[str, Any]] = ()
+) -> int:
+    """Estimate the input tokens of a request, text by its length and images by their size."""
+    tokens = len(system) // CHARS_PER_TOKEN
+    tokens += len(json.dumps(list(tools))) // CHARS_PER_TOKEN
+    for message in messages:
+        tokens += _content_tokens(message["content"])
+    return tokens
+
+
+class TokenBucket:
+    """
+    `per_minute` units that refill continuously, and may all be spent at once. None for no
+    limit.
+    """
+
+    def __init__(self, per_minute: float | None):
+        self.capacity = per_minute
+        self.level = per_minute or 0.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.capacity is not None:
+            self.level = min(
+                self.capacity, self.level + (now - self.updated) * self.capacity / 60
+            )
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken, a request larger than the bucket waits for a full one."""
+        if self.capacity is None:
+            return 0.0
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * 60 / self.capacity)
+
+    def take(self, amount: float):
+        """Take `amount`, a negative amount gives back. The level may go below 0, as debt."""
+        if self.capacity is None:
+            return
+        self._refill()
+        self.level = min(self.capacity, self.level - min(amount, self.capacity))
+
+
+@dataclass(eq=False)
+class _Pending:
+    tokens: int
+    future: asyncio.Future = field(repr=False)
+
+
+class RateLimitScheduler:
+    """Admits model calls within `tokens_per_minute` input tokens and `requests_per_minute`."""
+
+    def __init__(
+        self, tokens_per_minute: float | None = None, requests_per_minute: float | None = None
+    ):
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.requests = TokenBucket(requests_per_minute)
+        # runs with calls waiting, in the order they are served, each with its calls in order
+        self._queues: dict[Hashable, deque[_Pending]] = {}
+        self._wakeup: asyncio.TimerHandle | None = None
+
+    @property
+    def limited(self) -> bool:
+        return self.tokens.capacity is not None or self.requests.capacity is not None
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def admit(self, run: Hashable, tokens: int) -> float:
+        """Wait until a call of `run` with `tokens` input tokens may be sent. Returns the seconds waited."""
+        if not self._queues and not self._wait_time(tokens):
+            self._take(tokens)
+            return 0.0
+
+        start = time.monotonic()
+        pending = _Pending(tokens, asyncio.get_running_loop().create_future())
+        self._queues.setdefault(run, deque()).append(pending)
+        RATE_LIMITED_CALLS.inc()
+        admitted = False
+        try:
+            self._dispatch()
+            await pending.future
+            admitted = True
+        finally:
+            RATE_LIMITED_CALLS.dec()
+            if not admitted:
+                self._withdraw(run, pending)
+        waited = time.monotonic() - start
+        RATE_LIMIT_WAIT_SECONDS.observe(waited)
+        return waited
+
+    def charge(self, tokens: int):
+        """
+        Take a request of `tokens` input tokens sent without being admitted, such as a hedge
+        duplicating an admitted call. The buckets may go into debt, delaying the next calls.
+        """
+        self._take(tokens)
+
+    def settle(self, estimated: int, actual: int):
+        """Correct the token bucket by the input tokens a call was actually billed for."""
+        self.tokens.take(actual - estimated)
+
+    def _withdraw(self, run: Hashable, pending: _Pending):
+        """Take back a call that was cancelled, giving back its reservation if it got one."""
+        queue = self._queues.get(run)
+        if queue is not None and pending in queue:
+            queue.remove(pending)
+            if not queue:
+                del self._queues[run]
+        elif pending.future.done() and not pending.future.cancelled():
+            # admitted, but cancelled before the call could be sent
+            self.tokens.take(-pending.tokens)
+            self.requests.take(-1)
+        self._dispatch()
+
+    def _wait_time(self, tokens: int) -> float:
+        return max(self.tokens.wait_time(tokens), self.requests.wait_time(1))
+
+    def _take(self, tokens: int):
+        self.tokens.take(tokens)
+        self.requests.take(1)
+
+    def _dispatch(self):
+        """Admit waiting calls for as long as they fit, then wake up when the next one will."""
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+        while self._queues:
+            run, queue = next(iter(self._queues.items()))
+            pending = queue[0]
+            if pending.future.cancelled():
+                # its task has not run yet to take it out of the queue
+                queue.popleft()
+                if not queue:
+                    del self._queues[run]
+                continue
+            wait = self._wait_time(pending.tokens)
+            if wait > 0:
+                self._wakeup = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            self._take(pending.tokens)
+            queue.popleft()
+            # the run goes to the back of the line, behind the runs that waited meanwhile
+            del self._queues[run]
+            if queue:
+                self._queues[run] = queue
+            pending.future.set_result(None)
@@ -1,16 +1,62 @@
+import argparse
 import asyncio
 import base64
+import contextlib
 import json
 import logging
 import os
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
 from typing import Any, Dict, List, Optional, Literal, cast
-from mcp.server.fastmcp import FastMCP
-import pyautogui
-
-from computer_use_qa_mcp.tools import BashTool, ComputerTool, EditTool, ToolResult
-from computer_use_qa_mcp.loop import sampling_loop, APIProvider
+from collections.abc import Awaitable, Callable
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.server.fastmcp.exceptions import ToolError
+
+from computer_use_qa_mcp.tools import (
+    TOOL_GROUPS_BY_VERSION,
+    ComputerTool,
+    ToolCollection,
+    ToolResult,
+    ToolVersion,
+    WaitForTool,
+)
+from computer_use_qa_mcp.tools.computer import AUTO_SCREENSHOT_ACTIONS, GUIBackend
+from computer_use_qa_mcp.loop import replay_loop, sampling_loop
+from computer_use_qa_mcp.providers import APIProvider, ProviderPool
+from computer_use_qa_mcp.metrics import (
+    ACTIVE_RUNS,
+    CACHE_LOOKUPS,
+    ERRORS,
+    REGISTRY,
+    RUNS,
+    serve_metrics,
+)
+from computer_use_qa_mcp.recording import (
+    Recorder,
+    load_recording,
+    recording_path,
+    save_recording,
+)
 from computer_use_qa_mcp.tools import ToolResult
 from computer_use_qa_mcp.tools.overlay import get_overlay, cleanup_overlay
+from computer_use_qa_mcp.simulator import VirtualDisplay
+from computer_use_qa_mcp.cache import (
+    DEFAULT_MAX_BYTES,
+    DEFAULT_TTL_SECONDS,
+    CachedReport,
+    KeyLocks,
+    ResultCache,
+    cache_key,
+)
+from computer_use_qa_mcp.jobs import Job, get_job_registry
+from computer_use_qa_mcp.retry import DEFAULT_RETRY_POLICY, RetryPolicy
+from computer_use_qa_mcp.routing import ModelRouter, RoutingPolicy
+from computer_use_qa_mcp.scheduler import RateLimitScheduler
+from computer_use_qa_mcp.steps import preprocess, run_steps, steps_context
+from computer_use_qa_mcp.tracing import Trace
+from computer_use_qa_mcp.usage import RunBudget, RunUsage
+from computer_use_qa_mcp.workers import WorkerPool
 from anthropic.types.beta import BetaMessage, BetaMessageParam
 from anthropic import APIResponse
 
@@ -26,6 +72,13 @@ Action = Literal[
     "double_click",
     "screenshot",
     "cursor_position",
+    "left_mouse_down",
+    "left_mouse_up",
+    "scroll",
+    "hold_key",
+    "wait",
+    "triple_click",
+    "zoom",
 ]
 
 Command = Literal[
@@ -47,14 +100,218 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize tools
-computer_tool = ComputerTool()
-bash_tool = BashTool()
-edit_tool = EditTool()
-
 # Initialize overlay
 overlay = get_overlay()
 
+DEFAULT_MAX_TURNS = 100  # model turns of a run, unless QA_AGENT_MAX_TURNS says otherwise
+CANCEL_TIMEOUT = 10.0  # seconds to wait for a cancelled run to clean up
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_number(name: str, default: float | None = None) -> float | None:
+    value = os.getenv(name, "").strip()
+    if not value:
+        return default
+    number = float(value)
+    return number if number > 0 else None
+
+
+def resolve_tool_version(tool_version: str | None = None) -> ToolVersion:
+    """The tool version of a run, `tool_version` if given, otherwise from the environment."""
+    tool_version = tool_version or os.getenv("QA_AGENT_TOOL_VERSION", "computer_use_20241022")
+    if tool_version not in TOOL_GROUPS_BY_VERSION:
+        raise ToolError(
+            f"Unknown tool version {tool_version!r}, it should be one of "
+            f"{', '.join(TOOL_GROUPS_BY_VERSION)} (set by the tool_version argument or QA_AGENT_TOOL_VERSION)"
+        )
+    return cast(ToolVersion, tool_version)
+
+
+def make_run_budget() -> RunBudget:
+    """The limits of a run, configured from the environment. 0 turns a limit off."""
+    max_turns = _env_number("QA_AGENT_MAX_TURNS", DEFAULT_MAX_TURNS)
+    max_tokens = _env_number("QA_AGENT_MAX_RUN_TOKENS")
+    return RunBudget(
+        max_turns=int(max_turns) if max_turns else None,
+        max_tokens=int(max_tokens) if max_tokens else None,
+        max_seconds=_env_number("QA_AGENT_MAX_RUN_SECONDS"),
+    )
+
+
+def make_retry_policy() -> RetryPolicy:
+    """How model calls are retried, configured from the environment."""
+    max_retries = os.getenv("QA_AGENT_MAX_RETRIES")
+    return RetryPolicy(
+        max_attempts=(
+            int(max_retries) + 1 if max_retries else DEFAULT_RETRY_POLICY.max_attempts
+        ),
+        hedge_after=_env_number("QA_AGENT_HEDGE_AFTER_SECONDS"),
+    )
+
+
+def make_worker_pool() -> WorkerPool:
+    """
+    The workers for runs, configured from the environment. The real screen can only take one
+    run at a time, simulated displays as many as there are workers.
+    """
+    simulated = _env_flag("QA_AGENT_SIMULATED_DISPLAY")
+    size = int(os.getenv("QA_AGENT_WORKERS", "1"))
+    if size > 1 and not simulated:
+        logger.warning("QA_AGENT_WORKERS is %d, but runs on the real screen take turns", size)
+        size = 1
+    max_queued = os.getenv("QA_AGENT_MAX_QUEUED_RUNS")
+    return WorkerPool(
+        size=size,
+        make_gui=VirtualDisplay if simulated else lambda: None,
+        max_queued=int(max_queued) if max_queued else None,
+    )
+
+
+_worker_pool: WorkerPool | None = None
+
+
+def get_worker_pool() -> WorkerPool:
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = make_worker_pool()
+    return _worker_pool
+
+
+def make_model_router(model: str) -> ModelRouter | None:
+    """
+    Routing of routine turns to `QA_AGENT_FAST_MODEL`, and of the turns where the run looks
+    stuck and the report to `model`. None, for every turn on `model`, if no fast model is set.
+    """
+    fast_model = os.getenv("QA_AGENT_FAST_MODEL")
+    if not fast_model or fast_model == model:
+        return None
+    return ModelRouter(RoutingPolicy(fast_model=fast_model, strong_model=model))
+
+
+def make_result_cache() -> ResultCache | None:
+    """The cache of reports, configured from the environment. None unless QA_AGENT_CACHE_DIR is set."""
+    directory = os.getenv("QA_AGENT_CACHE_DIR")
+    if not directory:
+        return None
+    ttl_seconds = _env_number("QA_AGENT_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)
+    max_mb = _env_number("QA_AGENT_CACHE_MAX_MB")
+    return ResultCache(
+        directory,
+        ttl_seconds=ttl_seconds or DEFAULT_TTL_SECONDS,
+        max_bytes=int(max_mb * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES,
+    )
+
+
+_provider_pool: ProviderPool | None = None
+
+
+def get_provider_pool() -> ProviderPool:
+    """
+    The providers to call the model on, in order of preference, configured from the
+    environment. Their health is shared by all runs of this process.
+    """
+    global _provider_pool
+    if _provider_pool is None:
+        names = os.getenv("QA_AGENT_PROVIDERS") or APIProvider.ANTHROPIC
+        providers = [APIProvider(name.strip().lower()) for name in names.split(",") if name.strip()]
+        models = {
+            provider: os.environ[f"QA_AGENT_{provider.upper()}_MODEL"]
+            for provider in providers
+            if os.getenv(f"QA_AGENT_{provider.upper()}_MODEL")
+        }
+        _provider_pool = ProviderPool(
+            providers,
+            slow_after=_env_number("QA_AGENT_PROVIDER_SLOW_SECONDS"),
+            models=models,
+        )
+    return _provider_pool
+
+
+_scheduler: RateLimitScheduler | None = None
+_cache_locks = KeyLocks()  # of the runs that may cache their report, by cache key
+
+
+def get_scheduler() -> RateLimitScheduler:
+    """The rate limits all runs of this process share, configured from the environment."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RateLimitScheduler(
+            tokens_per_minute=_env_number("QA_AGENT_TOKENS_PER_MINUTE"),
+            requests_per_minute=_env_number("QA_AGENT_REQUESTS_PER_MINUTE"),
+        )
+    return _scheduler
+
+
+def make_tool_collection(tool_version: ToolVersion, gui: GUIBackend | None = None) -> ToolCollection:
+    """Create the tools for a run, configured from the environment, driving `gui` if given."""
+    auto_screenshot_actions = os.getenv("QA_AGENT_AUTO_SCREENSHOT_ACTIONS")
+    max_image_tokens = os.getenv("QA_AGENT_MAX_IMAGE_TOKENS")
+    tools = []
+    for ToolCls in TOOL_GROUPS_BY_VERSION[tool_version].tools:
+        if issubclass(ToolCls, ComputerTool):
+            tools.append(
+                ToolCls(
+                    auto_screenshot=_env_flag("QA_AGENT_AUTO_SCREENSHOT"),
+                    auto_screenshot_actions=(
+                        frozenset(a.strip() for a in auto_screenshot_actions.split(","))
+                        if auto_screenshot_actions
+                        else AUTO_SCREENSHOT_ACTIONS
+                    ),
+                    auto_screenshot_only_if_changed=_env_flag(
+                        "QA_AGENT_AUTO_SCREENSHOT_ONLY_IF_CHANGED"
+                    ),
+                    speculative_capture=_env_flag("QA_AGENT_SPECULATIVE_CAPTURE"),
+                    capture_mode=os.getenv("QA_AGENT_CAPTURE_MODE", "screen"),  # type: ignore[arg-type]
+                    max_image_tokens=(
+                        int(max_image_tokens) if max_image_tokens else None
+                    ),
+                    gui=gui,
+                )
+            )
+        else:
+            tools.append(ToolCls())
+    if _env_flag("QA_AGENT_WAIT_FOR_TOOL"):
+        computer = next(tool for tool in tools if isinstance(tool, ComputerTool))
+        tools.append(WaitForTool(computer))
+    return ToolCollection(*tools)
+
+
+def run_settings(
+    model: str,
+    tool_version: ToolVersion,
+    budget: RunBudget,
+    router: ModelRouter | None,
+    provider_pool: ProviderPool,
+) -> dict[str, Any]:
+    """
+    The settings of a run that shape its report, for the key of the report cache. Settings
+    that only change how fast a run is, such as retries or speculative capture, are left out.
+    """
+    auto_screenshot_actions = os.getenv("QA_AGENT_AUTO_SCREENSHOT_ACTIONS")
+    actions = (
+        {a.strip() for a in auto_screenshot_actions.split(",")}
+        if auto_screenshot_actions
+        else AUTO_SCREENSHOT_ACTIONS
+    )
+    return {
+        "model": model,
+        "tool_version": tool_version,
+        "routing": asdict(router.policy) if router else None,
+        "budget": asdict(budget),
+        "providers": [health.provider for health in provider_pool.providers],
+        "provider_models": provider_pool.models,
+        "simulated_display": _env_flag("QA_AGENT_SIMULATED_DISPLAY"),
+        "auto_screenshot": _env_flag("QA_AGENT_AUTO_SCREENSHOT"),
+        "auto_screenshot_actions": sorted(actions),
+        "auto_screenshot_only_if_changed": _env_flag("QA_AGENT_AUTO_SCREENSHOT_ONLY_IF_CHANGED"),
+        "capture_mode": os.getenv("QA_AGENT_CAPTURE_MODE", "screen"),
+        "max_image_tokens": os.getenv("QA_AGENT_MAX_IMAGE_TOKENS") or None,
+        "wait_for_tool": _env_flag("QA_AGENT_WAIT_FOR_TOOL"),
+    }
+
 
 def format_tool_action(tool_name: str, tool_input: dict) -> str:
     """
@@ -80,12 +337,40 @@ def format_tool_action(tool_name: str, tool_input: dict) -> str:
             if coordinate:
                 return f"mouse_move ({coordinate[0]}, {coordinate[1]})"
             return "mouse_move"
-        elif action == "left_click":
-            return "click"
-        elif action == "right_click":
-            return "right click"
-        elif action == "double_click":
-            return "double click"
+        elif action in (
+            "left_click",
+            "right_click",
+            "middle_click",
+            "double_click",
+            "triple_click",
+        ):
+            label = {
+                "left_click": "click",
+                "right_click": "right click",
+                "middle_click": "middle click",
+                "double_click": "double click",
+                "triple_click": "triple click",
+            }[action]
+            if text:
+                label = f"{text}+{label}"
+            if coordinate:
+                return f"{label} ({coordinate[0]}, {coordinate[1]})"
+            return label
+        elif action == "scroll":
+            direction = tool_input.get("scroll_direction", "")
+            amount = tool_input.get("scroll_amount", "")
+            return f"scroll {direction} {amount}".rstrip()
+        elif action == "hold_key":
+            return f"hold {text} for {tool_input.get('duration', '')}s"
+        elif action == "left_mouse_down":
+            return "mouse down"
+        elif action == "left_mouse_up":
+            return "mouse up"
+        elif action == "wait":
+            return f"⏳ wait {tool_input.get('duration', '')}s"
+        elif action == "zoom":
+            region = tool_input.get("region", [])
+            return f"🔍 zoom {region}"
         elif action == "type":
             return f'type "{text}"'
         elif action == "key":
@@ -110,7 +395,12 @@ def format_tool_action(tool_name: str, tool_input: dict) -> str:
         else:
             return f"{action}" + (f" {text}" if text else "")
 
-    elif tool_name == "str_replace_editor":
+    elif tool_name == "wait_for":
+        condition = tool_input.get("condition", "")
+        text = tool_input.get("text", "")
+        return f"⏳ wait for {condition}" + (f' "{text}"' if text else "")
+
+    elif tool_name in ("str_replace_editor", "str_replace_based_edit_tool"):
         command = tool_input.get("command", "")
         path = tool_input.get("path", "")
 
@@ -132,7 +422,14 @@ def format_tool_action(tool_name: str, tool_input: dict) -> str:
 
 
 @mcp.tool()
-async def run_quality_assurance(instructions_absolute_file_path: str) -> str:
+async def run_quality_assurance(
+    instructions_absolute_file_path: str,
+    tool_version: ToolVersion | None = None,
+    build_fingerprint: str | None = None,
+    force_refresh: bool = False,
+    *,
+    ctx: Context,
+) -> str:
     """
     This tool runs a quality assurance agent that and see and interact with the user screen to test the
     application.
@@ -143,16 +440,147 @@ async def run_quality_assurance(instructions_absolute_file_path: str) -> str:
     from progressing.
 
     Use this tool every time after finishing a new feature or bug fix to ensure the application is working as expected.
+    Each turn is reported as a progress notification, and cancelling the call stops the agent right away.
 
     Args:
         instructions_absolute_file_path: The absolute path to the file containing the instructions for the QA agent.
+        tool_version: Optional computer use tool version to run with, defaults to the QA_AGENT_TOOL_VERSION
+            environment variable or computer_use_20241022. computer_use_20250124 adds clicking at a coordinate,
+            scrolling and waiting, which takes fewer turns. computer_use_20251124 adds zooming into a region.
+        build_fingerprint: Optional fingerprint of the build under test, such as the git commit or a hash of the
+            app's assets. If the server has a report cache, the report of an earlier run of the same instructions
+            on the same build is returned instead of running the agent again.
+        force_refresh: Run the agent even if there is a cached report, and cache the new one.
 
     Returns:
         A natural language report from the QA agent of observations it found or issues that prevented it from progressing.
     """
+    return await execute_run(
+        instructions_absolute_file_path,
+        tool_version,
+        report_progress=ctx.report_progress,
+        build_fingerprint=build_fingerprint,
+        force_refresh=force_refresh,
+    )
+
+
+@mcp.tool()
+async def start_quality_assurance(
+    instructions_absolute_file_path: str,
+    tool_version: ToolVersion | None = None,
+    build_fingerprint: str | None = None,
+    force_refresh: bool = False,
+) -> str:
+    """
+    Start the quality assurance agent of `run_quality_assurance` in the background, and return right away
+    instead of waiting minutes for its report. Use it to keep working while the application is tested.
+
+    Args:
+        instructions_absolute_file_path: The absolute path to the file containing the instructions for the QA agent.
+        tool_version: Optional computer use tool version to run with, see `run_quality_assurance`.
+        build_fingerprint: Optional fingerprint of the build under test, see `run_quality_assurance`.
+        force_refresh: Run the agent even if there is a cached report.
+
+    Returns:
+        The id of the QA job, for get_quality_assurance_status, get_quality_assurance_report and
+        cancel_quality_assurance.
+    """
+    if not os.path.isfile(instructions_absolute_file_path):
+        raise ToolError(f"The instructions file {instructions_absolute_file_path} does not exist")
+    resolve_tool_version(tool_version)  # fail now, not once the job runs
+    job = get_job_registry().start(
+        instructions_absolute_file_path,
+        lambda job: execute_run(
+            instructions_absolute_file_path,
+            tool_version,
+            job,
+            build_fingerprint=build_fingerprint,
+            force_refresh=force_refresh,
+        ),
+    )
+    return job.id
+
+
+@mcp.tool()
+async def get_quality_assurance_status(job_id: str, log_lines: int = 20) -> dict[str, Any]:
+    """
+    Check on a QA job started with start_quality_assurance.
+
+    Args:
+        job_id: The id returned by start_quality_assurance.
+        log_lines: How many of the latest lines of the agent's log to include.
+
+    Returns:
+        The status of the job (queued, running, completed, failed or cancelled), the turns taken so far,
+        the last action on the screen, and the latest lines of what the agent said and did.
+    """
+    return get_job_registry().get(job_id).status_dict(log_lines)
+
+
+@mcp.tool()
+async def get_quality_assurance_report(job_id: str) -> str:
+    """
+    Get the report of a QA job started with start_quality_assurance, once it completed.
+
+    Args:
+        job_id: The id returned by start_quality_assurance.
+
+    Returns:
+        The report of the QA agent, or a note that the job is still going.
+    """
+    job = get_job_registry().get(job_id)
+    if job.status == "completed":
+        return job.report or ""
+    if job.status == "failed":
+        raise ToolError(f"The QA job {job_id} failed: {job.error}")
+    if job.status == "cancelled":
+        raise ToolError(f"The QA job {job_id} was cancelled")
+    return (
+        f"The QA job {job_id} is still {job.status}, at turn {job.turns}"
+        + (f", last action: {job.last_action}" if job.last_action else "")
+        + ". Check again later."
+    )
 
+
+@mcp.tool()
+async def cancel_quality_assurance(job_id: str) -> str:
+    """
+    Stop a QA job started with start_quality_assurance.
+
+    Args:
+        job_id: The id returned by start_quality_assurance.
+
+    Returns:
+        The status of the job after cancelling it.
+    """
+    job = get_job_registry().cancel(job_id)
+    if job.task is not None:
+        # give the run a moment to stop its bash sessions and hide the overlay
+        await asyncio.wait({job.task}, timeout=CANCEL_TIMEOUT)
+    return f"The QA job {job_id} is {job.status}"
+
+
+async def execute_run(
+    instructions_absolute_file_path: str,
+    tool_version: ToolVersion | None = None,
+    job: Job | None = None,
+    report_progress: Callable[[float, float | None, str | None], Awaitable[None]] | None = None,
+    build_fingerprint: str | None = None,
+    force_refresh: bool = False,
+) -> str:
+    """
+    Run the QA agent on a free worker and return its report with the run details, reporting
+    the progress to `job`, and each turn to `report_progress` (as MCP progress notifications,
+    with `Context.report_progress`), if given.
+
+    With a `build_fingerprint` and a report cache, a cached report of the same instructions,
+    build, model and settings is returned instead, unless `force_refresh` is set.
+    """
     file_content = open(instructions_absolute_file_path, "r").read()
 
+    tool_version = resolve_tool_version(tool_version)
+    model = os.getenv("QA_AGENT_MODEL") or TOOL_GROUPS_BY_VERSION[tool_version].default_model
+
     messages: list[BetaMessageParam] = [
         {
             "role": "user",
@@ -163,6 +591,13 @@ async def run_quality_assurance(instructions_absolute_file_path: str) -> str:
     def output_callback(content_block):
         if isinstance(content_block, dict) and content_block.get("type") == "text":
             logger.info("Assistant:" + content_block.get("text", ""))
+        if job:
+            if isinstance(content_block, dict):
+                text = content_block.get("text") if content_block.get("type") == "text" else None
+            else:
+                text = content_block.text if content_block.type == "text" else None
+            if text:
+                job.record_text(text)
 
     def tool_action_callback(tool_uses: list[tuple[str, dict]]):
         """Handle overlay display for tool actions."""
@@ -180,6 +615,8 @@ async def run_quality_assurance(instructions_absolute_file_path: str) -> str:
 
         # Show overlay for all actions - only hide during actual execution in computer tool
         overlay.show_action(combined_action, duration=1.0)
+        if job:
+            job.record_actions(formatted_actions)
 
     def tool_output_callback(result: ToolResult, tool_use_id: str):
         if result.output:
@@ -193,6 +630,8 @@ async def run_quality_assurance(instructions_absolute_file_path: str) -> str:
             with open(f"screenshots/screenshot_{tool_use_id}.png", "wb") as f:
                 f.write(base64.b64decode(image_data))
             logger.info(f"Took screenshot screenshot_{tool_use_id}.png")
+        if job:
+            job.record_result(result)
 
     def api_response_callback(response: APIResponse[BetaMessage]):
         logger.info(
@@ -200,27 +639,186 @@ async def run_quality_assurance(instructions_absolute_file_path: str) -> str:
             + json.dumps(json.loads(response.text)["content"], indent=4)  # type: ignore
             + "\n",
         )
+        if job:
+            job.record_turn()
+
+    budget = make_run_budget()
+    provider_pool = get_provider_pool()
+    router = make_model_router(model)
+
+    cache = make_result_cache() if build_fingerprint else None
+    key: str | None = None
+    if cache and build_fingerprint:
+        settings = run_settings(model, tool_version, budget, router, provider_pool)
+        key = cache_key(file_content, build_fingerprint, settings)
+
+    # an identical run that misses the cache meanwhile waits for this one, and returns its report
+    async with _cache_locks.hold(key) if key else contextlib.nullcontext():
+        if cache and key:
+            cached = None if force_refresh else cache.get(key)
+            CACHE_LOOKUPS.inc(result="refresh" if force_refresh else "hit" if cached else "miss")
+            if cached:
+                logger.info(f"Returning the cached report {key[:16]} of build {build_fingerprint}")
+                return with_run_details(cached.report, cached.cache_details(key))
+
+        async def progress_callback(turn: int, tool_uses: list[tuple[str, dict]]):
+            if report_progress is None:
+                return
+            actions = "; ".join(format_tool_action(name, tool_input) for name, tool_input in tool_uses)
+            served_by = ""
+            if len(provider_pool.providers) > 1 and usage.providers:
+                served_by = f" on {usage.providers[-1]}"
+            await report_progress(
+                turn,
+                budget.max_turns,
+                f"Turn {turn}{served_by}, {usage.elapsed:.0f}s: {actions or 'writing the report'}",
+            )
 
-    try:
-        messages = await sampling_loop(
-            model="claude-3-5-sonnet-20241022",
-            provider=APIProvider.ANTHROPIC,
-            system_prompt_suffix="",
-            messages=messages,
-            output_callback=output_callback,
-            tool_output_callback=tool_output_callback,
-            api_response_callback=api_response_callback,
-            api_key=os.getenv("ANTHROPIC_API_KEY", ""),
-            only_n_most_recent_images=10,
-            max_tokens=4096,
-            tool_action_callback=tool_action_callback,
-        )
+        pool = get_worker_pool()
+        if report_progress and pool.busy >= pool.size:
+            await report_progress(0, budget.max_turns, "Waiting for a free worker")
+        # wait for a worker to be free, the display and bash sessions are its to use until the run ends
+        async with pool.acquire() as worker:
+            tool_collection = make_tool_collection(tool_version, gui=worker.gui)
+            worker.attach(tool_collection)
+            if job:
+                job.start()
+            computer = tool_collection.tool_map.get("computer")
+            recordings_dir = os.getenv("QA_AGENT_RECORDINGS_DIR")
+            recorder = None
+            replayed_turns = recorded_turns = 0
+            trace_dir = os.getenv("QA_AGENT_TRACE_DIR")
+            trace = Trace() if trace_dir else None
+            usage = RunUsage()
+            ACTIVE_RUNS.inc()
+            outcome = "failed"
+            preprocessed = preprocess(file_content)
+            steps_run = None
+            with trace or contextlib.nullcontext():
+                try:
+                    if preprocessed.steps:
+                        # run the mechanical steps of the instructions without the model
+                        steps_run = await run_steps(
+                            preprocessed.steps, tool_collection, tool_output_callback
+                        )
+                        messages = [
+                            {"role": "user", "content": steps_context(preprocessed, steps_run)}
+                        ]
+
+                    if recordings_dir and isinstance(computer, ComputerTool):
+                        path = recording_path(recordings_dir, file_content, tool_version, model)
+                        recording = load_recording(path)
+                        replayed = await replay_loop(
+                            turns=recording,
+                            messages=messages,
+                            tool_collection=tool_collection,
+                            output_callback=output_callback,
+                            tool_output_callback=tool_output_callback,
+                            tool_action_callback=tool_action_callback,
+                            usage=usage,
+                        )
+                        replayed_turns, recorded_turns = len(replayed), len(recording)
+                        recorder = Recorder(computer, replayed)
+
+                    messages = await sampling_loop(
+                        model=model,
+                        provider=provider_pool.primary,
+                        system_prompt_suffix="",
+                        messages=messages,
+                        output_callback=output_callback,
+                        tool_output_callback=tool_output_callback,
+                        api_response_callback=api_response_callback,
+                        api_key=os.getenv("ANTHROPIC_API_KEY", ""),
+                        only_n_most_recent_images=10,
+                        max_tokens=4096,
+                        tool_action_callback=tool_action_callback,
+                        progress_callback=progress_callback,
+                        tool_version=tool_version,
+                        tool_collection=tool_collection,
+                        recorder=recorder,
+                        usage=usage,
+                        budget=budget,
+                        retry_policy=make_retry_policy(),
+                        scheduler=get_scheduler(),
+                        provider_pool=provider_pool,
+                        router=router,
+                    )
+                    if recorder:
+                        save_recording(path, recorder.turns)
+
+                    if isinstance(computer, ComputerTool):
+                        await asyncio.to_thread(computer.gui.hotkey, "command", "tab")
+                    outcome = "stopped_early" if usage.stopped_by else "completed"
+                except asyncio.CancelledError:
+                    outcome = "cancelled"
+                    raise
+                finally:
+                    # Hide overlay after sampling loop completes
+                    overlay.hide()
+                    usage.finish()
+                    ACTIVE_RUNS.dec()
+                    RUNS.inc(outcome=outcome)
+                    if outcome == "failed":
+                        ERRORS.inc(kind="run")
+
+        run_details = [f"Usage: {usage}"]
+        if worker.queue_seconds >= 1:
+            run_details.append(f"Queued: waited {worker.queue_seconds:.0f}s for a free worker")
+        if usage.rate_limit_wait >= 1:
+            run_details.append(
+                f"Rate limited: model calls waited {usage.rate_limit_wait:.0f}s for the shared "
+                "tokens and requests per minute"
+            )
+        if steps_run:
+            run_details.append(
+                f"Direct steps: {steps_run.done} of {len(preprocessed.steps)} qa-steps run without the model"
+            )
+        if router and usage.turns:
+            run_details.append(f"Routing: {router.summary()}")
+        if len(provider_pool.providers) > 1 and usage.providers:
+            run_details.append(f"Providers: {usage.providers_summary()}")
+        if usage.stopped_by:
+            run_details.append(f"Stopped early: the {usage.stopped_by} was reached")
+        if recorder and recorded_turns:
+            run_details.append(
+                f"Replay: {replayed_turns} of {recorded_turns} recorded turns replayed without the model, "
+                f"{len(recorder.turns) - replayed_turns} new turns"
+            )
+        if isinstance(computer, ComputerTool) and computer.speculative_capture:
+            run_details.append(f"Screenshot prefetch: {computer.speculative_stats}")
+        if isinstance(computer, ComputerTool) and computer.capture_mode == "active_window":
+            run_details.append(f"Active window capture: {computer.active_window_stats}")
+
+        if trace and trace_dir:
+            trace_path = Path(trace_dir) / (
+                f"{Path(instructions_absolute_file_path).stem}-{datetime.now():%Y%m%d-%H%M%S}.json"
+            )
+            trace.write(trace_path)
+            run_details.append(f"Time per phase: {trace.summary()}")
+            run_details.append(f"Chrome trace: {trace_path}")
+
+        for line in run_details:
+            logger.info(line)
+        report = extract_report(messages)
+        if cache and key and outcome == "completed":
+            # reports of runs that were stopped early are not worth reusing
+            cache.put(key, CachedReport(report, build_fingerprint, settings, run_details))
+        return with_run_details(report, run_details)
+
+
+@mcp.resource(
+    "metrics://server",
+    name="metrics",
+    description="Counters, histograms and gauges of this server in the Prometheus text format: "
+    "runs, turns, tool calls, errors, screenshots, latencies and memory.",
+    mime_type="text/plain",
+)
+def metrics() -> str:
+    return REGISTRY.render()
 
-        await asyncio.to_thread(pyautogui.hotkey, "command", "tab")
-    finally:
-        # Hide overlay after sampling loop completes
-        overlay.hide()
 
+def extract_report(messages: list[BetaMessageParam]) -> str:
+    """Get the QA agent's final report from the conversation."""
     last_message = messages[-1]
 
     if not last_message:
@@ -235,10 +833,37 @@ async def run_quality_assurance(instructions_absolute_file_path: str) -> str:
     return last_message["content"]
 
 
+def with_run_details(report: str, run_details: list[str]) -> str:
+    """Append details about how the run went to the report, if there are any."""
+    if not run_details:
+        return report
+    return report + "\n\n---\nRun details:\n" + "\n".join(f"- {line}" for line in run_details)
+
+
 def main():
     """Main entry point for the MCP server."""
-    logger.info("MCP server started")
-    mcp.run(transport="stdio")
+    parser = argparse.ArgumentParser(description="QA agent MCP server")
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "streamable-http"],
+        default=os.getenv("QA_AGENT_TRANSPORT", "stdio"),
+        help="stdio for one client, streamable-http for many clients sharing this server",
+    )
+    parser.add_argument("--host", default=os.getenv("QA_AGENT_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("QA_AGENT_PORT", "8000")))
+    args = parser.parse_args()
+
+    metrics_port = os.getenv("QA_AGENT_METRICS_PORT")
+    if metrics_port:
+        serve_metrics(int(metrics_port))
+        logger.info(f"Serving metrics on http://127.0.0.1:{metrics_port}/metrics")
+    if args.transport == "streamable-http":
+        mcp.settings.host = args.host
+        mcp.settings.port = args.port
+        logger.info(f"MCP server started on http://{args.host}:{args.port}{mcp.settings.streamable_http_path}")
+    else:
+        logger.info("MCP server started")
+    mcp.run(transport=args.transport)
 
 
 if __name__ == "__main__":
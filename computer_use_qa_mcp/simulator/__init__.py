@@ -0,0 +1,14 @@
+"""
+An offline stand-in for the model and the screen, to run and benchmark the sampling loop
+and the tools deterministically without an API key or a display.
+"""
+
+from .display import VirtualDisplay
+from .messages_api import MessagesAPIStub, qa_script, scripted_turns
+
+__ALL__ = [
+    MessagesAPIStub,
+    VirtualDisplay,
+    qa_script,
+    scripted_turns,
+]
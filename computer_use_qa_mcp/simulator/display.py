@@ -0,0 +1,144 @@
+"""A virtual screen, keyboard and mouse for `ComputerTool` to drive instead of pyautogui."""
+
+import threading
+import time
+from collections import Counter
+
+from PIL import Image, ImageDraw
+
+LINE_HEIGHT = 24  # pixels per line of text on the virtual page
+SCROLL_LINES = 3  # lines moved per scroll click
+
+
+class VirtualDisplay:
+    """
+    An in-memory framebuffer implementing `GUIBackend`. It reacts to input deterministically,
+    so screenshots change the way a real app's would: clicks leave a mark, typed text is drawn
+    at the caret, enter moves the caret to the next line and scrolling shifts the page.
+
+    `input_latency` and `capture_latency` add a fixed delay in seconds to every input call and
+    every screenshot, to simulate a slower machine.
+    """
+
+    def __init__(
+        self,
+        width: int = 1440,
+        height: int = 900,
+        *,
+        input_latency: float = 0.0,
+        capture_latency: float = 0.0,
+    ):
+        self.width = width
+        self.height = height
+        self.input_latency = input_latency
+        self.capture_latency = capture_latency
+        self.calls: Counter[str] = Counter()  # how many times each method was called
+
+        self._framebuffer = Image.new("RGB", (width, height), "white")
+        self._draw = ImageDraw.Draw(self._framebuffer)
+        self._lines_drawn = 0
+        for y in range(0, height, LINE_HEIGHT):
+            self._draw_line(y)
+        self._cursor = (0, 0)
+        self._caret = (20, LINE_HEIGHT)
+        self._keys_down: set[str] = set()
+        # input arrives from asyncio.to_thread workers
+        self._lock = threading.Lock()
+
+    def _draw_line(self, y: int):
+        self._lines_drawn += 1
+        self._draw.rectangle((0, y, self.width, y + LINE_HEIGHT - 1), fill="white")
+        self._draw.text(
+            (20, y + 6),
+            f"{self._lines_drawn:05d} The quick brown fox jumps over the lazy dog " * 4,
+            fill="black",
+        )
+
+    def _input(self, name: str):
+        self.calls[name] += 1
+        if self.input_latency:
+            time.sleep(self.input_latency)
+
+    def size(self) -> tuple[int, int]:
+        return self.width, self.height
+
+    def position(self) -> tuple[int, int]:
+        return self._cursor
+
+    def screenshot(self) -> Image.Image:
+        self.calls["screenshot"] += 1
+        if self.capture_latency:
+            time.sleep(self.capture_latency)
+        with self._lock:
+            return self._framebuffer.copy()
+
+    def moveTo(self, x: int, y: int, *args, **kwargs):
+        self._input("moveTo")
+        self._cursor = (min(max(0, x), self.width - 1), min(max(0, y), self.height - 1))
+
+    def mouseDown(self, *args, **kwargs):
+        self._input("mouseDown")
+
+    def mouseUp(self, *args, **kwargs):
+        self._input("mouseUp")
+
+    def click(self, *args, button: str = "left", clicks: int = 1, **kwargs):
+        self._input("click")
+        x, y = self._cursor
+        colour = {"left": "blue", "right": "red", "middle": "green"}.get(button, "gray")
+        with self._lock:
+            for i in range(clicks):
+                radius = 6 + 4 * i
+                self._draw.ellipse((x - radius, y - radius, x + radius, y + radius), outline=colour)
+            # clicking moves the caret, like focusing a text field
+            self._caret = (x, y)
+
+    def doubleClick(self, *args, **kwargs):
+        self.click(clicks=2)
+
+    def tripleClick(self, *args, **kwargs):
+        self.click(clicks=3)
+
+    def keyDown(self, key: str, *args, **kwargs):
+        self._input("keyDown")
+        self._keys_down.add(key)
+
+    def keyUp(self, key: str, *args, **kwargs):
+        self._input("keyUp")
+        self._keys_down.discard(key)
+
+    def hotkey(self, *keys: str, **kwargs):
+        self._input("hotkey")
+        if keys and keys[-1] == "enter":
+            x, y = self._caret
+            self._caret = (20, y + LINE_HEIGHT)
+        elif keys and keys[-1] in ("pagedown", "space"):
+            self.scroll(-self.height // (LINE_HEIGHT * SCROLL_LINES))
+
+    def write(self, text: str, interval: float = 0.0, **kwargs):
+        self._input("write")
+        with self._lock:
+            x, y = self._caret
+            self._draw.text((x, y), text, fill="purple")
+            self._caret = (x + int(self._draw.textlength(text)), y)
+
+    def scroll(self, clicks: int, *args, **kwargs):
+        """Scroll the page, negative clicks scroll down like pyautogui."""
+        self._input("scroll")
+        shift = min(abs(clicks) * SCROLL_LINES, self.height // LINE_HEIGHT) * LINE_HEIGHT
+        if not shift:
+            return
+        with self._lock:
+            if clicks < 0:
+                kept = self._framebuffer.crop((0, shift, self.width, self.height))
+                self._framebuffer.paste(kept, (0, 0))
+                revealed = range(self.height - shift, self.height, LINE_HEIGHT)
+            else:
+                kept = self._framebuffer.crop((0, 0, self.width, self.height - shift))
+                self._framebuffer.paste(kept, (0, shift))
+                revealed = range(0, shift, LINE_HEIGHT)
+            for y in revealed:
+                self._draw_line(y)
+
+    def hscroll(self, clicks: int, *args, **kwargs):
+        self._input("hscroll")
@@ -0,0 +1,260 @@
+"""
+A local HTTP server speaking enough of the Messages API for `sampling_loop` to run against
+scripted responses, with no model and no network.
+"""
+
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Literal
+
+ContentBlocks = list[dict[str, Any]]
+# A script gives the content of each response, either as a fixed sequence, or as a function
+# of the request body (the messages, tools and so on) for responses that depend on them
+Script = Iterable[ContentBlocks] | Callable[[dict[str, Any]], ContentBlocks]
+
+# Faults the stub can inject: error responses, a connection closed without a response, or
+# a response that takes `slow_latency` seconds
+Fault = Literal["rate_limit", "overloaded", "server_error", "bad_request", "reset", "slow"]
+FAULT_ERRORS: dict[str, tuple[int, str]] = {
+    "rate_limit": (429, "rate_limit_error"),
+    "overloaded": (529, "overloaded_error"),
+    "server_error": (500, "api_error"),
+    "bad_request": (400, "invalid_request_error"),
+}
+
+SCRIPT_EXHAUSTED_REPORT = "The scripted responses ran out."
+NO_TOOLS_REPORT = "Report: stopped before the scripted steps were done."
+CHARS_PER_TOKEN = 4  # rough token estimate for the usage of responses
+
+DEFAULT_ACTIONS: list[dict[str, Any]] = [
+    {"action": "screenshot"},
+    {"action": "mouse_move", "coordinate": [320, 240]},
+    {"action": "left_click"},
+    {"action": "type", "text": "hello"},
+    {"action": "key", "text": "Return"},
+]
+
+
+def qa_script(turns: int, actions: Iterable[dict[str, Any]] | None = None) -> list[ContentBlocks]:
+    """
+    A QA run of `turns` computer tool calls, cycling through `actions` (inputs of the computer
+    tool, a mix of screenshots, clicks and typing by default), followed by a final report.
+    """
+    actions = list(actions or DEFAULT_ACTIONS)
+    responses: list[ContentBlocks] = [
+        [
+            {"type": "text", "text": f"Step {turn + 1}."},
+            {"type": "tool_use", "name": "computer", "input": action},
+        ]
+        for turn, action in zip(range(turns), itertools.cycle(actions))
+    ]
+    responses.append([{"type": "text", "text": f"Report: all {turns} steps worked."}])
+    return responses
+
+
+def scripted_turns(
+    turns: int, actions: Iterable[dict[str, Any]] | None = None
+) -> Callable[[dict[str, Any]], ContentBlocks]:
+    """
+    Like `qa_script`, but the response depends on how many turns the request's conversation
+    already had, so one stub can serve any number of concurrent runs.
+    """
+    responses = qa_script(turns, actions)
+
+    def respond(request: dict[str, Any]) -> ContentBlocks:
+        done = sum(1 for message in request.get("messages", []) if message.get("role") == "assistant")
+        return responses[min(done, turns)]
+
+    return respond
+
+
+class MessagesAPIStub:
+    """
+    Serves `POST /v1/messages` on localhost, answering each request with the next scripted
+    response, without its tool calls if the request does not allow tools. Point the Anthropic client at `base_url`, for example with the
+    `ANTHROPIC_BASE_URL` environment variable.
+
+    `latency` adds a fixed delay in seconds to every response, to simulate the model thinking,
+    `model_latency` a different one for the models it names.
+
+    `faults` injects faults at random, by their probability per request, for example
+    `{"rate_limit": 0.05, "reset": 0.02}`. Error responses ask to be retried after
+    `retry_after` seconds, if given. A failed request does not use up a scripted response, so
+    a retry gets the response the failed request would have. Hedged requests do, so use a
+    script that depends on the request, like `scripted_turns`, to hedge. `fail_next` injects
+    given faults into the next requests instead.
+    """
+
+    def __init__(
+        self,
+        script: Script = (),
+        *,
+        latency: float = 0.0,
+        model_latency: dict[str, float] | None = None,
+        model: str = "simulated-model",
+        faults: dict[Fault, float] | None = None,
+        slow_latency: float = 5.0,
+        retry_after: float | None = None,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.model_latency = model_latency or {}
+        self.model = model
+        self.faults = faults or {}
+        self.slow_latency = slow_latency
+        self.retry_after = retry_after
+        self.requests = 0
+        self.request_bytes = 0
+        self.faults_injected: Counter[str] = Counter()
+        self._next_faults: list[Fault] = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+        self.load(script)
+
+    def load(self, script: Script):
+        """Replace the script, responses start again from its first one."""
+        with self._lock:
+            if callable(script):
+                self._responses: Iterator[ContentBlocks] | None = None
+                self._respond = script
+            else:
+                self._responses = iter(list(script))
+                self._respond = None
+
+    @property
+    def base_url(self) -> str:
+        if self._server is None:
+            raise RuntimeError("The stub is not started")
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MessagesAPIStub":
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path.split("?")[0] != "/v1/messages":
+                    self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+                    return
+
+                fault = stub.pick_fault()
+                if fault == "reset":
+                    self.close_connection = True  # hang up without a response
+                    return
+                if fault in FAULT_ERRORS:
+                    status, error_type = FAULT_ERRORS[fault]
+                    headers = {"retry-after": str(stub.retry_after)} if stub.retry_after else {}
+                    self._send(
+                        status,
+                        {"type": "error", "error": {"type": error_type, "message": f"Injected {fault}"}},
+                        headers,
+                    )
+                    return
+                if fault == "slow":
+                    time.sleep(stub.slow_latency)
+                self._send(200, stub.respond(json.loads(body), len(body)))
+
+            def _send(self, status: int, payload: dict[str, Any], headers: dict[str, str] | None = None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("request-id", f"req_sim_{stub.requests}")
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up on the request, e.g. a hedge that lost
+
+            def log_message(self, format, *args):
+                pass  # keep benchmark output clean
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MessagesAPIStub":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def fail_next(self, *faults: Fault):
+        """Inject `faults` into the next requests, one each in order, before any random ones."""
+        with self._lock:
+            self._next_faults.extend(faults)
+
+    def pick_fault(self) -> Fault | None:
+        """The fault to inject into the next request, if any, by the probabilities of `faults`."""
+        with self._lock:
+            if self._next_faults:
+                fault = self._next_faults.pop(0)
+                self.faults_injected[fault] += 1
+                return fault
+            roll = self._random.random()
+            for fault, probability in self.faults.items():
+                if roll < probability:
+                    self.faults_injected[fault] += 1
+                    return fault
+                roll -= probability
+        return None
+
+    def respond(self, request: dict[str, Any], request_bytes: int = 0) -> dict[str, Any]:
+        """The Messages API response to `request`, the next one of the script."""
+        latency = self.model_latency.get(request.get("model", ""), self.latency)
+        if latency:
+            time.sleep(latency)
+        with self._lock:
+            self.requests += 1
+            self.request_bytes += request_bytes
+            if self._respond is not None:
+                content = self._respond(request)
+            else:
+                content = next(  # type: ignore[arg-type]
+                    self._responses, [{"type": "text", "text": SCRIPT_EXHAUSTED_REPORT}]
+                )
+            content = [
+                {**block, "id": block.get("id") or f"toolu_sim_{next(self._ids):06d}"}
+                if block.get("type") == "tool_use"
+                else block
+                for block in content
+            ]
+        if request.get("tool_choice", {}).get("type") == "none":
+            content = [block for block in content if block.get("type") != "tool_use"]
+            content = content or [{"type": "text", "text": NO_TOOLS_REPORT}]
+
+        has_tool_use = any(block.get("type") == "tool_use" for block in content)
+        return {
+            "id": f"msg_sim_{self.requests:06d}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", self.model),
+            "content": content,
+            "stop_reason": "tool_use" if has_tool_use else "end_turn",
+            "stop_sequence": None,
+            "usage": {
+                "input_tokens": request_bytes // CHARS_PER_TOKEN,
+                "output_tokens": len(json.dumps(content)) // CHARS_PER_TOKEN,
+            },
+        }
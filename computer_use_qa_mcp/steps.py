@@ -0,0 +1,206 @@
+"""
+Mechanical steps of QA instructions, run directly with the tools before the model takes
+over, so opening a page or waiting a few seconds does not cost a model turn each.
+
+They are written in fenced `qa-steps` blocks at the top of an instructions file, one step
+per line:
+
+    ```qa-steps
+    open http://localhost:3000
+    launch Safari
+    wait 5 seconds
+    press cmd+r
+    type "hello@example.com"
+    run npm run seed
+    ```
+
+A line that is not one of these steps, and every step after it, is left to the model, as
+is a step that fails and the rest of the instructions. The model is told what was run.
+"""
+
+import asyncio
+import re
+import shlex
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from anthropic.types.beta import BetaContentBlockParam
+
+from .tools import ToolCollection, ToolResult
+from .tools.base import ToolError
+
+STEPS_BLOCK = re.compile(r"```qa-steps[ \t]*\n(.*?)^```[ \t]*$\n?", re.DOTALL | re.MULTILINE)
+MAX_WAIT_SECONDS = 300.0
+MAX_OUTPUT_CHARS = 1000  # of a step's output in the log given to the model
+
+
+@dataclass
+class Step:
+    line: str
+    calls: list[tuple[str, dict[str, Any]]]  # tool name and input, run in order
+    wait: float = 0.0  # seconds to wait after the calls
+
+
+def _unquote(text: str) -> str:
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        return text[1:-1]
+    return text
+
+
+STEP_GRAMMAR: list[tuple[re.Pattern[str], Callable[[re.Match[str]], Step]]] = [
+    (
+        # open http://localhost:3000, open the browser at http://localhost:3000
+        re.compile(r"open (?:(?:the|a) browser )?(?:at |to )?(?P<url>[a-z][a-z0-9+.-]*://\S+)", re.I),
+        lambda m: Step(m[0], [("bash", {"command": f"open {shlex.quote(m['url'])}"})]),
+    ),
+    (
+        re.compile(r"(?:open (?:the )?app|launch) (?P<app>.+)", re.I),
+        lambda m: Step(m[0], [("bash", {"command": f"open -a {shlex.quote(_unquote(m['app']))}"})]),
+    ),
+    (
+        re.compile(r"wait (?:for )?(?P<seconds>\d+(?:\.\d+)?) ?(?:s|secs?|seconds?)?", re.I),
+        lambda m: Step(m[0], [], wait=min(float(m["seconds"]), MAX_WAIT_SECONDS)),
+    ),
+    (
+        re.compile(r"press (?P<keys>\S+)", re.I),
+        lambda m: Step(m[0], [("computer", {"action": "key", "text": m["keys"]})]),
+    ),
+    (
+        re.compile(r"type (?P<text>(?P<quote>[\"']).*(?P=quote))", re.I),
+        lambda m: Step(m[0], [("computer", {"action": "type", "text": _unquote(m["text"])})]),
+    ),
+    (
+        re.compile(r"(?:run|\$) (?P<command>.+)", re.I),
+        lambda m: Step(m[0], [("bash", {"command": m["command"]})]),
+    ),
+]
+
+
+def parse_step(line: str) -> Step | None:
+    """The step of a line of a `qa-steps` block, None if it is not one the grammar knows."""
+    line = line.strip().rstrip(".")
+    for pattern, make_step in STEP_GRAMMAR:
+        match = pattern.fullmatch(line)
+        if match:
+            return make_step(match)
+    return None
+
+
+@dataclass
+class Preprocessed:
+    steps: list[Step]  # to run directly, in order
+    instructions: str  # for the model, without the steps to run directly
+    deferred: list[str] = field(default_factory=list)  # lines of the blocks left to the model
+
+
+def preprocess(instructions: str) -> Preprocessed:
+    """
+    Take the steps of the `qa-steps` blocks at the top of `instructions` out, up to the first
+    line the grammar does not know. Blocks further down are left to the model as they are.
+    """
+    steps: list[Step] = []
+    deferred: list[str] = []
+    rest = instructions
+    while True:
+        stripped = rest.lstrip()
+        match = STEPS_BLOCK.match(stripped)
+        if match is None:
+            break
+        rest = stripped[match.end() :]
+        lines = [line.strip() for line in match[1].splitlines() if line.strip()]
+        for line in lines:
+            step = parse_step(line) if not deferred else None
+            if step is None:
+                deferred.append(line)
+            else:
+                steps.append(step)
+    return Preprocessed(steps, rest, deferred)
+
+
+@dataclass
+class StepsRun:
+    log: list[str]  # a line per step run, with its outputs
+    done: int  # steps run without errors
+    not_run: list[Step]  # the step that failed and the ones after it
+    screenshot: ToolResult | None  # of where the steps left the screen
+
+
+def _shorten(text: str) -> str:
+    text = text.strip()
+    return text if len(text) <= MAX_OUTPUT_CHARS else text[: MAX_OUTPUT_CHARS - 1] + "…"
+
+
+async def _run_step(
+    step: Step,
+    number: int,
+    tool_collection: ToolCollection,
+    tool_output_callback: Callable[[ToolResult, str], None] | None,
+) -> str:
+    """Run a step, returns its line for the log."""
+    outputs = []
+    for call_number, (name, tool_input) in enumerate(step.calls, start=1):
+        result = await tool_collection.run(name=name, tool_input=tool_input)
+        if tool_output_callback:
+            tool_output_callback(result, f"qa_step_{number}_{call_number}")
+        if result.error:
+            raise ToolError(f"{step.line}: failed, {_shorten(result.error)}")
+        if result.output:
+            outputs.append(_shorten(result.output))
+    if step.wait:
+        await asyncio.sleep(step.wait)
+    return f"{step.line}: done" + "".join(f"\n  {output}" for output in outputs)
+
+
+async def run_steps(
+    steps: list[Step],
+    tool_collection: ToolCollection,
+    tool_output_callback: Callable[[ToolResult, str], None] | None = None,
+) -> StepsRun:
+    """Run `steps` until one fails, and take a screenshot after them if there is a computer tool."""
+    log: list[str] = []
+    done = 0
+    not_run: list[Step] = []
+    for index, step in enumerate(steps):
+        try:
+            log.append(await _run_step(step, index + 1, tool_collection, tool_output_callback))
+            done += 1
+        except ToolError as e:
+            log.append(e.message)
+            not_run = steps[index:]
+            break
+
+    screenshot = None
+    if "computer" in tool_collection.tool_map:
+        # saves the model a turn to look at the screen first
+        screenshot = await tool_collection.run(name="computer", tool_input={"action": "screenshot"})
+    return StepsRun(log, done, not_run, screenshot)
+
+
+def steps_context(preprocessed: Preprocessed, run: StepsRun) -> list[BetaContentBlockParam]:
+    """The content of the first user message: the log of the steps run and the instructions left."""
+    intro = "These steps of the QA instructions were already run for you, in this order:\n"
+    content: list[BetaContentBlockParam] = [
+        {"type": "text", "text": intro + "\n".join(f"- {line}" for line in run.log)}
+    ]
+    left = [step.line for step in run.not_run] + preprocessed.deferred
+    instructions = preprocessed.instructions
+    if left:
+        steps = "\n".join(f"- {line}" for line in left)
+        instructions = f"Do these steps first:\n{steps}\n\n{instructions}"
+    if run.screenshot and run.screenshot.base64_image:
+        content.append({"type": "text", "text": "The screen after the steps:"})
+        content.append(
+            {
+                "type": "image",
+                "source": {
+                    "type": "base64",
+                    "media_type": "image/png",
+                    "data": run.screenshot.base64_image,
+                },
+            }
+        )
+    content.append(
+        {"type": "text", "text": f"Carry on with the rest of the instructions:\n\n{instructions}"}
+    )
+    return content
@@ -1,14 +1,25 @@
 from .base import CLIResult, ToolResult
-from .bash import BashTool
+from .bash import BashTool, BashTool20250124
 from .collection import ToolCollection
-from .computer import ComputerTool
-from .edit import EditTool
+from .computer import ComputerTool, ComputerTool20250124, ComputerTool20251124
+from .edit import EditTool, EditTool20250124, EditTool20250728
+from .groups import TOOL_GROUPS_BY_VERSION, ToolGroup, ToolVersion
+from .wait import WaitForTool
 
 __ALL__ = [
     BashTool,
+    BashTool20250124,
     CLIResult,
     ComputerTool,
+    ComputerTool20250124,
+    ComputerTool20251124,
     EditTool,
+    EditTool20250124,
+    EditTool20250728,
     ToolCollection,
+    ToolGroup,
     ToolResult,
+    ToolVersion,
+    TOOL_GROUPS_BY_VERSION,
+    WaitForTool,
 ]
@@ -21,6 +21,9 @@ class BaseAnthropicTool(metaclass=ABCMeta):
     def to_params(self):
         raise NotImplementedError
 
+    def prefetch(self):
+        """Called while waiting for the model, tools can prepare likely work in the background."""
+
 
 @dataclass(kw_only=True, frozen=True)
 class ToolResult:
@@ -8,6 +8,8 @@ except ImportError:
     # Fallback for when anthropic package is not available
     BetaToolBash20241022Param = Dict[str, Any]
 
+from ..metrics import BASH_SECONDS, timed
+from ..tracing import traced
 from .base import BaseAnthropicTool, CLIResult, ToolError, ToolResult
 
 
@@ -46,10 +48,14 @@ class _BashSession:
         """Terminate the bash shell."""
         if not self._started:
             raise ToolError("Session has not started.")
+        # releases the pipe now, instead of when the process is garbage collected
+        self._process.stdin.close()  # type: ignore[union-attr]
         if self._process.returncode is not None:
             return
         self._process.terminate()
 
+    @traced("bash.run", "bash")
+    @timed(BASH_SECONDS)
     async def run(self, command: str):
         """Execute a command in the bash shell."""
         if not self._started:
@@ -146,8 +152,20 @@ class BashTool(BaseAnthropicTool):
 
         raise ToolError("no command provided.")
 
+    def stop(self):
+        """Terminate the bash shell, if one was started. The next command starts a new one."""
+        if self._session is not None and self._session._started:
+            self._session.stop()
+        self._session = None
+
     def to_params(self):
         return {
             "type": self.api_type,
             "name": self.name,
         }
+
+
+class BashTool20250124(BashTool):
+    """The `bash_20250124` version of the bash tool, which behaves the same as the original."""
+
+    api_type: ClassVar[Literal["bash_20250124"]] = "bash_20250124"  # type: ignore[assignment]
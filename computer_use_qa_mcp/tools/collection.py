@@ -4,6 +4,8 @@ from typing import Any
 
 from anthropic.types.beta import BetaToolUnionParam
 
+from ..metrics import ERRORS, TOOL_CALLS, TOOL_LATENCY
+from ..tracing import span
 from .base import (
     BaseAnthropicTool,
     ToolError,
@@ -24,11 +26,32 @@ class ToolCollection:
     ) -> list[BetaToolUnionParam]:
         return [tool.to_params() for tool in self.tools]
 
+    def prefetch(self):
+        for tool in self.tools:
+            tool.prefetch()
+
     async def run(self, *, name: str, tool_input: dict[str, Any]) -> ToolResult:
         tool = self.tool_map.get(name)
+        TOOL_CALLS.inc(tool=name, action=_action_label(name, tool_input))
         if not tool:
+            ERRORS.inc(kind="tool")
             return ToolFailure(error=f"Tool {name} is invalid")
-        try:
-            return await tool(**tool_input)
-        except ToolError as e:
-            return ToolFailure(error=e.message)
+        args = {key: tool_input[key] for key in ("action", "command") if key in tool_input}
+        with span(f"tool.{name}", "tool", **args), TOOL_LATENCY.time(tool=name):
+            try:
+                result = await tool(**tool_input)
+            except ToolError as e:
+                result = ToolFailure(error=e.message)
+        if result.error:
+            ERRORS.inc(kind="tool")
+        return result
+
+
+def _action_label(name: str, tool_input: dict[str, Any]) -> str:
+    """The kind of call for the metrics, never free text like a bash command."""
+    if name == "bash":
+        return "restart" if tool_input.get("restart") else "command"
+    for key in ("action", "command", "condition"):
+        if isinstance(tool_input.get(key), str):
+            return tool_input[key]
+    return ""
@@ -1,9 +1,19 @@
 import asyncio
 import base64
 import io
+import logging
+import time
+from dataclasses import dataclass
 from enum import StrEnum
-from typing import Literal, TypedDict, Dict, Any
-import pyautogui
+from typing import Literal, Protocol, TypedDict, Dict, Any, get_args
+from PIL import Image
+
+try:
+    import pyautogui
+except (ImportError, KeyError):
+    # pyautogui cannot be imported on Linux without a display (KeyError: 'DISPLAY'),
+    # the tools can still drive a simulated one
+    pyautogui = None
 
 try:
     from anthropic.types.beta import BetaToolComputerUse20241022Param
@@ -14,8 +24,15 @@ except ImportError:
 # Type alias for the parameter type
 ToolParam = Dict[str, Any]
 
+from ..metrics import CAPTURE_SECONDS, ENCODE_SECONDS, IMAGES_SKIPPED, timed
+from ..tracing import span, traced
 from .base import BaseAnthropicTool, ToolError, ToolResult
+from .frames import frames_equal, make_fingerprint, make_probe, probes_match
 from .overlay import get_overlay
+from .resolution import choose_target_size, resize_frame
+from .window import Box, get_active_window_box
+
+logger = logging.getLogger(__name__)
 
 OUTPUT_DIR = "/tmp/outputs"
 
@@ -35,6 +52,114 @@ Action = Literal[
     "cursor_position",
 ]
 
+Action_20250124 = (
+    Action
+    | Literal[
+        "left_mouse_down",
+        "left_mouse_up",
+        "scroll",
+        "hold_key",
+        "wait",
+        "triple_click",
+    ]
+)
+
+ScrollDirection = Literal["up", "down", "left", "right"]
+
+CLICK_DESCRIPTIONS: dict[str, str] = {
+    "left_click": "Left click",
+    "right_click": "Right click",
+    "middle_click": "Middle click",
+    "double_click": "Double click",
+    "triple_click": "Triple click",
+}
+
+MAX_DURATION_SECONDS = 100
+
+# screen points at the top that fingerprints leave out, as the menu bar and its clock change on their own
+FINGERPRINT_TOP_BAR_HEIGHT = 25
+
+# Input actions that can be followed by an automatic screenshot once the screen settles
+AUTO_SCREENSHOT_ACTIONS: frozenset[str] = frozenset(
+    {
+        "key",
+        "type",
+        "left_click",
+        "left_click_drag",
+        "right_click",
+        "middle_click",
+        "double_click",
+        "triple_click",
+        "scroll",
+    }
+)
+
+
+@dataclass
+class SpeculativeCaptureStats:
+    """How often screenshots could be served from a frame captured while the model was thinking."""
+
+    hits: int = 0
+    misses: int = 0
+    saved_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.hits}/{self.hits + self.misses} screenshots served from speculative captures "
+            f"({self.hit_rate:.0%}), {self.saved_seconds:.1f}s saved"
+        )
+
+
+@dataclass
+class ActiveWindowStats:
+    """Encoded screenshot sizes in active window mode, against an estimate for the full screen."""
+
+    screenshots: int = 0
+    sent_bytes: int = 0
+    full_screen_bytes: int = 0
+
+    def add(self, png: bytes, size: tuple[int, int], full_screen_size: tuple[int, int]):
+        """
+        Count a screenshot of a window of `size` on a screen of `full_screen_size`, both in
+        screen coordinates. The black padding around the window encodes to almost nothing.
+        """
+        # assume the full screen would have encoded to the same number of bytes per pixel
+        full_screen_bytes = round(
+            len(png) * (full_screen_size[0] * full_screen_size[1]) / (size[0] * size[1])
+        )
+        self.screenshots += 1
+        self.sent_bytes += len(png)
+        self.full_screen_bytes += full_screen_bytes
+        logger.info(
+            f"Active window screenshot {size[0]}x{size[1]}: {len(png) / 1024:.0f}KB, "
+            f"~{(full_screen_bytes - len(png)) / 1024:.0f}KB saved against the full screen"
+        )
+
+    def __str__(self):
+        saved = self.full_screen_bytes - self.sent_bytes
+        return (
+            f"{self.screenshots} active window screenshots, {self.sent_bytes / 1024:.0f}KB sent, "
+            f"~{saved / 1024:.0f}KB saved against full screen captures"
+        )
+
+
+@dataclass(frozen=True)
+class _SpeculativeFrame:
+    frame: Image.Image
+    box: Box  # the part of the screen the encoded image shows
+    base64_image: str
+    encode_seconds: float
+
+
+Action_20251124 = Action_20250124 | Literal["zoom"]
+
+CaptureMode = Literal["screen", "active_window"]
+
 
 class ScalingSource(StrEnum):
     COMPUTER = "computer"
@@ -51,6 +176,26 @@ def chunks(s: str, chunk_size: int) -> list[str]:
     return [s[i : i + chunk_size] for i in range(0, len(s), chunk_size)]
 
 
+class GUIBackend(Protocol):
+    """The subset of the pyautogui module that `ComputerTool` drives the screen with."""
+
+    def size(self) -> tuple[int, int]: ...
+    def position(self) -> tuple[int, int]: ...
+    def screenshot(self) -> Image.Image: ...
+    def moveTo(self, x: int, y: int): ...
+    def mouseDown(self): ...
+    def mouseUp(self): ...
+    def click(self, button: str = "left"): ...
+    def doubleClick(self): ...
+    def tripleClick(self): ...
+    def keyDown(self, key: str): ...
+    def keyUp(self, key: str): ...
+    def hotkey(self, *keys: str): ...
+    def write(self, text: str, interval: float = 0.0): ...
+    def scroll(self, clicks: int): ...
+    def hscroll(self, clicks: int): ...
+
+
 class ComputerTool(BaseAnthropicTool):
     """
     A tool that allows the agent to interact with the screen, keyboard, and mouse of the current computer.
@@ -65,6 +210,9 @@ class ComputerTool(BaseAnthropicTool):
 
     _screenshot_delay = 1.0
     _scaling_enabled = True
+    _settle_delay = 0.1  # seconds before the first settle probe
+    _settle_interval = 0.15  # seconds between settle probes
+    _settle_timeout = 2.0  # seconds to wait at most for the screen to settle
 
     @property
     def options(self) -> ComputerToolOptions:
@@ -77,28 +225,64 @@ class ComputerTool(BaseAnthropicTool):
     def to_params(self):
         return {"name": self.name, "type": self.api_type, **self.options}
 
-    def __init__(self):
+    def __init__(
+        self,
+        *,
+        auto_screenshot: bool = False,
+        auto_screenshot_actions: frozenset[str] = AUTO_SCREENSHOT_ACTIONS,
+        auto_screenshot_only_if_changed: bool = False,
+        speculative_capture: bool = False,
+        capture_mode: CaptureMode = "screen",
+        max_image_tokens: int | None = None,
+        gui: GUIBackend | None = None,
+    ):
+        """
+        Args:
+            auto_screenshot: Wait for the screen to settle after input actions and attach
+                a screenshot to their result, saving the model a separate screenshot turn.
+            auto_screenshot_actions: The actions that get an automatic screenshot.
+            auto_screenshot_only_if_changed: Only attach the screenshot when the screen
+                looks different than before the action.
+            speculative_capture: Capture and encode a frame in the background while the model
+                is thinking, and serve it for the next screenshot if the screen did not change.
+            capture_mode: `screen` to send the whole screen to the model, or `active_window` to
+                only send the focused window, falling back to the whole screen when it cannot be found.
+            max_image_tokens: Most input tokens a full screen screenshot may cost, which lowers
+                the screenshot resolution if needed.
+            gui: What to drive the screen with, the pyautogui module by default.
+        """
         super().__init__()
 
-        self.width = int(pyautogui.size()[0])
-        self.height = int(pyautogui.size()[1])
+        if gui is None and pyautogui is None:
+            raise ToolError("pyautogui could not be imported, is there a display to control?")
+        self.gui: GUIBackend = gui or pyautogui  # type: ignore[assignment]
+
+        self.auto_screenshot = auto_screenshot
+        self.auto_screenshot_actions = auto_screenshot_actions
+        self.auto_screenshot_only_if_changed = auto_screenshot_only_if_changed
+        self.speculative_capture = speculative_capture
+        self.speculative_stats = SpeculativeCaptureStats()
+        self._speculative_task: asyncio.Task[_SpeculativeFrame] | None = None
+
+        self.width = int(self.gui.size()[0])
+        self.height = int(self.gui.size()[1])
 
         self.display_num = None  # Not used on MacOS
 
-        MAX_WIDTH = 1280  # Max screenshot width
-        if self.width > MAX_WIDTH:
-            self.scale_factor = MAX_WIDTH / self.width
-            self.target_width = MAX_WIDTH
-            self.target_height = int(self.height * self.scale_factor)
-        else:
-            self.scale_factor = 1.0
-            self.target_width = self.width
-            self.target_height = self.height
+        # The part of the screen shown in the last screenshot sent to the model, as (left, top,
+        # width, height). The coordinates of the model's actions are mapped to it
+        self.capture_mode = capture_mode
+        self.capture_box: Box = (0, 0, self.width, self.height)
+        self.active_window_stats = ActiveWindowStats()
+
+        # The API resolution is fixed for the run, as it is declared in to_params. Screenshots of
+        # a window are fitted into it keeping their proportions, see `_box_scale`
+        self.screen_target_size = choose_target_size(self.width, self.height, max_image_tokens)
+        self.target_width, self.target_height = self.screen_target_size
 
         # Initialize overlay for hiding during click actions
         self.overlay = get_overlay()
 
-
     async def __call__(
         self,
         *,
@@ -107,33 +291,62 @@ class ComputerTool(BaseAnthropicTool):
         coordinate: list[int] | None = None,
         **kwargs,
     ):
-        print(
-            f"### Performing action: {action}"
+        logger.info(
+            f"Performing action: {action}"
             + (f", text: {text}" if text else "")
             + (f", coordinate: {coordinate}" if coordinate else "")
+            + "".join(f", {key}: {value}" for key, value in kwargs.items() if value)
         )
+        if action not in ("screenshot", "cursor_position", "zoom"):
+            # the screen is about to change, a speculative frame would be wasted
+            self._discard_speculative_frame()
 
+        if not self.auto_screenshot or action not in self.auto_screenshot_actions:
+            return await self.perform(
+                action=action, text=text, coordinate=coordinate, **kwargs
+            )
+
+        probe_before = None
+        if self.auto_screenshot_only_if_changed:
+            probe_before = make_probe(await self.capture_without_overlay())
+        result = await self.perform(
+            action=action, text=text, coordinate=coordinate, **kwargs
+        )
+        if result.error or result.base64_image:
+            return result
+
+        frame, probe = await self.wait_for_settle()
+        if probe_before is not None and probes_match(probe_before, probe):
+            IMAGES_SKIPPED.inc(reason="unchanged")
+            return result.replace(
+                output=f"{result.output or ''} The screen did not change.".strip()
+            )
+        return result.replace(base64_image=await self.encode(frame))
+
+    async def perform(
+        self,
+        *,
+        action: Action,
+        text: str | None = None,
+        coordinate: list[int] | None = None,
+        **kwargs,
+    ):
+        """Perform a single action."""
         if action in ("mouse_move", "left_click_drag"):
             if coordinate is None:
                 raise ToolError(f"coordinate is required for {action}")
             if text is not None:
                 raise ToolError(f"text is not accepted for {action}")
-            if not isinstance(coordinate, list) or len(coordinate) != 2:
-                raise ToolError(f"coordinate must be a list of length 2")
-            if not all(isinstance(i, int) and i >= 0 for i in coordinate):
-                raise ToolError(f"coordinate must be a list of non-negative integers")
 
-            x, y = self.scale_coordinates(
-                ScalingSource.API, coordinate[0], coordinate[1]
-            )
+            x, y = self.validate_and_get_coordinates(coordinate)
 
             if action == "mouse_move":
-                await asyncio.to_thread(pyautogui.moveTo, x, y)
+                await asyncio.to_thread(self.gui.moveTo, x, y)
                 return ToolResult(output=f"Mouse moved successfully to X={x}, Y={y}")
             elif action == "left_click_drag":
-                await asyncio.to_thread(pyautogui.mouseDown)
-                await asyncio.to_thread(pyautogui.moveTo, x, y)
-                await asyncio.to_thread(pyautogui.mouseUp)
+                await asyncio.to_thread(self.gui.mouseDown)
+                await asyncio.to_thread(self.gui.moveTo, x, y)
+                await asyncio.to_thread(self.gui.mouseUp)
                 return ToolResult(output="Mouse drag action completed.")
 
         if action in ("key", "type"):
@@ -145,48 +358,20 @@ class ComputerTool(BaseAnthropicTool):
                 raise ToolError(f"text must be a string")
 
             if action == "key":
-                # Handle key combinations and modifiers
-                # Replace 'super' with 'command'
-                key_sequence = text.lower().replace("super", "command").split("+")
-                key_sequence = [key.strip() for key in key_sequence]
-                # Map 'cmd' to 'command' for MacOS
-                key_sequence = [
-                    "command" if key == "cmd" else key for key in key_sequence
-                ]
-                # Handle special keys that pyautogui expects
-                special_keys = {
-                    "ctrl": "ctrl",
-                    "control": "ctrl",
-                    "alt": "alt",
-                    "option": "alt",
-                    "shift": "shift",
-                    "command": "command",
-                    "tab": "tab",
-                    "enter": "enter",
-                    "return": "enter",
-                    "esc": "esc",
-                    "escape": "esc",
-                    "space": "space",
-                    "spacebar": "space",
-                    "up": "up",
-                    "down": "down",
-                    "left": "left",
-                    "right": "right",
-                    # Add more special keys as needed
-                }
-                key_sequence = [special_keys.get(key, key) for key in key_sequence]
-                await asyncio.to_thread(pyautogui.hotkey, *key_sequence)
+                key_sequence = self.parse_key_combination(text)
+                await asyncio.to_thread(self.gui.hotkey, *key_sequence)
                 return ToolResult(output=f"Key combination '{text}' pressed.")
             elif action == "type":
                 await asyncio.sleep(0.5)
                 await asyncio.to_thread(
-                    pyautogui.write, text, interval=TYPING_DELAY_MS / 500.0
+                    self.gui.write, text, interval=TYPING_DELAY_MS / 500.0
                 )
                 return ToolResult(output=f"Typed text: {text}")
 
         if action in (
             "left_click",
             "right_click",
+            "middle_click",
             "double_click",
             "screenshot",
             "cursor_position",
@@ -197,69 +382,450 @@ class ComputerTool(BaseAnthropicTool):
                 raise ToolError(f"coordinate is not accepted for {action}")
 
             if action == "screenshot":
-                # Hide overlay during screenshot to avoid feedback loop
-                self.overlay.hide()
-                await asyncio.sleep(0.1)  # Small delay to ensure overlay is hidden
-                result = await self.screenshot()
-                self.overlay.show()
-                return result
+                return await self.screenshot_without_overlay()
             elif action == "cursor_position":
-                x, y = pyautogui.position()
+                x, y = self.gui.position()
                 x, y = self.scale_coordinates(ScalingSource.COMPUTER, int(x), int(y))
                 return ToolResult(output=f"X={x},Y={y}")
             else:
-                if action == "left_click":
-                    # Hide overlay just before click to avoid interference
-                    self.overlay.hide()
-                    await asyncio.sleep(0.05)  # Brief delay
-                    result = await asyncio.to_thread(pyautogui.click, button="left")
-                    await asyncio.sleep(0.05)  # Brief delay after click
-                    self.overlay.show()
-                    return ToolResult(output="Left click performed.")
-                elif action == "right_click":
-                    # Hide overlay just before click to avoid interference
-                    self.overlay.hide()
-                    await asyncio.sleep(0.05)  # Brief delay
-                    result = await asyncio.to_thread(pyautogui.click, button="right")
-                    await asyncio.sleep(0.05)  # Brief delay after click
-                    self.overlay.show()
-                    return ToolResult(output="Right click performed.")
-                elif action == "double_click":
-                    # Hide overlay just before click to avoid interference
-                    self.overlay.hide()
-                    await asyncio.sleep(0.05)  # Brief delay
-                    result = await asyncio.to_thread(pyautogui.doubleClick)
-                    await asyncio.sleep(0.05)  # Brief delay after click
-                    self.overlay.show()
-                    return ToolResult(output="Double click performed.")
+                return await self.click(action)
 
         raise ToolError(f"Invalid action: {action}")
 
-    async def screenshot(self):
-        """Take a screenshot of the current screen and return the base64 encoded image."""
-        # Capture screenshot using PyAutoGUI
-        screenshot = await asyncio.to_thread(pyautogui.screenshot)
+    def validate_and_get_coordinates(self, coordinate: list[int] | None = None):
+        """Validate API coordinates and scale them to real screen coordinates."""
+        if not isinstance(coordinate, list) or len(coordinate) != 2:
+            raise ToolError(f"coordinate must be a list of length 2")
+        if not all(isinstance(i, int) and i >= 0 for i in coordinate):
+            raise ToolError(f"coordinate must be a list of non-negative integers")
+
+        return self.scale_coordinates(ScalingSource.API, coordinate[0], coordinate[1])
+
+    def parse_key_combination(self, text: str) -> list[str]:
+        """Translate an xdotool style key combination such as `ctrl+shift+t` to pyautogui keys."""
+        # Handle key combinations and modifiers
+        # Replace 'super' with 'command'
+        key_sequence = text.lower().replace("super", "command").split("+")
+        key_sequence = [key.strip() for key in key_sequence]
+        # Map 'cmd' to 'command' for MacOS
+        key_sequence = ["command" if key == "cmd" else key for key in key_sequence]
+        # Handle special keys that pyautogui expects
+        special_keys = {
+            "ctrl": "ctrl",
+            "control": "ctrl",
+            "alt": "alt",
+            "option": "alt",
+            "shift": "shift",
+            "command": "command",
+            "tab": "tab",
+            "enter": "enter",
+            "return": "enter",
+            "esc": "esc",
+            "escape": "esc",
+            "space": "space",
+            "spacebar": "space",
+            "up": "up",
+            "down": "down",
+            "left": "left",
+            "right": "right",
+            # Add more special keys as needed
+        }
+        return [special_keys.get(key, key) for key in key_sequence]
+
+    async def click(self, action: str, modifiers: list[str] | None = None):
+        """Click at the current mouse position, holding the given modifier keys."""
+        # Hide overlay just before click to avoid interference
+        self.overlay.hide()
+        await asyncio.sleep(0.05)  # Brief delay
+        for key in modifiers or []:
+            await asyncio.to_thread(self.gui.keyDown, key)
+        try:
+            if action == "double_click":
+                await asyncio.to_thread(self.gui.doubleClick)
+            elif action == "triple_click":
+                await asyncio.to_thread(self.gui.tripleClick)
+            else:
+                button = action.removesuffix("_click")
+                await asyncio.to_thread(self.gui.click, button=button)
+        finally:
+            for key in reversed(modifiers or []):
+                await asyncio.to_thread(self.gui.keyUp, key)
+        await asyncio.sleep(0.05)  # Brief delay after click
+        self.overlay.show()
+        return ToolResult(output=f"{CLICK_DESCRIPTIONS[action]} performed.")
+
+    async def zoom(self, region: list[int] | None):
+        """
+        Capture the `region` rectangle, given in API coordinates, at the native screen resolution.
+        The crop is only downscaled if it is bigger than a full screenshot, and it does not
+        change the coordinate system used by the other actions.
+        """
+        if not isinstance(region, list) or len(region) != 4:
+            raise ToolError("region must be a list of 4 integers [x0, y0, x1, y1]")
+        if not all(isinstance(i, int) and i >= 0 for i in region):
+            raise ToolError("region must be a list of non-negative integers")
+        x0, y0, x1, y1 = region
+        if x1 <= x0 or y1 <= y0:
+            raise ToolError("region must be [x0, y0, x1, y1] with x1 > x0 and y1 > y0")
+        if x1 > self.target_width or y1 > self.target_height:
+            raise ToolError(
+                f"region must fit in the screen of {self.target_width}x{self.target_height}"
+            )
 
-        if self._scaling_enabled and self.scale_factor < 1.0:
-            screenshot = screenshot.resize((self.target_width, self.target_height))
+        left, top = self.scale_coordinates(ScalingSource.API, x0, y0)
+        right, bottom = self.scale_coordinates(ScalingSource.API, x1, y1)
+        if right <= left or bottom <= top:
+            raise ToolError("region is in the padding outside the window shown in the screenshot")
+        frame = await self.capture_without_overlay()
+        crop = self.crop_frame(frame, (left, top, right, bottom))
+
+        # never send more pixels than a full screenshot would
+        fit = min(1.0, self.target_width / crop.width, self.target_height / crop.height)
+        size = (max(1, round(crop.width * fit)), max(1, round(crop.height * fit)))
+        return ToolResult(
+            output=f"Zoomed into {region}. Coordinates of other actions still refer to the full screen.",
+            base64_image=await self.encode(crop, size),
+        )
 
-        img_buffer = io.BytesIO()
-        # Save the image to an in-memory buffer
-        screenshot.save(img_buffer, format="PNG", optimize=True)
-        img_buffer.seek(0)
-        base64_image = base64.b64encode(img_buffer.read()).decode()
+    async def capture_without_overlay(self):
+        """Capture the full resolution screen with the overlay hidden."""
+        self.overlay.hide()
+        await asyncio.sleep(0.1)  # Small delay to ensure overlay is hidden
+        try:
+            return await self.capture()
+        finally:
+            self.overlay.show()
+
+    @traced("settle", "computer")
+    async def wait_for_settle(self):
+        """
+        Poll the screen until two consecutive probes match or the settle timeout passes,
+        returning the last full resolution frame and its probe.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._settle_timeout
+        self.overlay.hide()
+        try:
+            await asyncio.sleep(self._settle_delay)
+            frame = await self.capture()
+            probe = make_probe(frame)
+            while loop.time() < deadline:
+                await asyncio.sleep(self._settle_interval)
+                next_frame = await self.capture()
+                next_probe = make_probe(next_frame)
+                frame, previous_probe, probe = next_frame, probe, next_probe
+                if probes_match(previous_probe, probe):
+                    break
+            return frame, probe
+        finally:
+            self.overlay.show()
+
+    @traced("fingerprint", "computer")
+    async def fingerprint(self) -> bytes:
+        """A fingerprint of the screen below the menu bar once it settled, see `make_fingerprint`."""
+        frame, _ = await self.wait_for_settle()
+        frame = self.crop_frame(frame, (0, FINGERPRINT_TOP_BAR_HEIGHT, self.width, self.height))
+        return await asyncio.to_thread(make_fingerprint, frame)
+
+    async def screenshot_without_overlay(self):
+        """Take a screenshot with the overlay hidden."""
+        if self._speculative_task is not None:
+            return await self._serve_speculative_frame()
+
+        # Hide overlay during screenshot to avoid feedback loop
+        self.overlay.hide()
+        await asyncio.sleep(0.1)  # Small delay to ensure overlay is hidden
+        result = await self.screenshot()
+        self.overlay.show()
+        return result
+
+    def prefetch(self):
+        """Start capturing the next screenshot in the background, if speculative capture is on."""
+        if self.speculative_capture and self._speculative_task is None:
+            self._speculative_task = asyncio.create_task(self._capture_speculative_frame())
+
+    async def _capture_speculative_frame(self) -> _SpeculativeFrame:
+        frame = await self.capture_without_overlay()
+        start = time.perf_counter()
+        # not sent to the model yet, so the coordinates of its actions keep their mapping
+        base64_image, box = await self._encode_capture(frame)
+        return _SpeculativeFrame(
+            frame=frame,
+            box=box,
+            base64_image=base64_image,
+            encode_seconds=time.perf_counter() - start,
+        )
 
-        return ToolResult(base64_image=base64_image)
+    def _discard_speculative_frame(self):
+        if self._speculative_task is not None:
+            self._speculative_task.cancel()
+            self._speculative_task = None
+
+    async def _serve_speculative_frame(self) -> ToolResult:
+        """
+        Serve the encoded speculative frame if a fresh capture is exactly the same, otherwise
+        encode the fresh capture. Anything that changed meanwhile, even a line of text, is a miss.
+        """
+        task, self._speculative_task = self._speculative_task, None
+        assert task is not None
+        try:
+            speculative = await task
+        except Exception:
+            speculative = None
+
+        frame = await self.capture_without_overlay()
+        if speculative is not None and frames_equal(speculative.frame, frame):
+            self.speculative_stats.hits += 1
+            self.speculative_stats.saved_seconds += speculative.encode_seconds
+            self.capture_box = speculative.box
+            return ToolResult(base64_image=speculative.base64_image)
+
+        self.speculative_stats.misses += 1
+        return ToolResult(base64_image=await self.encode(frame))
+
+    async def screenshot(self):
+        """Take a screenshot of the current screen and return the base64 encoded image."""
+        return ToolResult(base64_image=await self.encode(await self.capture()))
+
+    @traced("capture", "computer")
+    @timed(CAPTURE_SECONDS)
+    async def capture(self) -> Image.Image:
+        """Capture the current screen at full resolution."""
+        # Capture screenshot using PyAutoGUI
+        return await asyncio.to_thread(self.gui.screenshot)
+
+    async def encode(
+        self, screenshot: Image.Image, size: tuple[int, int] | None = None
+    ) -> str:
+        """
+        Scale a captured frame to the API resolution, or to `size` if given, and encode it
+        as a base64 PNG to send to the model. In active window mode, the frame is cropped to
+        the focused window, and the coordinates of later actions are mapped to it.
+        """
+        if size is not None:
+            return await asyncio.to_thread(self._encode, screenshot, size)
+        base64_image, box = await self._encode_capture(screenshot)
+        self.capture_box = box
+        return base64_image
+
+    async def _encode_capture(self, screenshot: Image.Image) -> tuple[str, Box]:
+        """Encode a frame at the API resolution, with the part of the screen it shows."""
+        box = await self.locate_capture_box()
+        return await asyncio.to_thread(self._encode, screenshot, None, box), box
+
+    @timed(ENCODE_SECONDS)
+    def _encode(
+        self,
+        screenshot: Image.Image,
+        size: tuple[int, int] | None = None,
+        box: Box | None = None,
+    ) -> str:
+        cropped = False
+        if size is not None:
+            screenshot = resize_frame(screenshot, size)
+        else:
+            box = box or (0, 0, self.width, self.height)
+            left, top, box_width, box_height = box
+            if (box_width, box_height) != (self.width, self.height):
+                screenshot = self.crop_frame(
+                    screenshot, (left, top, left + box_width, top + box_height)
+                )
+                cropped = True
+            if self._scaling_enabled:
+                x_scale, y_scale = self._box_scale(box)
+                screenshot = resize_frame(
+                    screenshot, (round(box_width * x_scale), round(box_height * y_scale))
+                )
+            if cropped and self._scaling_enabled:
+                # the window at the top left, the rest of the declared resolution left black
+                canvas = Image.new(screenshot.mode, (self.target_width, self.target_height))
+                canvas.paste(screenshot, (0, 0))
+                screenshot = canvas
+
+        with span("encode", "computer"):
+            img_buffer = io.BytesIO()
+            # Save the image to an in-memory buffer
+            screenshot.save(img_buffer, format="PNG", optimize=True)
+            png = img_buffer.getvalue()
+            base64_image = base64.b64encode(png).decode()
+        if cropped:
+            self.active_window_stats.add(png, (box_width, box_height), (self.width, self.height))
+        return base64_image
 
     def scale_coordinates(self, source: ScalingSource, x: int, y: int):
-        """Scale coordinates between the assistant's coordinate system and the real screen coordinates."""
-        if not self._scaling_enabled:
-            return x, y
-        x_scaling_factor = self.width / self.target_width
-        y_scaling_factor = self.height / self.target_height
+        """
+        Scale coordinates between the assistant's coordinate system and the real screen coordinates,
+        taking into account the part of the screen that screenshots are cropped to. Assistant's
+        coordinates in the black padding around a window are clamped to the window's edge.
+        """
+        left, top, box_width, box_height = self.capture_box
+        x_scale, y_scale = self._box_scale(self.capture_box)
         if source == ScalingSource.API:
             # Assistant's coordinates -> real screen coordinates
-            return round(x * x_scaling_factor), round(y * y_scaling_factor)
+            x, y = round(x / x_scale), round(y / y_scale)
+            if (box_width, box_height) != (self.width, self.height):
+                x, y = min(max(x, 0), box_width - 1), min(max(y, 0), box_height - 1)
+            return x + left, y + top
         else:
             # Real screen coordinates -> assistant's coordinate system
-            return round(x / x_scaling_factor), round(y / y_scaling_factor)
+            return round((x - left) * x_scale), round((y - top) * y_scale)
+
+    def _box_scale(self, box: Box) -> tuple[float, float]:
+        """
+        API pixels per screen coordinate along x and y in screenshots of `box`. The full screen
+        is scaled to the API resolution, a window is scaled by the same factor on both axes to
+        fit inside it.
+        """
+        _, _, box_width, box_height = box
+        if not self._scaling_enabled:
+            return 1.0, 1.0
+        if (box_width, box_height) == (self.width, self.height):
+            return self.target_width / self.width, self.target_height / self.height
+        scale = min(self.target_width / box_width, self.target_height / box_height)
+        return scale, scale
+
+    def crop_frame(
+        self, frame: Image.Image, box: tuple[int, int, int, int]
+    ) -> Image.Image:
+        """
+        Crop a captured frame to a (left, top, right, bottom) box in screen coordinates. Frames
+        can have more pixels than there are screen coordinates, like on Retina displays.
+        """
+        x_ratio = frame.width / self.width
+        y_ratio = frame.height / self.height
+        left, top, right, bottom = box
+        return frame.crop(
+            (
+                round(left * x_ratio),
+                round(top * y_ratio),
+                round(right * x_ratio),
+                round(bottom * y_ratio),
+            )
+        )
+
+    async def locate_capture_box(self) -> Box:
+        """The part of the screen to show in a screenshot, the focused window in active window mode."""
+        full_screen = (0, 0, self.width, self.height)
+        if self.capture_mode != "active_window":
+            return full_screen
+        box = await asyncio.to_thread(get_active_window_box, self.width, self.height)
+        return box or full_screen
+
+
+class ComputerTool20250124(ComputerTool):
+    """
+    The `computer_20250124` version of the computer tool. On top of the original actions it
+    can click and scroll at a coordinate in a single action, hold modifier keys while
+    clicking or scrolling, press and release the mouse button, hold keys and wait.
+    """
+
+    api_type: Literal["computer_20250124"] = "computer_20250124"  # type: ignore[assignment]
+
+    async def perform(
+        self,
+        *,
+        action: Action_20250124,
+        text: str | None = None,
+        coordinate: list[int] | None = None,
+        start_coordinate: list[int] | None = None,
+        scroll_direction: ScrollDirection | None = None,
+        scroll_amount: int | None = None,
+        duration: int | float | None = None,
+        **kwargs,
+    ):
+        if action in ("left_mouse_down", "left_mouse_up"):
+            if coordinate is not None:
+                raise ToolError(f"coordinate is not accepted for {action}")
+            if action == "left_mouse_down":
+                await asyncio.to_thread(self.gui.mouseDown)
+                return ToolResult(output="Left mouse button pressed.")
+            await asyncio.to_thread(self.gui.mouseUp)
+            return ToolResult(output="Left mouse button released.")
+
+        if action == "scroll":
+            if scroll_direction not in get_args(ScrollDirection):
+                raise ToolError(
+                    f"scroll_direction must be one of {', '.join(get_args(ScrollDirection))}"
+                )
+            if not isinstance(scroll_amount, int) or scroll_amount < 0:
+                raise ToolError("scroll_amount must be a non-negative integer")
+            if coordinate is not None:
+                x, y = self.validate_and_get_coordinates(coordinate)
+                await asyncio.to_thread(self.gui.moveTo, x, y)
+
+            modifiers = self.parse_key_combination(text) if text else []
+            for key in modifiers:
+                await asyncio.to_thread(self.gui.keyDown, key)
+            try:
+                if scroll_direction in ("up", "down"):
+                    clicks = scroll_amount if scroll_direction == "up" else -scroll_amount
+                    await asyncio.to_thread(self.gui.scroll, clicks)
+                else:
+                    clicks = scroll_amount if scroll_direction == "right" else -scroll_amount
+                    await asyncio.to_thread(self.gui.hscroll, clicks)
+            finally:
+                for key in reversed(modifiers):
+                    await asyncio.to_thread(self.gui.keyUp, key)
+            return ToolResult(output=f"Scrolled {scroll_direction} by {scroll_amount}.")
+
+        if action in ("hold_key", "wait"):
+            if duration is None or not isinstance(duration, (int, float)):
+                raise ToolError(f"duration must be a number for {action}")
+            if duration < 0:
+                raise ToolError(f"duration must be non-negative for {action}")
+            if duration > MAX_DURATION_SECONDS:
+                raise ToolError(
+                    f"duration must be at most {MAX_DURATION_SECONDS} seconds for {action}"
+                )
+
+            if action == "hold_key":
+                if not isinstance(text, str) or not text:
+                    raise ToolError(f"text is required for {action}")
+                keys = self.parse_key_combination(text)
+                for key in keys:
+                    await asyncio.to_thread(self.gui.keyDown, key)
+                try:
+                    await asyncio.sleep(duration)
+                finally:
+                    for key in reversed(keys):
+                        await asyncio.to_thread(self.gui.keyUp, key)
+                return ToolResult(output=f"Held '{text}' for {duration} seconds.")
+
+            await asyncio.sleep(duration)
+            return await self.screenshot_without_overlay()
+
+        if action in CLICK_DESCRIPTIONS:
+            if coordinate is not None:
+                x, y = self.validate_and_get_coordinates(coordinate)
+                await asyncio.to_thread(self.gui.moveTo, x, y)
+            modifiers = self.parse_key_combination(text) if text else []
+            return await self.click(action, modifiers)
+
+        if action == "left_click_drag" and start_coordinate is not None:
+            x, y = self.validate_and_get_coordinates(start_coordinate)
+            await asyncio.to_thread(self.gui.moveTo, x, y)
+
+        return await super().perform(action=action, text=text, coordinate=coordinate)
+
+
+class ComputerTool20251124(ComputerTool20250124):
+    """
+    The `computer_20251124` version of the computer tool, which adds the zoom action to look
+    at a region of the screen at full resolution.
+    """
+
+    api_type: Literal["computer_20251124"] = "computer_20251124"  # type: ignore[assignment]
+
+    def to_params(self):
+        return {**super().to_params(), "enable_zoom": True}
+
+    async def perform(
+        self,
+        *,
+        action: Action_20251124,
+        region: list[int] | None = None,
+        **kwargs,
+    ):
+        if action == "zoom":
+            return await self.zoom(region)
+        return await super().perform(action=action, **kwargs)
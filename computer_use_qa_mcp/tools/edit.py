@@ -1,11 +1,23 @@
+import asyncio
 from collections import defaultdict
 from pathlib import Path
 from typing import Literal, get_args
 
 from anthropic.types.beta import BetaToolTextEditor20241022Param
 
+from ..tracing import traced
 from .base import BaseAnthropicTool, CLIResult, ToolError, ToolResult
-from .run import maybe_truncate, run
+from .edit_engine import (
+    atomic_write,
+    file_stamp,
+    find_occurrences,
+    line_numbers,
+    line_offset,
+    snippet_bounds,
+)
+from .line_index import LARGE_FILE_THRESHOLD, get_line_index
+from .listing import MAX_ENTRIES, list_directory
+from .run import MAX_RESPONSE_LEN, maybe_truncate
 
 Command = Literal[
     "view",
@@ -27,9 +39,11 @@ class EditTool(BaseAnthropicTool):
     name: Literal["str_replace_editor"] = "str_replace_editor"
 
     _file_history: dict[Path, list[str]]
+    _file_stamps: dict[Path, tuple[int, int]]
 
     def __init__(self):
         self._file_history = defaultdict(list)
+        self._file_stamps = {}
         super().__init__()
 
     def to_params(self) -> BetaToolTextEditor20241022Param:
@@ -106,6 +120,7 @@ class EditTool(BaseAnthropicTool):
                     f"The path {path} is a directory and only the `view` command can be used on directories"
                 )
 
+    @traced("edit.view", "edit")
     async def view(self, path: Path, view_range: list[int] | None = None):
         """Implement the view command"""
         if path.is_dir():
@@ -114,35 +129,31 @@ class EditTool(BaseAnthropicTool):
                     "The `view_range` parameter is not allowed when `path` points to a directory."
                 )
 
-            _, stdout, stderr = await run(
-                rf"find {path} -maxdepth 2 -not -path '*/\.*'"
-            )
+            listing = list_directory(path)
+            stdout = "\n".join(listing.entries) + "\n"
+            stderr = "\n".join(listing.errors)
+            if listing.truncated:
+                stdout += f"<NOTE>Only the first {MAX_ENTRIES} entries are shown. View a subdirectory to see the rest.</NOTE>\n"
             if not stderr:
                 stdout = f"Here's the files and directories up to 2 levels deep in {path}, excluding hidden items:\n{stdout}\n"
             return CLIResult(output=stdout, error=stderr)
 
-        file_content = self.read_file(path)
         init_line = 1
         if view_range:
             if len(view_range) != 2 or not all(isinstance(i, int) for i in view_range):
                 raise ToolError(
                     "Invalid `view_range`. It should be a list of two integers."
                 )
+
+        self.record_stamp(path)
+        if self.file_size(path) >= LARGE_FILE_THRESHOLD:
+            return await self._view_large_file(path, view_range)
+
+        file_content = self.read_file(path)
+        if view_range:
             file_lines = file_content.split("\n")
             n_lines_file = len(file_lines)
-            init_line, final_line = view_range
-            if init_line < 1 or init_line > n_lines_file:
-                raise ToolError(
-                    f"Invalid `view_range`: {view_range}. It's first element `{init_line}` should be within the range of lines of the file: {[1, n_lines_file]}"
-                )
-            if final_line > n_lines_file:
-                raise ToolError(
-                    f"Invalid `view_range`: {view_range}. It's second element `{final_line}` should be smaller than the number of lines in the file: `{n_lines_file}`"
-                )
-            if final_line != -1 and final_line < init_line:
-                raise ToolError(
-                    f"Invalid `view_range`: {view_range}. It's second element `{final_line}` should be larger or equal than its first `{init_line}`"
-                )
+            init_line, final_line = self._validate_view_range(view_range, n_lines_file)
 
             if final_line == -1:
                 file_content = "\n".join(file_lines[init_line - 1 :])
@@ -153,32 +164,75 @@ class EditTool(BaseAnthropicTool):
             output=self._make_output(file_content, str(path), init_line=init_line)
         )
 
+    async def _view_large_file(self, path: Path, view_range: list[int] | None):
+        """View a large file through its line index, reading only the requested lines."""
+        try:
+            # indexing reads the whole file, off the event loop
+            index = await asyncio.to_thread(get_line_index, path)
+        except Exception as e:
+            raise ToolError(f"Ran into {e} while trying to read {path}") from None
+
+        init_line, final_line = 1, -1
+        if view_range:
+            init_line, final_line = self._validate_view_range(
+                view_range, index.line_count
+            )
+        # anything past the response limit would be truncated by _make_output anyway
+        file_content = index.read_lines(
+            init_line, final_line, max_bytes=4 * MAX_RESPONSE_LEN + 4
+        )
+        return CLIResult(
+            output=self._make_output(
+                file_content,
+                f"{path} ({index.line_count} lines)",
+                init_line=init_line,
+            )
+        )
+
+    def _validate_view_range(self, view_range: list[int], n_lines_file: int):
+        """Check that `view_range` fits a file of `n_lines_file` lines."""
+        init_line, final_line = view_range
+        if init_line < 1 or init_line > n_lines_file:
+            raise ToolError(
+                f"Invalid `view_range`: {view_range}. It's first element `{init_line}` should be within the range of lines of the file: {[1, n_lines_file]}"
+            )
+        if final_line > n_lines_file:
+            raise ToolError(
+                f"Invalid `view_range`: {view_range}. It's second element `{final_line}` should be smaller than the number of lines in the file: `{n_lines_file}`"
+            )
+        if final_line != -1 and final_line < init_line:
+            raise ToolError(
+                f"Invalid `view_range`: {view_range}. It's second element `{final_line}` should be larger or equal than its first `{init_line}`"
+            )
+        return init_line, final_line
+
+    @traced("edit.str_replace", "edit")
     def str_replace(self, path: Path, old_str: str, new_str: str | None):
         """Implement the str_replace command, which replaces old_str with new_str in the file content"""
+        self.check_unchanged(path)
+
         # Read the file content
         file_content = self.read_file(path).expandtabs()
         old_str = old_str.expandtabs()
         new_str = new_str.expandtabs() if new_str is not None else ""
 
         # Check if old_str is unique in the file
-        occurrences = file_content.count(old_str)
-        if occurrences == 0:
+        occurrences = find_occurrences(file_content, old_str)
+        if not occurrences:
             raise ToolError(
                 f"No replacement was performed, old_str `{old_str}` did not appear verbatim in {path}."
             )
-        elif occurrences > 1:
-            file_content_lines = file_content.split("\n")
-            lines = [
-                idx + 1
-                for idx, line in enumerate(file_content_lines)
-                if old_str in line
-            ]
+        elif len(occurrences) > 1:
+            lines = list(dict.fromkeys(line_numbers(file_content, occurrences)))
             raise ToolError(
                 f"No replacement was performed. Multiple occurrences of old_str `{old_str}` in lines {lines}. Please ensure it is unique"
             )
 
         # Replace old_str with new_str
-        new_file_content = file_content.replace(old_str, new_str)
+        offset = occurrences[0]
+        new_file_content = (
+            file_content[:offset] + new_str + file_content[offset + len(old_str) :]
+        )
 
         # Write the new content to the file
         self.write_file(path, new_file_content)
@@ -187,46 +241,46 @@ class EditTool(BaseAnthropicTool):
         self._file_history[path].append(file_content)
 
         # Create a snippet of the edited section
-        replacement_line = file_content.split(old_str)[0].count("\n")
-        start_line = max(0, replacement_line - SNIPPET_LINES)
-        end_line = replacement_line + SNIPPET_LINES + new_str.count("\n")
-        snippet = "\n".join(new_file_content.split("\n")[start_line : end_line + 1])
+        replacement_line = file_content.count("\n", 0, offset)
+        snippet_start, snippet_end = snippet_bounds(
+            new_file_content, offset, offset + len(new_str), SNIPPET_LINES
+        )
+        snippet = new_file_content[snippet_start:snippet_end]
 
         # Prepare the success message
         success_msg = f"The file {path} has been edited. "
         success_msg += self._make_output(
-            snippet, f"a snippet of {path}", start_line + 1
+            snippet, f"a snippet of {path}", max(0, replacement_line - SNIPPET_LINES) + 1
         )
         success_msg += "Review the changes and make sure they are as expected. Edit the file again if necessary."
 
         return CLIResult(output=success_msg)
 
+    @traced("edit.insert", "edit")
     def insert(self, path: Path, insert_line: int, new_str: str):
         """Implement the insert command, which inserts new_str at the specified line in the file content."""
+        self.check_unchanged(path)
+
         file_text = self.read_file(path).expandtabs()
         new_str = new_str.expandtabs()
-        file_text_lines = file_text.split("\n")
-        n_lines_file = len(file_text_lines)
+        n_lines_file = file_text.count("\n") + 1
 
         if insert_line < 0 or insert_line > n_lines_file:
             raise ToolError(
                 f"Invalid `insert_line` parameter: {insert_line}. It should be within the range of lines of the file: {[0, n_lines_file]}"
             )
 
-        new_str_lines = new_str.split("\n")
-        new_file_text_lines = (
-            file_text_lines[:insert_line]
-            + new_str_lines
-            + file_text_lines[insert_line:]
-        )
-        snippet_lines = (
-            file_text_lines[max(0, insert_line - SNIPPET_LINES) : insert_line]
-            + new_str_lines
-            + file_text_lines[insert_line : insert_line + SNIPPET_LINES]
-        )
+        if insert_line == n_lines_file:
+            offset = len(file_text) + 1
+            new_file_text = file_text + "\n" + new_str
+        else:
+            offset = line_offset(file_text, insert_line)
+            new_file_text = file_text[:offset] + new_str + "\n" + file_text[offset:]
 
-        new_file_text = "\n".join(new_file_text_lines)
-        snippet = "\n".join(snippet_lines)
+        snippet_start, snippet_end = snippet_bounds(
+            new_file_text, offset, offset + len(new_str), SNIPPET_LINES
+        )
+        snippet = new_file_text[snippet_start:snippet_end]
 
         self.write_file(path, new_file_text)
         self._file_history[path].append(file_text)
@@ -240,10 +294,12 @@ class EditTool(BaseAnthropicTool):
         success_msg += "Review the changes and make sure they are as expected (correct indentation, no duplicate lines, etc). Edit the file again if necessary."
         return CLIResult(output=success_msg)
 
+    @traced("edit.undo_edit", "edit")
     def undo_edit(self, path: Path):
         """Implement the undo_edit command."""
         if not self._file_history[path]:
             raise ToolError(f"No edit history found for {path}.")
+        self.check_unchanged(path)
 
         old_text = self._file_history[path].pop()
         self.write_file(path, old_text)
@@ -259,12 +315,36 @@ class EditTool(BaseAnthropicTool):
         except Exception as e:
             raise ToolError(f"Ran into {e} while trying to read {path}") from None
 
+    def file_size(self, path: Path):
+        """Get the size of a file in bytes; raise a ToolError if an error occurs."""
+        try:
+            return path.stat().st_size
+        except Exception as e:
+            raise ToolError(f"Ran into {e} while trying to read {path}") from None
+
+    @traced("edit.write_file", "edit")
     def write_file(self, path: Path, file: str):
-        """Write the content of a file to a given path; raise a ToolError if an error occurs."""
+        """Atomically write the content of a file to a given path; raise a ToolError if an error occurs."""
         try:
-            path.write_text(file)
+            atomic_write(path, file)
         except Exception as e:
             raise ToolError(f"Ran into {e} while trying to write to {path}") from None
+        self.record_stamp(path)
+
+    def record_stamp(self, path: Path):
+        """Remember the state of a file as last seen by the agent."""
+        try:
+            self._file_stamps[path] = file_stamp(path)
+        except OSError:
+            self._file_stamps.pop(path, None)
+
+    def check_unchanged(self, path: Path):
+        """Refuse to edit a file that was changed on disk since the agent last viewed or edited it."""
+        stamp = self._file_stamps.get(path)
+        if stamp is not None and stamp != file_stamp(path):
+            raise ToolError(
+                f"No edit was performed, {path} was modified on disk since it was last viewed. View the file again before editing it."
+            )
 
     def _make_output(
         self,
@@ -288,3 +368,26 @@ class EditTool(BaseAnthropicTool):
             + file_content
             + "\n"
         )
+
+
+class EditTool20250124(EditTool):
+    """The `text_editor_20250124` version of the editor tool, which behaves the same as the original."""
+
+    api_type: Literal["text_editor_20250124"] = "text_editor_20250124"  # type: ignore[assignment]
+
+
+class EditTool20250728(EditTool):
+    """
+    The `text_editor_20250728` version of the editor tool, used by Claude 4 models. It goes by
+    a different name and does not support `undo_edit`.
+    """
+
+    api_type: Literal["text_editor_20250728"] = "text_editor_20250728"  # type: ignore[assignment]
+    name: Literal["str_replace_based_edit_tool"] = "str_replace_based_edit_tool"  # type: ignore[assignment]
+
+    async def __call__(self, *, command: Command, path: str, **kwargs):
+        if command == "undo_edit":
+            raise ToolError(
+                f"Unrecognized command {command}. The allowed commands for the {self.name} tool are: view, create, str_replace, insert"
+            )
+        return await super().__call__(command=command, path=path, **kwargs)
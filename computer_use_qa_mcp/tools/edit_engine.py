@@ -0,0 +1,106 @@
+"""Single-pass text edit primitives for EditTool: match finding, snippets and atomic writes."""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+LINE_SCAN_CHUNK: int = 1 << 18  # characters counted at a time when seeking to a line
+
+
+def find_occurrences(content: str, old_str: str) -> list[int]:
+    """Offsets of all non-overlapping occurrences of `old_str`, found in one left-to-right scan."""
+    offsets = []
+    offset = content.find(old_str)
+    while offset != -1:
+        offsets.append(offset)
+        offset = content.find(old_str, offset + len(old_str))
+    return offsets
+
+
+def line_numbers(content: str, offsets: list[int]) -> list[int]:
+    """1-based line numbers of sorted `offsets`, counting newlines only once across all of them."""
+    lines = []
+    line, previous = 1, 0
+    for offset in offsets:
+        line += content.count("\n", previous, offset)
+        previous = offset
+        lines.append(line)
+    return lines
+
+
+def line_offset(content: str, line: int) -> int:
+    """Offset where the 0-based `line` starts; `line` must not exceed the newline count."""
+    offset, remaining = 0, line
+    # skip whole chunks with str.count, then walk the last few newlines one by one
+    while remaining:
+        chunk_end = offset + LINE_SCAN_CHUNK
+        newlines = content.count("\n", offset, chunk_end)
+        if newlines >= remaining:
+            break
+        remaining -= newlines
+        offset = chunk_end
+    for _ in range(remaining):
+        offset = content.find("\n", offset) + 1
+    return offset
+
+
+def snippet_bounds(
+    content: str, start: int, end: int, context_lines: int
+) -> tuple[int, int]:
+    """Offsets of the lines spanning `content[start:end]` plus `context_lines` lines on each side."""
+    snippet_start = start
+    for _ in range(context_lines + 1):
+        newline = content.rfind("\n", 0, snippet_start)
+        if newline == -1:
+            snippet_start = 0
+            break
+        snippet_start = newline
+    else:
+        snippet_start += 1
+
+    snippet_end = end
+    for _ in range(context_lines + 1):
+        newline = content.find("\n", snippet_end)
+        if newline == -1:
+            snippet_end = len(content)
+            break
+        snippet_end = newline + 1
+    else:
+        snippet_end -= 1
+
+    return snippet_start, snippet_end
+
+
+def file_stamp(path: Path) -> tuple[int, int]:
+    """A cheap fingerprint of a file on disk, used to detect changes made behind our back."""
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def atomic_write(path: Path, content: str):
+    """
+    Write `content` to a temporary file in the same directory and rename it over `path`,
+    so readers never see a half written file. New files are written directly.
+    """
+    if not path.exists():
+        path.write_text(content)
+        return
+
+    target = path.resolve()
+    fd, tmp_path = tempfile.mkstemp(
+        dir=target.parent, prefix=f".{target.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        shutil.copymode(target, tmp_path)
+        os.replace(tmp_path, target)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
@@ -0,0 +1,50 @@
+"""Cheap low resolution probes of screen frames, used to tell whether the screen changed."""
+
+from PIL import Image, ImageChops
+
+PROBE_WIDTH: int = 480
+# probes are compared tile by tile, so a change confined to a small area, like a line of text
+# or a ticked checkbox, is not averaged away over the whole screen
+PROBE_TILE: int = 8  # side of a tile in probe pixels, about 24 screen pixels
+# mean absolute difference (0-255) within any one tile above which the screen changed. A single
+# typed character is over it, so is a blinking caret: a change is never missed, at the cost of
+# reporting some that do not matter
+PROBE_TOLERANCE: float = 2.0
+# fingerprints are this small whatever the screen resolution, so they can be stored per turn.
+# Each of their pixels is the mean of a tile of about 22 screen pixels
+FINGERPRINT_SIZE: tuple[int, int] = (64, 40)
+
+
+def make_probe(image: Image.Image) -> Image.Image:
+    """Downscale a frame to a small grayscale image, using the fast integer reduce path."""
+    factor = max(1, image.width // PROBE_WIDTH)
+    return image.reduce(factor).convert("L")
+
+
+def probe_difference(a: Image.Image, b: Image.Image) -> float:
+    """Mean absolute pixel difference within the most changed tile of two probes, 255 if they are not comparable."""
+    if a.size != b.size:
+        return 255.0
+    # reducing the difference averages it over each tile
+    return float(ImageChops.difference(a, b).reduce(PROBE_TILE).getextrema()[1])
+
+
+def probes_match(a: Image.Image, b: Image.Image, tolerance: float = PROBE_TOLERANCE) -> bool:
+    return probe_difference(a, b) <= tolerance
+
+
+def frames_equal(a: Image.Image, b: Image.Image) -> bool:
+    """Whether two full resolution frames are pixel for pixel the same."""
+    return a.size == b.size and a.mode == b.mode and ImageChops.difference(a, b).getbbox() is None
+
+
+def make_fingerprint(image: Image.Image) -> bytes:
+    """A tiny grayscale thumbnail of a frame, to tell later whether a screen shows the same thing."""
+    return make_probe(image).resize(FINGERPRINT_SIZE, Image.Resampling.BOX).tobytes()
+
+
+def fingerprint_difference(a: bytes, b: bytes) -> float:
+    """Absolute difference of the most changed tile of two fingerprints, 255 if they are not comparable."""
+    if len(a) != len(b) or not a:
+        return 255.0
+    return float(max(abs(x - y) for x, y in zip(a, b)))
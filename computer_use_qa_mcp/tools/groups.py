@@ -0,0 +1,50 @@
+"""Versions of the Anthropic-defined tools, and the beta flag each one is served under."""
+
+from dataclasses import dataclass
+from typing import Literal
+
+from .base import BaseAnthropicTool
+from .bash import BashTool, BashTool20250124
+from .computer import ComputerTool, ComputerTool20250124, ComputerTool20251124
+from .edit import EditTool, EditTool20250124, EditTool20250728
+
+ToolVersion = Literal[
+    "computer_use_20241022", "computer_use_20250124", "computer_use_20251124"
+]
+BetaFlag = Literal[
+    "computer-use-2024-10-22", "computer-use-2025-01-24", "computer-use-2025-11-24"
+]
+
+
+@dataclass(frozen=True, kw_only=True)
+class ToolGroup:
+    version: ToolVersion
+    tools: list[type[BaseAnthropicTool]]
+    beta_flag: BetaFlag
+    default_model: str
+
+
+TOOL_GROUPS: list[ToolGroup] = [
+    ToolGroup(
+        version="computer_use_20241022",
+        tools=[ComputerTool, EditTool, BashTool],
+        beta_flag="computer-use-2024-10-22",
+        default_model="claude-3-5-sonnet-20241022",
+    ),
+    ToolGroup(
+        version="computer_use_20250124",
+        tools=[ComputerTool20250124, EditTool20250124, BashTool20250124],
+        beta_flag="computer-use-2025-01-24",
+        default_model="claude-3-7-sonnet-20250219",
+    ),
+    ToolGroup(
+        version="computer_use_20251124",
+        tools=[ComputerTool20251124, EditTool20250728, BashTool20250124],
+        beta_flag="computer-use-2025-11-24",
+        default_model="claude-opus-4-5-20251101",
+    ),
+]
+
+TOOL_GROUPS_BY_VERSION: dict[ToolVersion, ToolGroup] = {
+    tool_group.version: tool_group for tool_group in TOOL_GROUPS
+}
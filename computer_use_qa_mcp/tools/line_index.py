@@ -0,0 +1,127 @@
+"""Memory-mapped line-offset index for reading small windows of very large files."""
+
+import mmap
+import os
+import re
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from pathlib import Path
+
+CHUNK_SIZE: int = 1 << 18  # bytes covered by each index checkpoint
+LARGE_FILE_THRESHOLD: int = 8 << 20  # files at least this big are viewed through the index
+INDEX_CACHE_SIZE: int = 16
+# the line endings `Path.read_text` translates to "\n", as the small file path reads files
+LINE_ENDING = re.compile(rb"\r\n?|\n")
+
+
+def _normalize_newlines(text: str) -> str:
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+class LineIndex:
+    """
+    A sparse index of the line starts of a file.
+
+    The file is read once, one chunk at a time, keeping the number of line endings seen
+    before each chunk. Looking up a line only rescans the single chunk it falls in, and
+    reading a window of lines only touches the bytes of that window through mmap. Line
+    endings are "\n", "\r\n" and a lone "\r", the same as for files read whole.
+    """
+
+    path: Path
+    mtime_ns: int
+    size: int
+    newlines: int
+
+    def __init__(self, path: Path, mtime_ns: int, size: int):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.newlines = 0
+        self._chunk_newlines: list[int] = [0]
+        self._carriage_returns = False  # without them, lines end at "\n" and are found faster
+        # plain buffered reads for the full scan, so the whole file is not kept mapped
+        with open(path, "rb") as f:
+            previous = b""
+            while chunk := f.read(CHUNK_SIZE):
+                self.newlines += chunk.count(b"\n")
+                if b"\r" in chunk:  # a quick check, most files have none
+                    self._carriage_returns = True
+                    self.newlines += chunk.count(b"\r") - chunk.count(b"\r\n")
+                if previous.endswith(b"\r") and chunk.startswith(b"\n"):
+                    # a "\r\n" split between chunks, counted with the chunk of its "\r"
+                    self.newlines -= 1
+                self._chunk_newlines.append(self.newlines)
+                previous = chunk
+
+    @property
+    def line_count(self) -> int:
+        """Number of lines, counted the same way as `len(path.read_text().split("\\n"))`."""
+        return self.newlines + 1
+
+    def _mmap(self) -> mmap.mmap:
+        with open(self.path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _line_offset(self, mm: mmap.mmap, line: int) -> int:
+        """Byte offset where the given 1-based line starts; the file size past the last line."""
+        if line <= 1:
+            return 0
+        if line > self.line_count:
+            return self.size
+        # line N starts right after line ending number N - 1, find the chunk holding it
+        target = line - 1
+        chunk = bisect_left(self._chunk_newlines, target) - 1
+        offset = chunk * CHUNK_SIZE
+        if offset and mm[offset - 1 : offset + 1] == b"\r\n":
+            offset += 1  # the "\n" ends a line counted with the chunk before
+        if not self._carriage_returns:
+            for _ in range(target - self._chunk_newlines[chunk]):
+                offset = mm.find(b"\n", offset) + 1
+            return offset
+        for _ in range(target - self._chunk_newlines[chunk]):
+            match = LINE_ENDING.search(mm, offset)
+            assert match is not None, "the index counted more line endings than the file has"
+            offset = match.end()
+        return offset
+
+    def read_lines(
+        self, init_line: int, final_line: int = -1, max_bytes: int | None = None
+    ) -> str:
+        """
+        Read lines `init_line` to `final_line` (inclusive, 1-based, -1 for the end of the file).
+        At most `max_bytes` bytes are read, callers are expected to truncate the result.
+        """
+        if not self.size:
+            return ""
+        with self._mmap() as mm:
+            start = self._line_offset(mm, init_line)
+            with_ending = final_line != -1 and final_line < self.line_count
+            # up to the start of the next line, so a "\r\n" ending is not cut in half
+            end = self._line_offset(mm, final_line + 1) if with_ending else self.size
+            if max_bytes is not None and end > start + max_bytes:
+                end, with_ending = start + max_bytes, False
+            data = mm[start:end]
+        text = _normalize_newlines(data.decode(errors="replace"))
+        # the last line is given without its line ending, as `"\n".join` of its lines would
+        return text[:-1] if with_ending else text
+
+
+_index_cache: OrderedDict[Path, LineIndex] = OrderedDict()
+_index_cache_lock = threading.Lock()  # indexes are built in worker threads
+
+
+def get_line_index(path: Path) -> LineIndex:
+    """Get the line index of a file, rebuilding it only when its mtime or size changed."""
+    stat = os.stat(path)
+    with _index_cache_lock:
+        index = _index_cache.get(path)
+    if index is None or (index.mtime_ns, index.size) != (stat.st_mtime_ns, stat.st_size):
+        index = LineIndex(path, stat.st_mtime_ns, stat.st_size)
+    with _index_cache_lock:
+        _index_cache[path] = index
+        _index_cache.move_to_end(path)
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
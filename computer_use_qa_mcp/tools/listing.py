@@ -0,0 +1,104 @@
+"""In-process, cached directory listing used by EditTool to view directories."""
+
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from fnmatch import fnmatch
+from pathlib import Path
+
+MAX_DEPTH: int = 2
+MAX_ENTRIES: int = 1000
+# directories matching these are listed, but their contents are not
+IGNORE_PATTERNS: tuple[str, ...] = (
+    "node_modules",
+    "__pycache__",
+    "venv",
+    "dist",
+    "build",
+    "target",
+)
+LISTING_CACHE_SIZE: int = 32
+
+
+@dataclass(frozen=True)
+class DirectoryListing:
+    """The entries found under a directory, plus what is needed to tell if it is stale."""
+
+    entries: list[str]
+    errors: list[str]
+    truncated: bool
+    dir_mtimes: tuple[tuple[str, int], ...]
+
+    def is_stale(self) -> bool:
+        for directory, mtime_ns in self.dir_mtimes:
+            try:
+                if os.stat(directory).st_mtime_ns != mtime_ns:
+                    return True
+            except OSError:
+                return True
+        return False
+
+
+def _walk(
+    path: str, max_depth: int, max_entries: int, ignore: tuple[str, ...]
+) -> DirectoryListing:
+    """
+    List `path` up to `max_depth` levels deep, skipping hidden items, in the same order
+    and format as `find {path} -maxdepth {max_depth} -not -path '*/.*'`.
+    """
+    entries = [path]
+    errors: list[str] = []
+    dir_mtimes: list[tuple[str, int]] = []
+    truncated = False
+
+    def visit(directory: str, depth: int):
+        nonlocal truncated
+        try:
+            dir_mtimes.append((directory, os.stat(directory).st_mtime_ns))
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.name.startswith("."):
+                        continue
+                    if len(entries) > max_entries:
+                        truncated = True
+                        return
+                    entries.append(entry.path)
+                    if (
+                        depth < max_depth
+                        and entry.is_dir(follow_symlinks=False)
+                        and not any(fnmatch(entry.name, pattern) for pattern in ignore)
+                    ):
+                        visit(entry.path, depth + 1)
+                        if truncated:
+                            return
+        except OSError as e:
+            errors.append(f"find: '{directory}': {e.strerror}")
+
+    visit(path, 1)
+    return DirectoryListing(
+        entries=entries,
+        errors=errors,
+        truncated=truncated,
+        dir_mtimes=tuple(dir_mtimes),
+    )
+
+
+_listing_cache: OrderedDict[tuple, DirectoryListing] = OrderedDict()
+
+
+def list_directory(
+    path: Path,
+    max_depth: int = MAX_DEPTH,
+    max_entries: int = MAX_ENTRIES,
+    ignore: tuple[str, ...] = IGNORE_PATTERNS,
+) -> DirectoryListing:
+    """List a directory, reusing the previous listing while none of the scanned directories changed."""
+    key = (str(path), max_depth, max_entries, ignore)
+    listing = _listing_cache.get(key)
+    if listing is None or listing.is_stale():
+        listing = _walk(str(path), max_depth, max_entries, ignore)
+        _listing_cache[key] = listing
+        while len(_listing_cache) > LISTING_CACHE_SIZE:
+            _listing_cache.popitem(last=False)
+    _listing_cache.move_to_end(key)
+    return listing
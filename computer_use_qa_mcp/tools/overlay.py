@@ -9,6 +9,8 @@ from typing import Optional
 import threading
 import time
 
+from ..tracing import traced
+
 
 class ActionOverlay:
     """
@@ -137,6 +139,7 @@ class ActionOverlay:
             # Silently fail if GUI operations fail
             pass
 
+    @traced("overlay.hide", "overlay")
     def hide(self):
         """Hide the overlay immediately."""
         try:
@@ -152,6 +155,7 @@ class ActionOverlay:
             # Silently fail if GUI operations fail
             pass
 
+    @traced("overlay.show", "overlay")
     def show(self):
         """Show the overlay immediately."""
         try:
@@ -0,0 +1,80 @@
+"""Choose the resolution screenshots are sent at, and downscale frames to it."""
+
+import math
+
+from PIL import Image
+
+from ..tracing import traced
+
+# Resolutions that screenshots are scaled to, the model is most accurate at these
+STANDARD_RESOLUTIONS: dict[str, tuple[int, int]] = {
+    "XGA": (1024, 768),  # 4:3
+    "WXGA": (1280, 800),  # 16:10
+    "FWXGA": (1366, 768),  # ~16:9
+}
+# screens whose aspect ratio is at most this far from a standard resolution are scaled to
+# it exactly, stretching the image a little, instead of being fitted inside it
+ASPECT_RATIO_TOLERANCE: float = 0.02
+PIXELS_PER_IMAGE_TOKEN: int = 750  # an image costs about width * height / 750 input tokens
+
+RESAMPLING_FILTER = Image.Resampling.BICUBIC
+# frames at least twice the target size are first reduced by the integer part of the scale
+# factor, then the much smaller image is resampled. This is as sharp as the integer path
+REDUCING_GAP: float = 1.0
+
+
+def image_tokens(width: int, height: int) -> int:
+    return math.ceil(width * height / PIXELS_PER_IMAGE_TOKEN)
+
+
+def choose_target_size(
+    width: int, height: int, max_image_tokens: int | None = None
+) -> tuple[int, int]:
+    """
+    The resolution to send screenshots of a `width`x`height` screen at.
+
+    Picks the standard resolution closest to the screen's aspect ratio among those within
+    `max_image_tokens`, and fits the screen inside it. Screens are never scaled up, and are
+    scaled down further when no standard resolution is within the token budget.
+    """
+    aspect_ratio = width / height
+    candidates = [
+        size
+        for size in STANDARD_RESOLUTIONS.values()
+        if max_image_tokens is None or image_tokens(*size) <= max_image_tokens
+    ] or list(STANDARD_RESOLUTIONS.values())
+    standard_width, standard_height = min(
+        candidates,
+        key=lambda size: (abs(size[0] / size[1] - aspect_ratio), -size[0] * size[1]),
+    )
+
+    if width <= standard_width and height <= standard_height:
+        target_width, target_height = width, height
+    elif abs(standard_width / standard_height - aspect_ratio) <= ASPECT_RATIO_TOLERANCE:
+        target_width, target_height = standard_width, standard_height
+    else:
+        scale = min(standard_width / width, standard_height / height)
+        target_width, target_height = round(width * scale), round(height * scale)
+
+    if max_image_tokens is not None and image_tokens(target_width, target_height) > max_image_tokens:
+        scale = math.sqrt(
+            max_image_tokens * PIXELS_PER_IMAGE_TOKEN / (target_width * target_height)
+        )
+        target_width = max(1, math.floor(target_width * scale))
+        target_height = max(1, math.floor(target_height * scale))
+    return target_width, target_height
+
+
+@traced("resize", "computer")
+def resize_frame(image: Image.Image, size: tuple[int, int]) -> Image.Image:
+    """
+    Scale a frame to `size`. Integer scale factors, like a Retina frame to half its size, go
+    through `Image.reduce` which averages pixel blocks instead of resampling. Other factors
+    are reduced by their integer part first, then resampled.
+    """
+    if image.size == size:
+        return image
+    width, height = size
+    if image.width % width == 0 and image.height % height == 0:
+        return image.reduce((image.width // width, image.height // height))
+    return image.resize(size, RESAMPLING_FILTER, reducing_gap=REDUCING_GAP)
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Literal, get_args
+
+from PIL import Image
+
+try:
+    import pytesseract
+except ImportError:
+    # OCR is optional, the text condition is unavailable without it
+    pytesseract = None
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    # template matching is optional, the template condition is unavailable without it
+    cv2 = None
+    np = None
+
+from .base import BaseAnthropicTool, ToolError, ToolResult
+from .computer import ComputerTool, ScalingSource
+from .frames import make_probe, probes_match
+
+logger = logging.getLogger(__name__)
+
+Condition = Literal["screen_stable", "region_change", "text", "template"]
+
+DEFAULT_TIMEOUT = 10.0  # seconds
+MAX_TIMEOUT = 120.0  # seconds
+DEFAULT_POLL_INTERVAL = 0.5  # seconds
+MIN_POLL_INTERVAL = 0.05  # seconds
+TEMPLATE_MATCH_THRESHOLD = 0.9
+
+DESCRIPTION = """Wait until something happens on the screen, without taking screenshots in between.
+The screen is checked locally every `poll_interval` seconds until the condition is met or `timeout` seconds pass, then a single screenshot is returned.
+Use it instead of repeatedly taking screenshots while a page loads or a spinner is showing.
+Conditions:
+* screen_stable: the screen stopped changing, e.g. a page finished loading or an animation ended
+* region_change: the pixels inside `region` changed from how they look when the wait starts
+* text: `text` appears on the screen (inside `region` if given)
+* template: the image at `template_path` appears on the screen (inside `region` if given)"""
+
+
+class WaitForTool(BaseAnthropicTool):
+    """
+    A custom tool that polls the screen locally until a condition is met, saving the model
+    the screenshot round trips of watching a loading screen.
+    """
+
+    name: Literal["wait_for"] = "wait_for"
+
+    def __init__(self, computer: ComputerTool):
+        self.computer = computer
+        super().__init__()
+
+    def to_params(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": DESCRIPTION,
+            "input_schema": {
+                "type": "object",
+                "properties": {
+                    "condition": {"type": "string", "enum": list(get_args(Condition))},
+                    "region": {
+                        "type": "array",
+                        "items": {"type": "integer"},
+                        "minItems": 4,
+                        "maxItems": 4,
+                        "description": "[x0, y0, x1, y1] rectangle in screenshot coordinates",
+                    },
+                    "text": {"type": "string"},
+                    "template_path": {
+                        "type": "string",
+                        "description": "Absolute path of an image file at screen resolution",
+                    },
+                    "timeout": {"type": "number", "default": DEFAULT_TIMEOUT},
+                    "poll_interval": {"type": "number", "default": DEFAULT_POLL_INTERVAL},
+                },
+                "required": ["condition"],
+            },
+        }
+
+    async def __call__(
+        self,
+        *,
+        condition: Condition,
+        region: list[int] | None = None,
+        text: str | None = None,
+        template_path: str | None = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        **kwargs,
+    ):
+        if condition not in get_args(Condition):
+            raise ToolError(
+                f"Invalid condition: {condition}. It should be one of {', '.join(get_args(Condition))}"
+            )
+        if not isinstance(timeout, (int, float)) or not 0 < timeout <= MAX_TIMEOUT:
+            raise ToolError(f"timeout must be a number between 0 and {MAX_TIMEOUT} seconds")
+        if not isinstance(poll_interval, (int, float)) or poll_interval < MIN_POLL_INTERVAL:
+            raise ToolError(f"poll_interval must be at least {MIN_POLL_INTERVAL} seconds")
+
+        box = self._screen_box(region) if region is not None else None
+        if condition == "region_change" and box is None:
+            raise ToolError("region is required for condition region_change")
+        if condition == "text":
+            if not text:
+                raise ToolError("text is required for condition text")
+            if pytesseract is None:
+                raise ToolError("the text condition needs pytesseract to be installed")
+        template = None
+        if condition == "template":
+            if not template_path:
+                raise ToolError("template_path is required for condition template")
+            if cv2 is None:
+                raise ToolError("the template condition needs opencv-python to be installed")
+            try:
+                template = Image.open(Path(template_path)).convert("L")
+            except Exception as e:
+                raise ToolError(f"Ran into {e} while trying to read {template_path}") from None
+
+        logger.info(f"Waiting for: {condition}" + (f", text: {text}" if text else ""))
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + timeout
+        met = False
+        previous_probe = None
+
+        self.computer.overlay.hide()
+        try:
+            frame = await self.computer.capture()
+            initial_probe = make_probe(self.computer.crop_frame(frame, box)) if box else None
+            while True:
+                area = self.computer.crop_frame(frame, box) if box else frame
+                if condition == "screen_stable":
+                    probe = make_probe(area)
+                    met = previous_probe is not None and probes_match(previous_probe, probe)
+                    previous_probe = probe
+                elif condition == "region_change":
+                    met = not probes_match(initial_probe, make_probe(area))  # type: ignore[arg-type]
+                elif condition == "text":
+                    met = await asyncio.to_thread(self._has_text, area, text)  # type: ignore[arg-type]
+                else:
+                    met = await asyncio.to_thread(self._has_template, area, template)  # type: ignore[arg-type]
+
+                if met or loop.time() + poll_interval > deadline:
+                    break
+                await asyncio.sleep(poll_interval)
+                frame = await self.computer.capture()
+        finally:
+            self.computer.overlay.show()
+
+        elapsed = loop.time() - start
+        if met:
+            output = f"Condition {condition} met after {elapsed:.1f} seconds."
+        else:
+            output = f"Timed out after {elapsed:.1f} seconds waiting for {condition}."
+        return ToolResult(output=output, base64_image=await self.computer.encode(frame))
+
+    def _screen_box(self, region: list[int]) -> tuple[int, int, int, int]:
+        """Convert an API coordinates region to a crop box on the full resolution screen."""
+        if not isinstance(region, list) or len(region) != 4:
+            raise ToolError("region must be a list of 4 integers")
+        if not all(isinstance(i, int) and i >= 0 for i in region):
+            raise ToolError("region must be a list of non-negative integers")
+        x0, y0, x1, y1 = region
+        if x1 <= x0 or y1 <= y0:
+            raise ToolError("region must be [x0, y0, x1, y1] with x1 > x0 and y1 > y0")
+        x0, y0 = self.computer.scale_coordinates(ScalingSource.API, x0, y0)
+        x1, y1 = self.computer.scale_coordinates(ScalingSource.API, x1, y1)
+        if x1 <= x0 or y1 <= y0:
+            raise ToolError("region is in the padding outside the window shown in the screenshot")
+        return x0, y0, x1, y1
+
+    def _has_text(self, image: Image.Image, text: str) -> bool:
+        found = pytesseract.image_to_string(image.convert("L"))  # type: ignore[union-attr]
+        return " ".join(text.lower().split()) in " ".join(found.lower().split())
+
+    def _has_template(self, image: Image.Image, template: Image.Image) -> bool:
+        if template.width > image.width or template.height > image.height:
+            return False
+        scores = cv2.matchTemplate(  # type: ignore[union-attr]
+            np.asarray(image.convert("L")),  # type: ignore[union-attr]
+            np.asarray(template),  # type: ignore[union-attr]
+            cv2.TM_CCOEFF_NORMED,  # type: ignore[union-attr]
+        )
+        return float(scores.max()) >= TEMPLATE_MATCH_THRESHOLD
@@ -0,0 +1,80 @@
+"""Locate the focused window, to restrict screenshots to it."""
+
+import re
+import subprocess
+import sys
+
+Box = tuple[int, int, int, int]  # left, top, width, height in screen coordinates
+
+MIN_WINDOW_SIZE = 100  # screen coordinates, anything smaller is not worth cropping to
+
+# position and size of the front window of the frontmost application, as "x, y, w, h"
+MACOS_FRONT_WINDOW_SCRIPT = """
+tell application "System Events"
+    tell (first process whose frontmost is true)
+        set {x, y} to position of front window
+        set {w, h} to size of front window
+    end tell
+end tell
+return {x, y, w, h}
+"""
+
+
+def _run(*args: str) -> str:
+    return subprocess.run(
+        args, capture_output=True, text=True, timeout=2, check=True
+    ).stdout
+
+
+def get_active_window_box(screen_width: int, screen_height: int) -> Box | None:
+    """
+    Bounds of the focused window, clamped to the screen. None when they cannot be found.
+    """
+    if sys.platform == "darwin":
+        bounds = _macos_front_window()
+    else:
+        bounds = _x11_active_window()
+    if bounds is None:
+        return None
+
+    x, y, width, height = bounds
+    left = max(0, x)
+    top = max(0, y)
+    right = min(screen_width, x + width)
+    bottom = min(screen_height, y + height)
+    if right - left < MIN_WINDOW_SIZE or bottom - top < MIN_WINDOW_SIZE:
+        return None
+    return left, top, right - left, bottom - top
+
+
+def _macos_front_window() -> Box | None:
+    """Needs the accessibility permission that pyautogui already asks for."""
+    try:
+        output = _run("osascript", "-e", MACOS_FRONT_WINDOW_SCRIPT)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    values = re.findall(r"-?\d+", output)
+    if len(values) != 4:
+        return None
+    x, y, width, height = (int(value) for value in values)
+    return x, y, width, height
+
+
+def _x11_active_window() -> Box | None:
+    """Through `_NET_ACTIVE_WINDOW`, as set by window managers under Xvfb."""
+    try:
+        active = _run("xprop", "-root", "_NET_ACTIVE_WINDOW")
+        match = re.search(r"window id # (0x[0-9a-f]+)", active)
+        if not match or int(match.group(1), 16) == 0:
+            return None
+        info = _run("xwininfo", "-id", match.group(1))
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+    values = {}
+    for key in ("Absolute upper-left X", "Absolute upper-left Y", "Width", "Height"):
+        found = re.search(rf"{key}:\s+(-?\d+)", info)
+        if not found:
+            return None
+        values[key] = int(found.group(1))
+    return tuple(values.values())  # type: ignore[return-value]
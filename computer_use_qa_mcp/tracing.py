@@ -0,0 +1,192 @@
+"""
+Lightweight timing spans, to see where the time of a QA run goes.
+
+Spans are only recorded inside a `Trace`, which is scoped to the current context, so they
+follow a run into its tasks and `asyncio.to_thread` calls. Outside of one, `span` returns a
+shared no-op context manager and costs a context variable lookup.
+"""
+
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+_current_trace: ContextVar["Trace | None"] = ContextVar("current_trace", default=None)
+_current_span: ContextVar["_Span | None"] = ContextVar("current_span", default=None)
+
+
+@dataclass
+class SpanEvent:
+    name: str
+    category: str
+    start_ns: int
+    duration_ns: int
+    thread: int
+    child_ns: int  # time spent in spans nested directly inside this one
+    args: dict[str, Any] = field(default_factory=dict)
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("trace", "name", "category", "args", "start_ns", "child_ns", "parent", "_token")
+
+    def __init__(self, trace: "Trace", name: str, category: str, args: dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.category = category
+        self.args = args
+        self.child_ns = 0
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        self._token = _current_span.set(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration_ns = time.perf_counter_ns() - self.start_ns
+        _current_span.reset(self._token)
+        if self.parent is not None:
+            self.parent.child_ns += duration_ns
+        self.trace.events.append(
+            SpanEvent(
+                name=self.name,
+                category=self.category,
+                start_ns=self.start_ns,
+                duration_ns=duration_ns,
+                thread=self.trace.thread_id(),
+                child_ns=self.child_ns,
+                args=self.args,
+            )
+        )
+        return False
+
+
+def span(name: str, category: str = "", **args: Any):
+    """Time the enclosed block as `name`, if a trace is active."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, name, category, args)
+
+
+def traced(name: str, category: str = ""):
+    """Decorate a function or coroutine function to time its calls as `name`."""
+
+    def decorate(function):
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, category):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name, category):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+class Trace:
+    """The spans of one run. Use as a context manager to record the spans of the enclosed block."""
+
+    def __init__(self):
+        self.events: list[SpanEvent] = []
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: int | None = None
+        self._thread_ids: dict[int, int] = {}
+
+    def __enter__(self) -> "Trace":
+        self._token = _current_trace.set(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.end_ns = time.perf_counter_ns()
+        _current_trace.reset(self._token)
+        return False
+
+    def thread_id(self) -> int:
+        """A small id for the asyncio task or the thread a span ran in, for the trace viewer rows."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task) if task is not None else threading.get_ident()
+        return self._thread_ids.setdefault(key, len(self._thread_ids) + 1)
+
+    @property
+    def duration_ns(self) -> int:
+        return (self.end_ns or time.perf_counter_ns()) - self.start_ns
+
+    def breakdown(self) -> list[tuple[str, int, float]]:
+        """
+        (name, calls, seconds) per span name, longest first. The seconds do not include the
+        spans nested inside, so they add up to at most the duration of the trace.
+        """
+        calls: dict[str, int] = defaultdict(int)
+        self_ns: dict[str, int] = defaultdict(int)
+        for event in self.events:
+            calls[event.name] += 1
+            self_ns[event.name] += max(0, event.duration_ns - event.child_ns)
+        return sorted(
+            ((name, calls[name], self_ns[name] / 1e9) for name in calls),
+            key=lambda item: item[2],
+            reverse=True,
+        )
+
+    def summary(self, limit: int = 8) -> str:
+        total = self.duration_ns / 1e9
+        phases = ", ".join(
+            f"{name} {seconds:.1f}s ({seconds / total:.0%}, {count}x)"
+            for name, count, seconds in self.breakdown()[:limit]
+        )
+        return f"{total:.1f}s in total: {phases}" if phases else f"{total:.1f}s in total"
+
+    def to_chrome_trace(self) -> dict[str, Any]:
+        """The spans as Chrome trace events, for chrome://tracing or ui.perfetto.dev."""
+        pid = os.getpid()
+        return {
+            "displayTimeUnit": "ms",
+            "traceEvents": [
+                {
+                    "name": event.name,
+                    "cat": event.category,
+                    "ph": "X",
+                    "ts": (event.start_ns - self.start_ns) / 1000,
+                    "dur": event.duration_ns / 1000,
+                    "pid": pid,
+                    "tid": event.thread,
+                    "args": event.args,
+                }
+                for event in self.events
+            ],
+        }
+
+    def write(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_chrome_trace(), default=str))
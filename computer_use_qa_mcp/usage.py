@@ -0,0 +1,141 @@
+"""
+What a QA run consumed, in tokens, images and time, and the budget it has to stay within.
+"""
+
+import base64
+import time
+from dataclasses import dataclass, field
+
+from anthropic.types.beta import BetaToolResultBlockParam, BetaUsage
+
+BUDGET_REACHED_PROMPT = (
+    "<system>This run reached its {reason}. Do not use any more tools. Write your final "
+    "report now from what you have seen so far, and say which instructions you could not test."
+    "</system>"
+)
+
+# USD per million input and output tokens of each model family, matched in model ids such as
+# `claude-3-7-sonnet-20250219` or `anthropic.claude-3-7-sonnet-20250219-v1:0`
+MODEL_PRICES: dict[str, tuple[float, float]] = {
+    "claude-3-haiku": (0.25, 1.25),
+    "claude-3-5-haiku": (0.8, 4.0),
+    "claude-haiku-4-5": (1.0, 5.0),
+    "claude-3-5-sonnet": (3.0, 15.0),
+    "claude-3-7-sonnet": (3.0, 15.0),
+    "claude-sonnet-4": (3.0, 15.0),
+    "claude-sonnet-4-5": (3.0, 15.0),
+    "claude-opus-4": (15.0, 75.0),
+    "claude-opus-4-1": (15.0, 75.0),
+    "claude-opus-4-5": (5.0, 25.0),
+}
+
+
+def model_cost(model: str, input_tokens: int, output_tokens: int) -> float | None:
+    """
+    Cost in USD of the tokens of `model`, None for a model without a known price. Input tokens
+    read from or written to the prompt cache are priced as plain input tokens.
+    """
+    # the longest family first, so claude-opus-4-5 is not priced as claude-opus-4
+    for family in sorted(MODEL_PRICES, key=len, reverse=True):
+        if family in model:
+            input_price, output_price = MODEL_PRICES[family]
+            return (input_tokens * input_price + output_tokens * output_price) / 1e6
+    return None
+
+
+@dataclass
+class RunUsage:
+    """Totals of a run, added up from the usage of each model response and the tool results."""
+
+    turns: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    images_sent: int = 0
+    image_bytes: int = 0
+    start: float = field(default_factory=time.monotonic)
+    end: float | None = None
+    stopped_by: str | None = None  # the budget limit that ended the run early, if any
+    rate_limit_wait: float = 0.0  # seconds model calls waited for the shared rate limits
+    providers: list[str] = field(default_factory=list)  # the provider that served each turn
+
+    def add_response(self, usage: BetaUsage, provider: str | None = None):
+        self.turns += 1
+        if provider is not None:
+            self.providers.append(provider)
+        self.input_tokens += usage.input_tokens
+        self.output_tokens += usage.output_tokens
+        self.cache_creation_input_tokens += usage.cache_creation_input_tokens or 0
+        self.cache_read_input_tokens += usage.cache_read_input_tokens or 0
+
+    def add_tool_results(self, tool_results: list[BetaToolResultBlockParam]) -> int:
+        """Count the images of tool results about to be sent to the model, returns how many."""
+        images_before = self.images_sent
+        for tool_result in tool_results:
+            content = tool_result.get("content", [])
+            for block in content if isinstance(content, list) else []:
+                if isinstance(block, dict) and block.get("type") == "image":
+                    source = block["source"]
+                    self.images_sent += 1
+                    if source["type"] == "base64":
+                        self.image_bytes += len(base64.b64decode(source["data"]))
+        return self.images_sent - images_before
+
+    @property
+    def total_tokens(self) -> int:
+        """Input tokens, whether cached or not, and output tokens."""
+        return (
+            self.input_tokens
+            + self.cache_creation_input_tokens
+            + self.cache_read_input_tokens
+            + self.output_tokens
+        )
+
+    def providers_summary(self) -> str:
+        """Which provider served which turns, as in "turns 1-4 on anthropic, turn 5 on bedrock"."""
+        ranges = []
+        for turn, provider in enumerate(self.providers, start=1):
+            if ranges and ranges[-1][2] == provider:
+                ranges[-1][1] = turn
+            else:
+                ranges.append([turn, turn, provider])
+        return ", ".join(
+            f"turn {first} on {provider}" if first == last else f"turns {first}-{last} on {provider}"
+            for first, last, provider in ranges
+        )
+
+    @property
+    def elapsed(self) -> float:
+        return (self.end or time.monotonic()) - self.start
+
+    def finish(self):
+        self.end = time.monotonic()
+
+    def __str__(self) -> str:
+        return (
+            f"{self.turns} model turns, {self.total_tokens:,} tokens "
+            f"({self.input_tokens:,} input, {self.cache_read_input_tokens:,} read from cache, "
+            f"{self.cache_creation_input_tokens:,} written to cache, {self.output_tokens:,} output), "
+            f"{self.images_sent} images sent ({self.image_bytes / 1e6:.1f}MB), "
+            f"{self.elapsed:.0f}s"
+        )
+
+
+@dataclass
+class RunBudget:
+    """Limits of a run, None for no limit. Checked between turns, so a run ends gracefully."""
+
+    max_turns: int | None = None
+    max_tokens: int | None = None
+    max_seconds: float | None = None
+
+    def exceeded(self, usage: RunUsage) -> str | None:
+        """The limit `usage` reached, if any, as in "turn limit of 50"."""
+        if self.max_turns is not None and usage.turns >= self.max_turns:
+            return f"turn limit of {self.max_turns}"
+        if self.max_tokens is not None and usage.total_tokens >= self.max_tokens:
+            return f"token limit of {self.max_tokens:,}"
+        if self.max_seconds is not None and usage.elapsed >= self.max_seconds:
+            return f"time limit of {self.max_seconds:g}s"
+        return None
@@ -0,0 +1,86 @@
+"""
+The workers that QA runs execute on. A worker owns a display and the bash sessions of the
+run on it, so one server process can serve many clients without their runs fighting over
+the screen. Runs beyond the number of workers wait in line for one to free up.
+"""
+
+import asyncio
+import contextlib
+import time
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, field
+
+from .metrics import QUEUE_WAIT_SECONDS, QUEUED_RUNS
+from .tools import BashTool, ToolCollection
+from .tools.base import ToolError
+from .tools.computer import GUIBackend
+
+
+@dataclass
+class Worker:
+    id: int
+    gui: GUIBackend | None  # None to drive the real screen
+    tool_collection: ToolCollection | None = None  # the tools of the run on this worker
+    queue_seconds: float = 0.0  # how long the run on this worker waited for it
+
+    def attach(self, tool_collection: ToolCollection):
+        """Make the tools of a run this worker's, so they are cleaned up when the run ends."""
+        self.tool_collection = tool_collection
+
+    def release(self):
+        """Stop the bash sessions of the last run, so nothing of it carries over to the next one."""
+        if self.tool_collection is not None:
+            for tool in self.tool_collection.tools:
+                if isinstance(tool, BashTool):
+                    tool.stop()
+        self.tool_collection = None
+
+
+@dataclass
+class WorkerPool:
+    """
+    A fixed set of workers, handed out to runs in the order they asked for one.
+
+    `max_queued` runs may wait for a worker at once, further runs are turned away with a
+    ToolError instead of waiting for an unbounded time. None lets any number wait.
+    """
+
+    size: int = 1
+    make_gui: Callable[[], GUIBackend | None] = lambda: None
+    max_queued: int | None = None
+    workers: list[Worker] = field(init=False)
+    queued: int = field(init=False, default=0)
+
+    def __post_init__(self):
+        self.workers = [Worker(id=index, gui=self.make_gui()) for index in range(self.size)]
+        self._idle: asyncio.Queue[Worker] = asyncio.Queue()
+        for worker in self.workers:
+            self._idle.put_nowait(worker)
+
+    @property
+    def busy(self) -> int:
+        return self.size - self._idle.qsize()
+
+    @contextlib.asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Worker]:
+        """Wait for a free worker and hold it for the enclosed run."""
+        if self._idle.empty() and self.max_queued is not None and self.queued >= self.max_queued:
+            raise ToolError(
+                f"The QA server is busy ({self.busy} running, {self.queued} waiting), "
+                "try again later."
+            )
+        start = time.perf_counter()
+        self.queued += 1
+        QUEUED_RUNS.inc()
+        try:
+            worker = await self._idle.get()
+        finally:
+            self.queued -= 1
+            QUEUED_RUNS.dec()
+        worker.queue_seconds = time.perf_counter() - start
+        QUEUE_WAIT_SECONDS.observe(worker.queue_seconds)
+        try:
+            yield worker
+        finally:
+            worker.release()
+            self._idle.put_nowait(worker)
@@ -0,0 +1,24 @@
+"""Fixtures running the tools and the sampling loop against the offline simulator, for the tests and the benchmarks."""
+
+import pytest
+
+from computer_use_qa_mcp.simulator import MessagesAPIStub, VirtualDisplay
+from computer_use_qa_mcp.tools import ComputerTool
+
+
+@pytest.fixture
+def display():
+    return VirtualDisplay()
+
+
+@pytest.fixture
+def computer(display):
+    return ComputerTool(gui=display)
+
+
+@pytest.fixture
+def api_stub(monkeypatch):
+    with MessagesAPIStub() as stub:
+        # sampling_loop creates its own client, which picks the url up from the environment
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", stub.base_url)
+        yield stub
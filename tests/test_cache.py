@@ -0,0 +1,182 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from computer_use_qa_mcp import server
+from computer_use_qa_mcp.cache import CachedReport, KeyLocks, ResultCache, cache_key
+from computer_use_qa_mcp.simulator import scripted_turns
+
+SETTINGS = {"model": "simulated-model", "tool_version": "computer_use_20241022", "budget": {"max_turns": 100}}
+
+
+def entry(report: str = "Report: all steps worked.", **fields) -> CachedReport:
+    return CachedReport(report, "build-1", SETTINGS, **fields)
+
+
+def test_key_of_the_same_run_is_stable():
+    assert cache_key("1. Open the app", "build-1", SETTINGS) == cache_key(
+        "1. Open the app", "build-1", dict(reversed(SETTINGS.items()))
+    )
+
+
+@pytest.mark.parametrize(
+    ("instructions", "build", "settings"),
+    [
+        ("1. Open the app.", "build-1", SETTINGS),
+        ("1. Open the app", "build-2", SETTINGS),
+        ("1. Open the app", "build-1", {**SETTINGS, "model": "other-model"}),
+        ("1. Open the app", "build-1", {**SETTINGS, "tool_version": "computer_use_20250124"}),
+        ("1. Open the app", "build-1", {**SETTINGS, "budget": {"max_turns": 10}}),
+        ("1. Open the app", "build-1", {**SETTINGS, "fast_model": "fast-model"}),
+    ],
+)
+def test_key_depends_on_instructions_build_and_settings(instructions, build, settings):
+    assert cache_key(instructions, build, settings) != cache_key("1. Open the app", "build-1", SETTINGS)
+
+
+def test_get_returns_what_was_put(tmp_path):
+    cache = ResultCache(tmp_path)
+    cache.put("key", entry(run_details=["Usage: 3 turns"]))
+    cached = cache.get("key")
+    assert cached is not None
+    assert (cached.report, cached.build_fingerprint, cached.settings) == (
+        "Report: all steps worked.",
+        "build-1",
+        SETTINGS,
+    )
+    assert cached.cache_details("key")[1] == "Cached run: Usage: 3 turns"
+    assert cache.get("other") is None
+
+
+def test_entries_expire(tmp_path):
+    cache = ResultCache(tmp_path, ttl_seconds=60)
+    cache.put("fresh", entry())
+    cache.put("stale", entry(created_at=time.time() - 61))
+    assert cache.get("fresh") is not None
+    assert cache.get("stale") is None
+    assert not cache.path("stale").exists()
+
+
+def test_unreadable_and_old_format_entries_are_misses(tmp_path):
+    cache = ResultCache(tmp_path)
+    cache.put("key", entry())
+    cache.path("key").write_text("{not json")
+    assert cache.get("key") is None
+    cache.path("key").write_text('{"version": 0, "report": "old"}')
+    assert cache.get("key") is None
+
+
+def test_evicts_the_least_recently_used(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=10**6)
+    now = time.time()
+    for age, key in enumerate(["c", "b", "a"]):
+        cache.put(key, entry(created_at=now))  # all of the same size
+        os.utime(cache.path(key), (now - 10 * (age + 1), now - 10 * (age + 1)))
+    cache.get("a")  # used last, though written first
+    cache.max_bytes = 2 * cache.path("a").stat().st_size
+    cache.evict()
+    assert [key for key in "abc" if cache.path(key).exists()] == ["a", "c"]
+
+
+def test_evicts_unused_entries_as_expired(tmp_path):
+    cache = ResultCache(tmp_path, ttl_seconds=60)
+    cache.put("key", entry())
+    old = time.time() - 61
+    os.utime(cache.path("key"), (old, old))
+    cache.evict()
+    assert not cache.path("key").exists()
+
+
+def test_key_locks_take_turns():
+    locks = KeyLocks()
+    order = []
+
+    async def hold(key: str, name: str):
+        async with locks.hold(key):
+            order.append(f"{name} in")
+            await asyncio.sleep(0.05)
+            order.append(f"{name} out")
+
+    async def run():
+        await asyncio.gather(hold("a", "first"), hold("a", "second"), hold("b", "other"))
+
+    asyncio.run(run())
+    assert order.index("first out") < order.index("second in")
+    assert order.index("other in") < order.index("first out")
+    assert locks.held == 0
+
+
+@pytest.fixture
+def cached_server(tmp_path, monkeypatch, api_stub):
+    """The server configured with a report cache, running on simulated displays."""
+    monkeypatch.setenv("QA_AGENT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("QA_AGENT_SIMULATED_DISPLAY", "1")
+    monkeypatch.setenv("QA_AGENT_WORKERS", "2")
+    monkeypatch.setenv("QA_AGENT_MODEL", "simulated-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "simulated")
+    monkeypatch.setattr(server, "_worker_pool", None)
+    monkeypatch.chdir(tmp_path)  # screenshots are saved to the working directory
+    api_stub.load(scripted_turns(2))
+    instructions = tmp_path / "qa.md"
+    instructions.write_text("1. Open the app\n2. Check the title")
+    return str(instructions)
+
+
+def test_identical_runs_run_once(cached_server, api_stub):
+    async def run():
+        return await asyncio.gather(
+            *(server.execute_run(cached_server, build_fingerprint="build-1") for _ in range(2))
+        )
+
+    first, second = asyncio.run(run())
+    assert api_stub.requests == 3  # two tool calls and the report, of one run
+    assert "Cached:" not in first
+    assert "Cached:" in second
+    assert first.split("\n")[0] == second.split("\n")[0]
+
+    asyncio.run(server.execute_run(cached_server, build_fingerprint="build-2"))
+    assert api_stub.requests == 6
+
+
+
+@pytest.mark.parametrize(
+    ("name", "value"),
+    [
+        ("QA_AGENT_AUTO_SCREENSHOT", "1"),
+        ("QA_AGENT_AUTO_SCREENSHOT_ACTIONS", "left_click"),
+        ("QA_AGENT_MAX_IMAGE_TOKENS", "800"),
+        ("QA_AGENT_WAIT_FOR_TOOL", "1"),
+        ("QA_AGENT_FAST_MODEL", "simulated-fast-model"),
+    ],
+)
+def test_changed_settings_miss_the_cache(cached_server, api_stub, monkeypatch, name, value):
+    asyncio.run(server.execute_run(cached_server, build_fingerprint="build-1"))
+    assert api_stub.requests == 3
+
+    monkeypatch.setenv(name, value)
+    report = asyncio.run(server.execute_run(cached_server, build_fingerprint="build-1"))
+    assert api_stub.requests > 3  # the agent ran again
+    assert "Cached:" not in report
+
+
+@pytest.mark.parametrize(
+    ("name", "value"),
+    [("QA_AGENT_CAPTURE_MODE", "active_window"), ("QA_AGENT_PROVIDERS", "anthropic,bedrock")],
+)
+def test_settings_of_the_capture_and_the_providers_are_in_the_key(monkeypatch, name, value):
+    def key() -> str:
+        monkeypatch.setattr(server, "_provider_pool", None)
+        settings = server.run_settings(
+            "simulated-model",
+            "computer_use_20250124",
+            server.make_run_budget(),
+            None,
+            server.get_provider_pool(),
+        )
+        return cache_key("1. Open the app", "build-1", settings)
+
+    unchanged = key()
+    monkeypatch.setenv(name, value)
+    assert key() != unchanged
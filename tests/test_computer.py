@@ -0,0 +1,131 @@
+import asyncio
+import base64
+import io
+
+import pytest
+from PIL import Image, ImageDraw
+
+from computer_use_qa_mcp.simulator import VirtualDisplay
+from computer_use_qa_mcp.tools import ComputerTool, ComputerTool20251124
+from computer_use_qa_mcp.tools import computer as computer_module
+from computer_use_qa_mcp.tools.base import ToolError
+
+
+def write_error(display: VirtualDisplay):
+    # like the app showing a validation error while the model is thinking
+    with display._lock:
+        ImageDraw.Draw(display._framebuffer).text((20, 400), "Error: invalid", fill="red")
+
+
+async def prefetched_screenshot(computer: ComputerTool, change=None):
+    computer.prefetch()
+    await asyncio.sleep(0.3)  # the model thinking
+    if change:
+        change()
+    return await computer(action="screenshot")
+
+
+def test_speculative_frame_served_when_screen_unchanged(display):
+    computer = ComputerTool(gui=display, speculative_capture=True)
+
+    result = asyncio.run(prefetched_screenshot(computer))
+
+    assert result.base64_image
+    assert computer.speculative_stats.hits == 1
+
+
+def test_speculative_frame_not_served_after_small_change(display):
+    computer = ComputerTool(gui=display, speculative_capture=True)
+    expected = asyncio.run(computer.encode(display.screenshot()))
+
+    result = asyncio.run(prefetched_screenshot(computer, lambda: write_error(display)))
+
+    assert computer.speculative_stats.hits == 0
+    assert computer.speculative_stats.misses == 1
+    assert result.base64_image != expected
+
+
+WINDOW = (100, 200, 600, 300)  # left, top, width, height of the focused window
+
+
+@pytest.fixture
+def focused_window(monkeypatch):
+    box = {"value": WINDOW}
+    monkeypatch.setattr(computer_module, "get_active_window_box", lambda width, height: box["value"])
+    return box
+
+
+def decode(base64_image: str) -> Image.Image:
+    return Image.open(io.BytesIO(base64.b64decode(base64_image)))
+
+
+def test_active_window_keeps_full_screen_size(display, focused_window):
+    computer = ComputerTool(gui=display, capture_mode="active_window")
+    assert (computer.target_width, computer.target_height) == (1280, 800)
+
+    image = decode(asyncio.run(computer(action="screenshot")).base64_image)
+
+    # the window scaled by 1280 / 600 on both axes, padded below
+    assert image.size == (1280, 800)
+    assert image.getpixel((10, 700)) == (0, 0, 0)
+    assert image.getpixel((10, 600)) != (0, 0, 0)
+
+
+def test_active_window_maps_clicks_uniformly(display, focused_window):
+    computer = ComputerTool(gui=display, capture_mode="active_window")
+    asyncio.run(computer(action="screenshot"))
+
+    asyncio.run(computer(action="mouse_move", coordinate=[640, 320]))
+
+    assert display.position() == (400, 350)
+
+
+def test_window_lookup_does_not_block_init(display, monkeypatch):
+    def fail(width, height):
+        raise AssertionError("looked up the window in __init__")
+
+    monkeypatch.setattr(computer_module, "get_active_window_box", fail)
+    ComputerTool(gui=display, capture_mode="active_window")
+
+
+def test_prefetch_does_not_move_click_mapping(display, focused_window):
+    computer = ComputerTool(gui=display, capture_mode="active_window", speculative_capture=True)
+
+    async def run():
+        computer.prefetch()
+        await asyncio.sleep(0.3)
+        # the model still looks at the full screen screenshot it was sent
+        mapping_while_thinking = computer.capture_box
+        await computer(action="screenshot")
+        return mapping_while_thinking
+
+    assert asyncio.run(run()) == (0, 0, 1440, 900)
+    assert computer.speculative_stats.hits == 1
+    assert computer.capture_box == WINDOW
+
+
+def test_click_in_the_padding_stays_in_the_window(display, focused_window):
+    computer = ComputerTool(gui=display, capture_mode="active_window")
+    asyncio.run(computer(action="screenshot"))
+
+    # below the window, which ends at y 640 in the screenshot, and past the right of the screen
+    asyncio.run(computer(action="mouse_move", coordinate=[10, 700]))
+    assert display.position() == (105, 499)
+    assert computer.scale_coordinates(computer_module.ScalingSource.API, 1280, 799) == (699, 499)
+
+
+def test_active_window_savings_are_estimated_from_the_window(display, focused_window):
+    computer = ComputerTool(gui=display, capture_mode="active_window")
+    asyncio.run(computer(action="screenshot"))
+
+    stats = computer.active_window_stats
+    # the window is 600x300 of the 1440x900 screen
+    assert stats.full_screen_bytes == round(stats.sent_bytes * 1440 * 900 / (600 * 300))
+
+
+def test_zoom_into_the_padding_is_refused(display, focused_window):
+    computer = ComputerTool20251124(gui=display, capture_mode="active_window")
+    asyncio.run(computer(action="screenshot"))
+
+    with pytest.raises(ToolError, match="padding outside the window"):
+        asyncio.run(computer(action="zoom", region=[0, 700, 100, 800]))
@@ -0,0 +1,161 @@
+import asyncio
+import os
+import stat
+
+import pytest
+
+from computer_use_qa_mcp.tools import EditTool, edit_engine
+from computer_use_qa_mcp.tools.base import ToolError
+from computer_use_qa_mcp.tools.edit_engine import (
+    atomic_write,
+    find_occurrences,
+    line_numbers,
+    line_offset,
+    snippet_bounds,
+)
+
+CONTENT = "one\ntwo\nthree\nfour\nfive\n"
+
+
+@pytest.fixture
+def edit_tool():
+    return EditTool()
+
+
+def edit(tool: EditTool, **kwargs):
+    return asyncio.run(tool(**kwargs))
+
+
+def snippet(content: str, start: int, end: int, context_lines: int) -> str:
+    snippet_start, snippet_end = snippet_bounds(content, start, end, context_lines)
+    return content[snippet_start:snippet_end]
+
+
+def test_line_offset():
+    assert [line_offset(CONTENT, line) for line in range(6)] == [0, 4, 8, 14, 19, 24]
+
+
+def test_line_offset_across_chunks(monkeypatch):
+    monkeypatch.setattr(edit_engine, "LINE_SCAN_CHUNK", 5)
+    assert [line_offset(CONTENT, line) for line in range(6)] == [0, 4, 8, 14, 19, 24]
+
+
+def test_snippet_bounds():
+    start = CONTENT.index("three")
+    assert snippet(CONTENT, start, start + 5, 0) == "three"
+    assert snippet(CONTENT, start, start + 5, 1) == "two\nthree\nfour"
+    # the context stops at the start and the end of the content
+    assert snippet(CONTENT, 0, 3, 4) == CONTENT[:-1]
+    assert snippet_bounds(CONTENT, start, start + 5, 10) == (0, len(CONTENT))
+
+
+def test_line_numbers_of_occurrences():
+    content = "x = 1\ny\nx = 1\nx = 1 x = 1\n"
+    occurrences = find_occurrences(content, "x = 1")
+    assert line_numbers(content, occurrences) == [1, 3, 4, 4]
+
+
+def test_insert_at_the_start(edit_tool, tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text(CONTENT)
+    result = edit(edit_tool, command="insert", path=str(path), insert_line=0, new_str="zero")
+    assert path.read_text() == "zero\n" + CONTENT
+    assert "     1\tzero\n     2\tone\n" in result.output
+
+
+def test_insert_after_the_last_line(edit_tool, tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("one\ntwo")
+    result = edit(edit_tool, command="insert", path=str(path), insert_line=2, new_str="three")
+    assert path.read_text() == "one\ntwo\nthree"
+    assert "     1\tone\n     2\ttwo\n     3\tthree\n" in result.output
+
+
+def test_insert_after_a_middle_line(edit_tool, tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text(CONTENT)
+    edit(edit_tool, command="insert", path=str(path), insert_line=2, new_str="two and a half")
+    assert path.read_text() == "one\ntwo\ntwo and a half\nthree\nfour\nfive\n"
+
+
+def test_insert_out_of_range(edit_tool, tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("one\ntwo")
+    with pytest.raises(ToolError, match=r"within the range of lines of the file: \[0, 2\]"):
+        edit(edit_tool, command="insert", path=str(path), insert_line=3, new_str="four")
+
+
+def test_str_replace_reports_every_line_of_a_repeated_string(edit_tool, tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("x = 1\ny\nx = 1\nx = 1 x = 1\n")
+    with pytest.raises(ToolError, match=r"in lines \[1, 3, 4\]"):
+        edit(edit_tool, command="str_replace", path=str(path), old_str="x = 1", new_str="x = 2")
+    assert path.read_text() == "x = 1\ny\nx = 1\nx = 1 x = 1\n"
+
+
+def test_str_replace_shows_the_edited_lines(edit_tool, tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("\n".join(f"line {n}" for n in range(1, 21)) + "\n")
+    result = edit(edit_tool, command="str_replace", path=str(path), old_str="line 10\n", new_str="ten\n")
+    assert "line 10" not in path.read_text()
+    assert "    10\tten\n" in result.output
+    assert "     6\tline 6\n" in result.output
+    # four lines around the lines of new_str, the line after its newline included
+    assert "\n     5\t" not in result.output and "    16\t" not in result.output
+
+
+def test_refuses_to_edit_a_file_changed_on_disk(edit_tool, tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text(CONTENT)
+    edit(edit_tool, command="view", path=str(path))
+    path.write_text(CONTENT + "six\n")  # changed by something else, such as the app under test
+
+    with pytest.raises(ToolError, match="was modified on disk since it was last viewed"):
+        edit(edit_tool, command="str_replace", path=str(path), old_str="two", new_str="2")
+    with pytest.raises(ToolError, match="was modified on disk"):
+        edit(edit_tool, command="insert", path=str(path), insert_line=0, new_str="zero")
+    assert path.read_text() == CONTENT + "six\n"
+
+    # viewing the file again allows editing it
+    edit(edit_tool, command="view", path=str(path))
+    edit(edit_tool, command="str_replace", path=str(path), old_str="two", new_str="2")
+    assert path.read_text() == "one\n2\nthree\nfour\nfive\nsix\n"
+
+
+def test_edits_follow_each_other(edit_tool, tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text(CONTENT)
+    edit(edit_tool, command="str_replace", path=str(path), old_str="two", new_str="2")
+    edit(edit_tool, command="str_replace", path=str(path), old_str="three", new_str="3")
+    edit(edit_tool, command="undo_edit", path=str(path))
+    assert path.read_text() == "one\n2\nthree\nfour\nfive\n"
+
+
+def test_atomic_write_keeps_the_mode(tmp_path):
+    path = tmp_path / "script.sh"
+    path.write_text("echo one\n")
+    path.chmod(0o750)
+    atomic_write(path, "echo two\n")
+    assert path.read_text() == "echo two\n"
+    assert stat.S_IMODE(path.stat().st_mode) == 0o750
+
+
+def test_atomic_write_leaves_no_temporary_file_when_it_fails(tmp_path, monkeypatch):
+    path = tmp_path / "file.txt"
+    path.write_text(CONTENT)
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError, match="disk full"):
+        atomic_write(path, "new content")
+    assert path.read_text() == CONTENT
+    assert os.listdir(tmp_path) == ["file.txt"]
+
+
+def test_atomic_write_creates_a_file(tmp_path):
+    path = tmp_path / "new.txt"
+    atomic_write(path, "content")
+    assert path.read_text() == "content"
+    assert os.listdir(tmp_path) == ["new.txt"]
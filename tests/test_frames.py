@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from PIL import ImageDraw
+
+from computer_use_qa_mcp.tools import ComputerTool
+from computer_use_qa_mcp.tools.frames import make_probe, probes_match
+
+
+def draw(frame, shape, *args, **kwargs):
+    frame = frame.copy()
+    getattr(ImageDraw.Draw(frame), shape)(*args, **kwargs)
+    return frame
+
+
+@pytest.fixture
+def frame(display):
+    return display.screenshot()
+
+
+def test_same_frame_matches(frame):
+    assert probes_match(make_probe(frame), make_probe(frame.copy()))
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        ("text", (20, 400), "Error: invalid", {"fill": "red"}),
+        ("text", (300, 200), "a", {"fill": "black"}),
+        ("rectangle", (600, 500, 613, 513), {"outline": "black"}),
+        ("line", (602, 507, 606, 511, 612, 502), {"fill": "black", "width": 2}),
+    ],
+    ids=["error line", "one character", "checkbox", "check mark"],
+)
+def test_small_change_does_not_match(frame, change):
+    shape, *args, kwargs = change
+    assert not probes_match(make_probe(frame), make_probe(draw(frame, shape, *args, **kwargs)))
+
+
+def test_different_sizes_do_not_match(frame):
+    assert not probes_match(make_probe(frame), make_probe(frame.crop((0, 0, 800, 600))))
+
+
+@pytest.mark.parametrize(
+    "tool_input",
+    [
+        {"action": "type", "text": "hello@example.com"},
+        {"action": "left_click"},
+    ],
+    ids=lambda tool_input: tool_input["action"],
+)
+def test_input_on_simulator_counts_as_change(display, tool_input):
+    display.moveTo(400, 300)
+    computer = ComputerTool(gui=display, auto_screenshot=True, auto_screenshot_only_if_changed=True)
+
+    result = asyncio.run(computer(**tool_input))
+
+    assert result.base64_image
+    assert "did not change" not in (result.output or "")
+
+
+def test_unchanged_screen_skips_screenshot(display):
+    computer = ComputerTool(gui=display, auto_screenshot=True, auto_screenshot_only_if_changed=True)
+
+    result = asyncio.run(computer(action="key", text="shift"))
+
+    assert result.base64_image is None
+    assert "did not change" in result.output
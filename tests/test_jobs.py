@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+from mcp.server.fastmcp.exceptions import ToolError
+
+from computer_use_qa_mcp import server
+from computer_use_qa_mcp.jobs import JobRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = JobRegistry()
+    monkeypatch.setattr(server, "get_job_registry", lambda: registry)
+    return registry
+
+
+async def finished(registry: JobRegistry, run) -> str:
+    job = registry.start("qa.md", run)
+    await asyncio.wait({job.task})
+    return job.id
+
+
+def test_missing_instructions_are_a_tool_error():
+    with pytest.raises(ToolError, match="does not exist"):
+        asyncio.run(server.start_quality_assurance("/no/such/instructions.md"))
+
+
+def test_unknown_tool_version_is_a_tool_error(tmp_path, monkeypatch):
+    instructions = tmp_path / "qa.md"
+    instructions.write_text("Open the app.")
+    with pytest.raises(ToolError, match="Unknown tool version 'computer_use_2099'"):
+        asyncio.run(server.start_quality_assurance(str(instructions), "computer_use_2099"))  # type: ignore[arg-type]
+    monkeypatch.setenv("QA_AGENT_TOOL_VERSION", "computer-use-20250124")
+    with pytest.raises(ToolError, match="it should be one of computer_use_20241022, "):
+        asyncio.run(server.execute_run(str(instructions)))
+
+
+def test_unknown_job_is_a_tool_error(registry):
+    with pytest.raises(ToolError, match="There is no QA job"):
+        asyncio.run(server.get_quality_assurance_status("no-such-job"))
+
+
+def test_report_of_a_completed_job(registry):
+    async def run(job):
+        return "Report: all steps worked."
+
+    async def main():
+        return await server.get_quality_assurance_report(await finished(registry, run))
+
+    assert asyncio.run(main()) == "Report: all steps worked."
+
+
+def test_report_of_a_failed_job_is_a_tool_error(registry):
+    async def run(job):
+        raise RuntimeError("the display went away")
+
+    async def main():
+        return await server.get_quality_assurance_report(await finished(registry, run))
+
+    with pytest.raises(ToolError, match="failed: the display went away"):
+        asyncio.run(main())
+
+
+def test_report_of_a_cancelled_job_is_a_tool_error(registry):
+    async def run(job):
+        await asyncio.sleep(60)
+
+    async def main():
+        job = registry.start("qa.md", run)
+        await asyncio.sleep(0)
+        assert await server.cancel_quality_assurance(job.id) == f"The QA job {job.id} is cancelled"
+        return await server.get_quality_assurance_report(job.id)
+
+    with pytest.raises(ToolError, match="was cancelled"):
+        asyncio.run(main())
@@ -0,0 +1,172 @@
+import asyncio
+import itertools
+import os
+import time
+from collections import OrderedDict
+
+import pytest
+
+from computer_use_qa_mcp.tools import EditTool, edit, line_index
+from computer_use_qa_mcp.tools.base import ToolError
+from computer_use_qa_mcp.tools.line_index import LineIndex, get_line_index
+
+CONTENTS = {
+    "lf": "one\ntwo\nthree\n\nfive\nsix",
+    "lf, ending with a newline": "one\ntwo\nthree\n\nfive\nsix\n",
+    "crlf": "one\r\ntwo\r\nthree\r\n\r\nfive\r\nsix\r\n",
+    "cr": "one\rtwo\rthree\r\rfive\rsix",
+    "mixed": "one\r\ntwo\nthree\r\r\nfive\rsix\n",
+}
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    """Chunks of a few bytes, so line endings fall on and across chunk boundaries."""
+    monkeypatch.setattr(line_index, "CHUNK_SIZE", 4)
+    monkeypatch.setattr(line_index, "_index_cache", OrderedDict())
+
+
+def write(tmp_path, content: str):
+    path = tmp_path / "file.txt"
+    path.write_bytes(content.encode())
+    return path
+
+
+def make_index(path) -> LineIndex:
+    stat = os.stat(path)
+    return LineIndex(path, stat.st_mtime_ns, stat.st_size)
+
+
+@pytest.mark.parametrize("content", CONTENTS.values(), ids=CONTENTS.keys())
+def test_reads_the_lines_a_whole_read_gives(tmp_path, content):
+    path = write(tmp_path, content)
+    lines = path.read_text().split("\n")
+    index = make_index(path)
+    assert index.line_count == len(lines)
+    for init_line, final_line in itertools.combinations_with_replacement(range(1, len(lines) + 1), 2):
+        assert index.read_lines(init_line, final_line) == "\n".join(lines[init_line - 1 : final_line])
+    for init_line in range(1, len(lines) + 1):
+        assert index.read_lines(init_line) == "\n".join(lines[init_line - 1 :])
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5])
+def test_crlf_split_between_chunks(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(line_index, "CHUNK_SIZE", chunk_size)
+    path = write(tmp_path, "a\r\nbc\r\n\r\nd")
+    index = make_index(path)
+    assert index.line_count == 4
+    assert [index.read_lines(line, line) for line in range(1, 5)] == ["a", "bc", "", "d"]
+
+
+def test_read_is_cut_at_max_bytes(tmp_path):
+    path = write(tmp_path, "one\r\ntwo\r\nthree\r\n")
+    assert make_index(path).read_lines(1, 3, max_bytes=6) == "one\nt"
+
+
+def test_empty_file(tmp_path):
+    index = make_index(write(tmp_path, ""))
+    assert index.line_count == 1
+    assert index.read_lines(1) == ""
+
+
+def test_index_is_rebuilt_when_the_file_changes(tmp_path):
+    path = write(tmp_path, "one\ntwo\n")
+    index = get_line_index(path)
+    assert get_line_index(path) is index
+
+    # same size, another modification time
+    path.write_bytes(b"one\nTWO\n")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, index.mtime_ns + 1_000_000))
+    changed = get_line_index(path)
+    assert changed is not index
+    assert changed.read_lines(2, 2) == "TWO"
+
+    # another size, with the same modification time
+    path.write_bytes(b"one\ntwo\nthree\n")
+    os.utime(path, ns=(stat.st_atime_ns, changed.mtime_ns))
+    grown = get_line_index(path)
+    assert grown is not changed
+    assert grown.line_count == 4
+
+
+def test_cache_keeps_the_most_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(line_index, "INDEX_CACHE_SIZE", 2)
+    paths = []
+    for name in "abc":
+        paths.append(tmp_path / name)
+        paths[-1].write_text(name)
+    first = get_line_index(paths[0])
+    get_line_index(paths[1])
+    assert get_line_index(paths[0]) is first
+    get_line_index(paths[2])
+    assert list(line_index._index_cache) == [paths[0], paths[2]]
+
+
+@pytest.fixture
+def large_file_view(monkeypatch):
+    """Every file is viewed through its line index."""
+    monkeypatch.setattr(edit, "LARGE_FILE_THRESHOLD", 0)
+
+
+def view(path, view_range=None) -> str:
+    return asyncio.run(EditTool()(command="view", path=str(path), view_range=view_range)).output
+
+
+@pytest.mark.parametrize("content", CONTENTS.values(), ids=CONTENTS.keys())
+@pytest.mark.parametrize("view_range", [None, [1, 1], [2, 4], [3, -1], "last", "from last", "all"])
+def test_large_file_view_matches_the_small_file_view(tmp_path, monkeypatch, content, view_range):
+    path = write(tmp_path, content)
+    line_count = len(path.read_text().split("\n"))
+    if isinstance(view_range, str):
+        view_range = {
+            "last": [line_count, line_count],
+            "from last": [line_count, -1],
+            "all": [1, line_count],
+        }[view_range]
+    small = view(path, view_range)
+    monkeypatch.setattr(edit, "LARGE_FILE_THRESHOLD", 0)
+    large = view(path, view_range)
+    assert large == small.replace(f"on {path}:", f"on {path} ({line_count} lines):")
+
+
+@pytest.mark.parametrize(
+    ("view_range", "message"),
+    [
+        ([0, 2], "first element `0` should be within the range of lines of the file: \\[1, 3\\]"),
+        ([4, 4], "first element `4`"),
+        ([1, 4], "second element `4` should be smaller than the number of lines"),
+        ([3, 2], "second element `2` should be larger or equal than its first `3`"),
+    ],
+)
+def test_large_file_view_range_errors(tmp_path, large_file_view, view_range, message):
+    path = write(tmp_path, "one\r\ntwo\r\n")
+    with pytest.raises(ToolError, match=message):
+        view(path, view_range)
+
+
+def test_large_file_view_does_not_block_the_event_loop(tmp_path, large_file_view, monkeypatch):
+    path = write(tmp_path, "one\ntwo\n")
+    events = []
+    build = LineIndex.__init__
+
+    def slow_build(self, *args):
+        time.sleep(0.2)
+        build(self, *args)
+
+    monkeypatch.setattr(LineIndex, "__init__", slow_build)
+
+    async def view_file():
+        await EditTool()(command="view", path=str(path))
+        events.append("viewed")
+
+    async def tick():
+        for _ in range(3):
+            await asyncio.sleep(0.02)
+        events.append("ticked")
+
+    async def run():
+        await asyncio.gather(view_file(), tick())
+
+    asyncio.run(run())
+    assert events == ["ticked", "viewed"]
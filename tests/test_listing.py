@@ -0,0 +1,115 @@
+import asyncio
+import os
+import shutil
+import subprocess
+from collections import OrderedDict
+
+import pytest
+
+from computer_use_qa_mcp.tools import EditTool, listing
+from computer_use_qa_mcp.tools.listing import MAX_ENTRIES, list_directory
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(listing, "_listing_cache", OrderedDict())
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """A project with hidden items, nested directories and an ignored one."""
+    root = tmp_path / "project"
+    for path in [
+        "README.md",
+        ".env",
+        ".git/config",
+        "src/app.py",
+        "src/.cache/data",
+        "src/pkg/module.py",
+        "src/pkg/deeper/too_deep.py",
+        "node_modules/left-pad/index.js",
+        "docs/empty/",
+    ]:
+        if path.endswith("/"):
+            (root / path).mkdir(parents=True)
+        else:
+            (root / path).parent.mkdir(parents=True, exist_ok=True)
+            (root / path).write_text(path)
+    return root
+
+
+@pytest.mark.skipif(shutil.which("find") is None, reason="needs find")
+def test_lists_what_find_does(tree):
+    found = subprocess.run(
+        ["find", str(tree), "-maxdepth", "2", "-not", "-path", "*/.*"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.splitlines()
+    # find lists the contents of ignored directories, the listing only the directories
+    found = [path for path in found if "/node_modules/" not in path]
+    assert list_directory(tree).entries == found
+
+
+def test_lists_two_levels_without_hidden_items(tree):
+    entries = {os.path.relpath(entry, tree) for entry in list_directory(tree).entries}
+    assert entries == {".", "README.md", "src", "src/app.py", "src/pkg", "docs", "docs/empty", "node_modules"}
+
+
+def test_ignored_directories_are_listed_but_not_entered(tree):
+    entries = list_directory(tree).entries
+    assert str(tree / "node_modules") in entries
+    assert not any("left-pad" in entry for entry in entries)
+    # with no patterns to ignore, it is entered like any other directory
+    assert str(tree / "node_modules/left-pad") in list_directory(tree, ignore=()).entries
+
+
+def test_truncates_at_max_entries(tmp_path):
+    for number in range(10):
+        (tmp_path / f"file{number}.txt").write_text("")
+    result = list_directory(tmp_path, max_entries=5)
+    assert result.truncated
+    assert result.entries[0] == str(tmp_path)
+    assert len(result.entries) - 1 == 5
+    assert not list_directory(tmp_path, max_entries=10).truncated
+
+
+def test_view_notes_the_truncation(tmp_path):
+    for number in range(MAX_ENTRIES + 5):
+        (tmp_path / f"file{number}.txt").write_text("")
+    output = asyncio.run(EditTool()(command="view", path=str(tmp_path))).output
+    assert output.count(".txt") == MAX_ENTRIES
+    assert f"<NOTE>Only the first {MAX_ENTRIES} entries are shown." in output
+
+
+def test_view_lists_a_directory(tree):
+    output = asyncio.run(EditTool()(command="view", path=str(tree))).output
+    assert output.startswith(
+        f"Here's the files and directories up to 2 levels deep in {tree}, excluding hidden items:\n"
+    )
+    assert f"{tree / 'src/app.py'}\n" in output
+
+
+def test_unchanged_listing_is_reused(tree):
+    assert list_directory(tree) is list_directory(tree)
+
+
+def test_listing_is_redone_when_a_nested_directory_changes(tree):
+    first = list_directory(tree)
+    (tree / "src/new.py").write_text("")
+    # a new modification time, even on file systems with coarse timestamps
+    stat = os.stat(tree / "src")
+    os.utime(tree / "src", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    second = list_directory(tree)
+    assert second is not first
+    assert str(tree / "src/new.py") in second.entries
+    assert list_directory(tree) is second
+
+
+def test_listing_is_redone_when_a_nested_directory_is_removed(tree):
+    first = list_directory(tree)
+    shutil.rmtree(tree / "docs/empty")
+    os.rmdir(tree / "docs")
+    second = list_directory(tree)
+    assert second is not first
+    assert str(tree / "docs") not in second.entries
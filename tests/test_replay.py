@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from PIL import ImageDraw
+
+from computer_use_qa_mcp import loop
+from computer_use_qa_mcp.loop import replay_loop
+from computer_use_qa_mcp.recording import RecordedTurn
+from computer_use_qa_mcp.tools import ToolCollection
+
+
+@pytest.fixture(autouse=True)
+def quick_settle(monkeypatch):
+    monkeypatch.setattr(loop, "REPLAY_SETTLE_TIMEOUT", 0.5)
+
+
+def recorded_turn(fingerprint: bytes) -> RecordedTurn:
+    return RecordedTurn(
+        fingerprint=fingerprint.hex(),
+        content=[
+            {
+                "type": "tool_use",
+                "id": "toolu_1",
+                "name": "computer",
+                "input": {"action": "cursor_position"},
+            }
+        ],
+        results=[{"output": "X=0,Y=0", "error": None, "has_image": False}],
+    )
+
+
+async def replay(computer, turns):
+    messages = [{"role": "user", "content": "Run the QA steps."}]
+    replayed = await replay_loop(
+        turns=turns,
+        messages=messages,
+        tool_collection=ToolCollection(computer),
+        output_callback=lambda block: None,
+        tool_output_callback=lambda result, tool_use_id: None,
+    )
+    return replayed, messages
+
+
+def test_replays_on_the_recorded_screen(computer):
+    turn = recorded_turn(asyncio.run(computer.fingerprint()))
+
+    replayed, messages = asyncio.run(replay(computer, [turn]))
+
+    assert len(replayed) == 1
+    assert len(messages) == 3
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda draw: draw.text((20, 400), "Error: invalid", fill="red"),
+        lambda draw: draw.rectangle((600, 500, 613, 513), outline="black"),
+    ],
+    ids=["validation error", "checkbox"],
+)
+def test_stops_where_a_small_region_diverges(computer, display, change):
+    turn = recorded_turn(asyncio.run(computer.fingerprint()))
+    with display._lock:
+        change(ImageDraw.Draw(display._framebuffer))
+
+    replayed, messages = asyncio.run(replay(computer, [turn]))
+
+    assert replayed == []
+    assert len(messages) == 1
+
+
+def test_ignores_the_menu_bar(computer, display):
+    turn = recorded_turn(asyncio.run(computer.fingerprint()))
+    with display._lock:
+        ImageDraw.Draw(display._framebuffer).text((1300, 4), "10:42", fill="black")
+
+    replayed, _ = asyncio.run(replay(computer, [turn]))
+
+    assert len(replayed) == 1
@@ -0,0 +1,171 @@
+import asyncio
+import time
+
+import anthropic
+import httpx
+import pytest
+from anthropic import AsyncAnthropic
+
+from computer_use_qa_mcp.retry import (
+    RetryPolicy,
+    backoff_delay,
+    call_with_retry,
+    hedged,
+    retry_after,
+)
+from computer_use_qa_mcp.simulator import MessagesAPIStub, scripted_turns
+
+NO_BACKOFF = RetryPolicy(base_delay=0.0)
+
+
+@pytest.fixture
+def stub():
+    with MessagesAPIStub(scripted_turns(1), retry_after=0.3, slow_latency=2.0) as stub:
+        yield stub
+
+
+def call(stub: MessagesAPIStub, policy: RetryPolicy):
+    """Send a model call to the stub with `call_with_retry`, returns the response and the seconds it took."""
+
+    async def run():
+        async with AsyncAnthropic(api_key="simulated", base_url=stub.base_url, max_retries=0) as client:
+            start = time.perf_counter()
+            response = await call_with_retry(
+                lambda: client.messages.create(
+                    model="simulated-model",
+                    max_tokens=64,
+                    messages=[{"role": "user", "content": "Run the QA steps."}],
+                ),
+                policy,
+            )
+            return response, time.perf_counter() - start
+
+    return asyncio.run(run())
+
+
+def requests_sent(stub: MessagesAPIStub) -> int:
+    failed = sum(n for fault, n in stub.faults_injected.items() if fault != "slow")
+    return stub.requests + failed
+
+
+def status_error(status: int, headers: dict[str, str]) -> anthropic.APIStatusError:
+    response = httpx.Response(
+        status, headers=headers, request=httpx.Request("POST", "http://stub/v1/messages")
+    )
+    return anthropic.APIStatusError("failed", response=response, body=None)
+
+
+def test_retries_transient_errors(stub):
+    stub.fail_next("overloaded", "server_error", "reset")
+
+    response, _ = call(stub, NO_BACKOFF)
+
+    assert response.content
+    assert requests_sent(stub) == 4
+
+
+def test_honors_retry_after(stub):
+    stub.fail_next("rate_limit")
+
+    _, seconds = call(stub, NO_BACKOFF)
+
+    # without backoff, the only wait is the 0.3s the stub asked for
+    assert 0.3 <= seconds < 1.5
+    assert requests_sent(stub) == 2
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({"retry-after": "2"}, 2.0),
+        ({"retry-after-ms": "250"}, 0.25),
+        ({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}, 0.0),  # in the past
+        ({}, None),
+    ],
+)
+def test_retry_after_headers(headers, expected):
+    assert retry_after(status_error(429, headers)) == expected
+
+
+def test_retry_after_is_capped():
+    policy = RetryPolicy(max_delay=5.0)
+    assert backoff_delay(policy, 0, status_error(429, {"retry-after": "600"})) == 5.0
+
+
+def test_jitter_stays_within_bounds():
+    policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+    error = anthropic.APIConnectionError(request=httpx.Request("POST", "http://stub/v1/messages"))
+    for attempt in range(8):
+        cap = min(policy.max_delay, policy.base_delay * 2**attempt)
+        delays = [backoff_delay(policy, attempt, error) for _ in range(200)]
+        assert all(0 <= delay <= cap for delay in delays)
+        # full jitter spreads the delays over the whole range
+        assert max(delays) > cap / 2 > min(delays)
+
+
+def test_non_retryable_error_is_raised_at_once(stub):
+    stub.fail_next("bad_request")
+
+    start = time.perf_counter()
+    with pytest.raises(anthropic.BadRequestError):
+        call(stub, RetryPolicy(base_delay=1.0))
+
+    assert time.perf_counter() - start < 1.0
+    assert requests_sent(stub) == 1
+
+
+def test_gives_up_after_max_attempts(stub):
+    stub.fail_next("server_error", "server_error", "server_error")
+
+    with pytest.raises(anthropic.InternalServerError):
+        call(stub, RetryPolicy(max_attempts=2, base_delay=0.0))
+
+    assert requests_sent(stub) == 2
+
+
+def test_hedge_answers_before_a_slow_response(stub):
+    stub.fail_next("slow")
+
+    response, seconds = call(stub, RetryPolicy(hedge_after=0.2))
+
+    assert response.content
+    assert seconds < 1.5  # the slow response takes 2s
+
+
+def test_hedge_returns_first_success_and_cancels_the_other():
+    cancelled = []
+    calls = 0
+
+    async def request():
+        nonlocal calls
+        calls += 1
+        number = calls
+        try:
+            await asyncio.sleep(5.0 if number == 1 else 0.05)
+        except asyncio.CancelledError:
+            cancelled.append(number)
+            raise
+        return number
+
+    async def run():
+        result = await hedged(request, hedge_after=0.1)
+        await asyncio.sleep(0)  # let the cancellation be delivered
+        return result
+
+    assert asyncio.run(run()) == 2
+    assert cancelled == [1]
+
+
+def test_hedge_uses_the_other_request_when_one_fails():
+    calls = 0
+
+    async def request():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(0.2)
+            raise anthropic.APIConnectionError(request=httpx.Request("POST", "http://stub"))
+        await asyncio.sleep(0.3)
+        return "hedge"
+
+    assert asyncio.run(hedged(request, hedge_after=0.1)) == "hedge"
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from computer_use_qa_mcp.loop import APIProvider, sampling_loop
+from computer_use_qa_mcp.routing import ModelRouter, RoutingPolicy, TierStats
+from computer_use_qa_mcp.tools import ToolCollection, ToolResult
+
+FAST = "simulated-fast-model"
+STRONG = "simulated-strong-model"
+CLICK = ("computer", {"action": "left_click"})
+
+
+@pytest.fixture
+def router():
+    return ModelRouter(RoutingPolicy(fast_model=FAST, strong_model=STRONG))
+
+
+def screen(number: int) -> ToolResult:
+    return ToolResult(base64_image=f"screen-{number}")
+
+
+def test_starts_fast_and_writes_the_report_strong(router):
+    assert router.model() == ("fast", FAST)
+    assert router.model(final=True) == ("strong", STRONG)
+
+
+def test_progressing_run_stays_fast(router):
+    for turn in range(20):
+        router.record_turn([("computer", {"action": "left_click", "turn": turn})], [screen(turn)])
+
+    assert router.tier == "fast"
+    assert router.escalations == []
+
+
+def test_escalates_on_repeated_actions(router):
+    for turn in range(3):
+        assert router.tier == "fast"
+        router.record_turn([CLICK], [screen(turn)])
+
+    assert router.tier == "strong"
+    assert router.escalations == ["repeated actions"]
+
+
+def test_escalates_on_tool_errors(router):
+    router.record_turn([("computer", {"action": "zoom"})], [ToolResult(error="bad region")])
+    assert router.tier == "fast"
+    router.record_turn([("computer", {"action": "key"})], [ToolResult(error="text is required")])
+
+    assert router.tier == "strong"
+    assert router.escalations == ["tool errors"]
+
+
+def test_escalates_without_progress(router):
+    router.record_turn([("computer", {"action": "screenshot"})], [screen(0)])
+    for turn in range(5):
+        assert router.tier == "fast"
+        # the same screen over and over
+        router.record_turn([("computer", {"action": "mouse_move", "turn": turn})], [screen(0)])
+
+    assert router.tier == "strong"
+    assert router.escalations == ["no progress"]
+
+
+def test_escalated_run_does_not_fall_back_to_fast(router):
+    router.escalate("tool errors")
+
+    for turn in range(20):
+        router.record_turn([("computer", {"action": "left_click", "turn": turn})], [screen(turn)])
+
+    assert router.model() == ("strong", STRONG)
+    assert router.escalations == ["tool errors"]
+
+
+def test_strong_turns_limit_the_escalation():
+    router = ModelRouter(RoutingPolicy(fast_model=FAST, strong_model=STRONG, strong_turns=2))
+    router.escalate("tool errors")
+
+    for turn in range(2):
+        assert router.tier == "strong"
+        router.record_turn([("computer", {"action": "left_click", "turn": turn})], [screen(turn)])
+
+    assert router.tier == "fast"
+
+
+def test_fast_model_done_escalates_for_the_report(api_stub, computer, router):
+    def respond(request):
+        if request["model"] == STRONG:
+            return [{"type": "text", "text": "Report: written by the strong model."}]
+        if len(request["messages"]) == 1:
+            return [{"type": "tool_use", "name": "computer", "input": {"action": "screenshot"}}]
+        return [{"type": "text", "text": "All done."}]
+
+    api_stub.load(respond)
+    messages = asyncio.run(
+        sampling_loop(
+            model=STRONG,
+            provider=APIProvider.ANTHROPIC,
+            system_prompt_suffix="",
+            messages=[{"role": "user", "content": "Run the QA steps."}],
+            output_callback=lambda block: None,
+            tool_output_callback=lambda result, tool_use_id: None,
+            api_response_callback=lambda response: None,
+            api_key="simulated",
+            tool_collection=ToolCollection(computer),
+            router=router,
+        )
+    )
+
+    assert router.escalations == ["final report"]
+    assert messages[-1]["content"][-1].text == "Report: written by the strong model."
+    # the fast model's answer is dropped, the strong model answers in its place
+    assert len(messages) == 4
+    assert router.stats["fast"].turns == 2
+    assert router.stats["strong"].turns == 1
+
+
+def test_tier_cost_uses_the_price_of_its_model():
+    fast = TierStats("claude-haiku-4-5-20251001", turns=2, input_tokens=1_000_000, output_tokens=100_000)
+    strong = TierStats("anthropic.claude-opus-4-5-20251101-v1:0", turns=1, input_tokens=200_000, output_tokens=10_000)
+
+    assert fast.cost == pytest.approx(1.0 + 0.5)
+    assert strong.cost == pytest.approx(1.0 + 0.25)
+    assert str(fast).endswith("1,000,000 input and 100,000 output tokens, $1.50")
+
+
+def test_tier_cost_of_an_unknown_model():
+    stats = TierStats(FAST, turns=1, input_tokens=1000, output_tokens=100)
+
+    assert stats.cost is None
+    assert str(stats).endswith("1,000 input and 100 output tokens")
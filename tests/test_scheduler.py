@@ -0,0 +1,161 @@
+import asyncio
+import functools
+
+import pytest
+
+from computer_use_qa_mcp import scheduler as scheduler_module
+from computer_use_qa_mcp.retry import hedged
+from computer_use_qa_mcp.scheduler import RateLimitScheduler, TokenBucket
+
+TOKENS_PER_SECOND = 100
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A clock for the buckets that only moves when told to."""
+    now = [1000.0]
+    monkeypatch.setattr(scheduler_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def scheduler():
+    """A scheduler refilling 100 tokens a second, with its token bucket empty."""
+    scheduler = RateLimitScheduler(tokens_per_minute=60 * TOKENS_PER_SECOND)
+    scheduler.tokens.level = 0.0
+    return scheduler
+
+
+def test_bucket_refills_over_time(clock):
+    bucket = TokenBucket(6000)
+    bucket.take(6000)
+    assert bucket.wait_time(100) == pytest.approx(1.0)
+    clock[0] += 0.5
+    assert bucket.wait_time(100) == pytest.approx(0.5)
+    clock[0] += 120
+    assert bucket.wait_time(100) == 0.0
+    assert bucket.level == 6000  # never more than it holds
+
+
+def test_bucket_waits_for_a_full_bucket_at_most(clock):
+    bucket = TokenBucket(6000)
+    bucket.take(6000)
+    assert bucket.wait_time(100_000) == pytest.approx(60.0)
+
+
+def test_settle_corrects_the_estimate(clock):
+    scheduler = RateLimitScheduler(tokens_per_minute=6000)
+    scheduler._take(1000)
+    scheduler.settle(estimated=1000, actual=1500)
+    assert scheduler.tokens.level == 4500
+    scheduler.settle(estimated=1000, actual=200)
+    assert scheduler.tokens.level == 5300
+
+
+def test_settle_into_debt_delays_the_next_call(clock):
+    scheduler = RateLimitScheduler(tokens_per_minute=6000)
+    scheduler._take(6000)
+    scheduler.settle(estimated=6000, actual=6600)
+    assert scheduler.tokens.level == -600
+    assert scheduler._wait_time(100) == pytest.approx(7.0)
+
+
+def test_admits_at_once_within_the_limits():
+    async def run():
+        scheduler = RateLimitScheduler(tokens_per_minute=6000, requests_per_minute=60)
+        assert await scheduler.admit("run", 1000) == 0.0
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.tokens.level == pytest.approx(5000, abs=1)
+    assert scheduler.requests.level == pytest.approx(59, abs=0.1)
+
+
+def test_waits_for_the_bucket_to_refill(scheduler):
+    waited = asyncio.run(scheduler.admit("run", 30))
+    assert waited == pytest.approx(30 / TOKENS_PER_SECOND, abs=0.1)
+
+
+def test_runs_take_turns(scheduler):
+    admitted = []
+
+    async def call(run: str, number: int):
+        await scheduler.admit(run, 10)
+        admitted.append(f"{run}{number}")
+
+    async def run():
+        # run a queues three calls before run b queues its first
+        calls = [asyncio.create_task(call("a", number)) for number in range(3)]
+        await asyncio.sleep(0)
+        calls += [asyncio.create_task(call("b", number)) for number in range(2)]
+        await asyncio.gather(*calls)
+
+    asyncio.run(run())
+    assert admitted == ["a0", "b0", "a1", "b1", "a2"]
+
+
+def test_cancelled_waiter_leaves_the_queue(scheduler):
+    async def run():
+        large = asyncio.create_task(scheduler.admit("a", 500))
+        await asyncio.sleep(0.05)
+        assert scheduler.waiting == 1
+        large.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await large
+        assert scheduler.waiting == 0
+        # the next call only waits for its own tokens
+        return await scheduler.admit("b", 10)
+
+    assert asyncio.run(run()) < 0.3
+
+
+def test_cancelled_waiter_is_not_admitted(scheduler):
+    async def run():
+        waiter = asyncio.create_task(scheduler.admit("a", 10))
+        await asyncio.sleep(0)
+        scheduler.tokens.level = 1000.0
+        waiter.cancel()
+        # the bucket has room before the cancelled task could leave the queue
+        scheduler._dispatch()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.waiting == 0
+    assert scheduler.tokens.level == pytest.approx(1000, abs=1)
+
+
+def test_cancelled_after_admission_gives_the_reservation_back(scheduler):
+    async def run():
+        waiter = asyncio.create_task(scheduler.admit("a", 10))
+        await asyncio.sleep(0)
+        scheduler.tokens.level = 1000.0
+        scheduler._dispatch()
+        assert scheduler.tokens.level == pytest.approx(990, abs=1)
+        # admitted, but cancelled before its task ran again
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.tokens.level == pytest.approx(1000, abs=1)
+
+
+def test_hedges_are_charged():
+    scheduler = RateLimitScheduler(tokens_per_minute=6000, requests_per_minute=60)
+    answers = iter([2.0, 0.0])
+
+    async def request():
+        await asyncio.sleep(next(answers))
+        return "answer"
+
+    async def run():
+        await scheduler.admit("run", 1000)
+        return await hedged(request, 0.1, functools.partial(scheduler.charge, 1000))
+
+    assert asyncio.run(run()) == "answer"
+    # less what refilled while the first request was waiting
+    assert scheduler.tokens.level == pytest.approx(4000, abs=20)
+    assert scheduler.requests.level == pytest.approx(58, abs=0.2)
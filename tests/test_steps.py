@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from computer_use_qa_mcp.steps import (
+    MAX_WAIT_SECONDS,
+    Step,
+    parse_step,
+    preprocess,
+    run_steps,
+    steps_context,
+)
+from computer_use_qa_mcp.tools import ComputerTool, ToolCollection
+
+
+@pytest.mark.parametrize(
+    ("line", "calls", "wait"),
+    [
+        ("open http://localhost:3000", [("bash", {"command": "open http://localhost:3000"})], 0.0),
+        ("Open the browser at https://example.com/a?b=c", [("bash", {"command": "open 'https://example.com/a?b=c'"})], 0.0),
+        ("launch Safari", [("bash", {"command": "open -a Safari"})], 0.0),
+        ('open the app "Google Chrome"', [("bash", {"command": "open -a 'Google Chrome'"})], 0.0),
+        ("wait 5 seconds.", [], 5.0),
+        ("wait for 1.5s", [], 1.5),
+        ("press cmd+r", [("computer", {"action": "key", "text": "cmd+r"})], 0.0),
+        ('type "hello@example.com"', [("computer", {"action": "type", "text": "hello@example.com"})], 0.0),
+        ("run npm run seed", [("bash", {"command": "npm run seed"})], 0.0),
+        ("$ make fixtures", [("bash", {"command": "make fixtures"})], 0.0),
+    ],
+)
+def test_parse_step(line, calls, wait):
+    step = parse_step(line)
+    assert step is not None
+    assert (step.calls, step.wait) == (calls, wait)
+
+
+def test_parse_step_caps_waits():
+    assert parse_step("wait 3600 seconds").wait == MAX_WAIT_SECONDS
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "log in as the admin user",  # not a step
+        "click the sign up button",  # left to the model, it has to find the button
+        "wait abc seconds",
+        "wait until the page loads",
+        "type hello",  # text has to be quoted
+        'type "hello',
+        "press",
+        "open localhost:3000",  # not a url
+    ],
+)
+def test_parse_step_rejects(line):
+    assert parse_step(line) is None
+
+
+def test_preprocess_defers_from_an_unknown_step():
+    preprocessed = preprocess(
+        "```qa-steps\n"
+        "open http://localhost:3000\n"
+        "log in as the admin user\n"
+        "wait 5 seconds\n"
+        "```\n"
+        "Check the dashboard.\n"
+        "```qa-steps\n"
+        "press cmd+r\n"
+        "```\n"
+    )
+    assert [step.line for step in preprocessed.steps] == ["open http://localhost:3000"]
+    # the steps after an unknown one are left to the model too, in order
+    assert preprocessed.deferred == ["log in as the admin user", "wait 5 seconds"]
+    # a block below the instructions is theirs
+    assert preprocessed.instructions.startswith("Check the dashboard.\n```qa-steps\npress cmd+r")
+
+
+def test_preprocess_without_steps():
+    instructions = "1. Open the app\n2. Check the title"
+    preprocessed = preprocess(instructions)
+    assert (preprocessed.steps, preprocessed.deferred) == ([], [])
+    assert preprocessed.instructions == instructions
+
+
+def test_failing_step_falls_back_to_the_model(display):
+    # without a bash tool, the run step fails
+    tool_collection = ToolCollection(ComputerTool(gui=display))
+    preprocessed = preprocess(
+        "```qa-steps\n"
+        'type "hello"\n'
+        "run npm run seed\n"
+        "press Return\n"
+        "```\n"
+        "Check the greeting."
+    )
+    results = []
+    run = asyncio.run(
+        run_steps(
+            preprocessed.steps,
+            tool_collection,
+            lambda result, tool_use_id: results.append((tool_use_id, result.error)),
+        )
+    )
+
+    assert run.done == 1
+    assert [step.line for step in run.not_run] == ["run npm run seed", "press Return"]
+    assert run.log[0].startswith('type "hello": done')
+    assert run.log[1].startswith("run npm run seed: failed")
+    assert [tool_use_id for tool_use_id, _ in results] == ["qa_step_1_1", "qa_step_2_1"]
+    assert run.screenshot is not None and run.screenshot.base64_image
+
+    content = steps_context(preprocessed, run)
+    assert [block["type"] for block in content] == ["text", "text", "image", "text"]
+    assert "- run npm run seed: failed" in content[0]["text"]
+    assert content[-1]["text"].endswith(
+        "Do these steps first:\n- run npm run seed\n- press Return\n\nCheck the greeting."
+    )
+
+
+def test_steps_wait(display):
+    tool_collection = ToolCollection(ComputerTool(gui=display))
+    run = asyncio.run(run_steps([Step("wait 0.2 seconds", [], wait=0.2)], tool_collection))
+    assert (run.done, run.not_run, run.log) == (1, [], ["wait 0.2 seconds: done"])